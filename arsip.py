@@ -0,0 +1,423 @@
+# Arsip semester lama ke berkas SQLite per tahun ajaran.
+#
+# Hanya semester aktif yang ditulis, tetapi nilai semua semester menumpuk di tabel nilai utama,
+# sehingga setiap index, setiap query panas, dan setiap penghapusan ikut membayar riwayatnya.
+# Semester yang sudah ditutup bisa dipindahkan ke berkas `arsip/nilai_<tahun ajaran>.db` (satu
+# berkas per tahun ajaran, folder bisa diganti lewat SINFOMIK_ARSIP_DIR): baris nilai dan
+# guru_mapel_kelas-nya disalin ke sana, dihapus dari database utama, dan nama berkasnya dicatat
+# di semester.berkas_arsip. Halaman yang ditempati baris lama dipakai ulang oleh nilai baru,
+# jadi berkas utama berhenti tumbuh (ukurannya baru menyusut setelah VACUUM).
+#
+#     python arsip.py --db sinfomik.db --daftar
+#     python arsip.py --db sinfomik.db --arsipkan 19
+#     python arsip.py --db sinfomik.db --kembalikan 19
+#
+# Pemindahan dibagi tiga langkah agar lock tulis database utama hanya dipegang sebentar:
+#   1. Salin: berkas arsip di-ATTACH, baris semester disalin dalam satu transaksi yang hanya
+#      menulis ke berkas arsip; database utama cukup dibaca.
+#   2. Tandai (lewat writer.py): berkas_arsip diisi setelah memastikan data semester tidak
+#      berubah sejak disalin. Sejak titik ini pembaca memakai salinan di arsip.
+#   3. Hapus (lewat writer.py): baris di database utama dihapus per SINFOMIK_ARSIP_BATCH baris.
+# Jika proses terhenti di tengah jalan, cukup jalankan ulang perintah yang sama.
+#
+# Untuk membaca data lama, `nilai_semua(conn, semester_ids)` meng-ATTACH berkas yang diperlukan
+# secara read-only ke koneksi baca dan menghasilkan subquery gabungan nilai utama + arsip yang
+# dipakai di klausa FROM seperti tabel biasa. Koneksi baca memakai query_only, sehingga
+# gabungannya berupa subquery, bukan TEMP VIEW. Penugasan guru di semester yang diarsipkan
+# dibaca lewat `penugasan_arsip(conn, guru_id)`, agar konteks guru (filter kelas/mapel di
+# riwayat nilai) tetap memuat semester itu.
+#
+#     python arsip.py --db sinfomik.db --periksa    # nilai arsip masih terjangkau dari riwayat guru
+import argparse
+import contextlib
+import os
+import re
+import sqlite3
+import sys
+import urllib.parse
+
+import db
+import integritas
+import queries
+import writer
+
+BATCH = int(os.getenv("SINFOMIK_ARSIP_BATCH", "5000"))
+
+# Kolom yang dipindahkan, dengan urutan yang sama di database utama dan berkas arsip
+KOLOM = {
+    "nilai": ("id", "siswa_id", "mapel_id", "semester_id", "tahap_id", "nilai", "tanggal_input", "guru_id", "catatan"),
+    "guru_mapel_kelas": ("id", "user_id", "mapel_id", "kelas_id", "semester_id"),
+}
+
+# Skema berkas arsip: tanpa foreign key (tidak bisa menunjuk ke database lain), dengan index
+# yang sama seperti tabel utama agar query riwayat/rapor tetap memakai index
+_SKEMA = """
+    CREATE TABLE IF NOT EXISTS {alias}.nilai (
+        id INTEGER PRIMARY KEY,
+        siswa_id INTEGER NOT NULL,
+        mapel_id INTEGER NOT NULL,
+        semester_id INTEGER NOT NULL,
+        tahap_id INTEGER NOT NULL,
+        nilai REAL NOT NULL,
+        tanggal_input DATE NOT NULL,
+        guru_id INTEGER,
+        catatan TEXT
+    );
+    CREATE INDEX IF NOT EXISTS {alias}.idx_nilai_guru_tanggal ON nilai (guru_id, tanggal_input);
+    CREATE INDEX IF NOT EXISTS {alias}.idx_nilai_semester_mapel_tahap ON nilai (semester_id, mapel_id, tahap_id, siswa_id, nilai);
+    CREATE TABLE IF NOT EXISTS {alias}.guru_mapel_kelas (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        mapel_id INTEGER NOT NULL,
+        kelas_id INTEGER NOT NULL,
+        semester_id INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS {alias}.idx_gmk_user_semester ON guru_mapel_kelas (user_id, semester_id, kelas_id, mapel_id);
+"""
+
+
+def folder():
+    return os.getenv("SINFOMIK_ARSIP_DIR") or os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "arsip")
+
+
+def nama_berkas(th_ajar):
+    """Nama berkas arsip untuk satu tahun ajaran, misalnya "2023/2024" -> nilai_2023-2024.db."""
+    return "nilai_" + re.sub(r"[^0-9A-Za-z]+", "-", th_ajar).strip("-") + ".db"
+
+
+def _path(berkas):
+    return os.path.join(folder(), berkas)
+
+
+def _info_semester(conn, semester_id):
+    row = conn.execute("""
+        SELECT s.id, s.nama_semester, s.aktif, s.berkas_arsip, ta.th_ajar
+        FROM semester s JOIN tahun_ajaran ta ON ta.id = s.th_ajar_id
+        WHERE s.id = ?
+    """, (semester_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Semester {semester_id} tidak ditemukan.")
+    return row
+
+
+def _sidik(conn, skema, semester_id):
+    # Ringkasan isi satu semester untuk memastikan data tidak berubah di antara langkah.
+    # Kolomnya ada di index (semester_id, ..., nilai) + rowid, jadi cukup membaca index.
+    nilai = conn.execute(
+        f"SELECT COUNT(*), TOTAL(id), TOTAL(CAST(ROUND(nilai * 100) AS INTEGER)) FROM {skema}.nilai WHERE semester_id = ?",
+        (semester_id,)
+    ).fetchone()
+    penugasan = conn.execute(
+        f"SELECT COUNT(*), TOTAL(id) FROM {skema}.guru_mapel_kelas WHERE semester_id = ?", (semester_id,)
+    ).fetchone()
+    return tuple(nilai) + tuple(penugasan)
+
+
+def _salin_ke_arsip(conn, semester_id, berkas):
+    os.makedirs(folder(), exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS arsip_tujuan", (_path(berkas),))
+    try:
+        conn.executescript(_SKEMA.format(alias="arsip_tujuan"))
+        conn.execute("BEGIN")
+        try:
+            for tabel, kolom in KOLOM.items():
+                daftar = ", ".join(kolom)
+                # Sisa salinan dari percobaan sebelumnya yang terhenti diganti seluruhnya
+                conn.execute(f"DELETE FROM arsip_tujuan.{tabel} WHERE semester_id = ?", (semester_id,))
+                conn.execute(f"INSERT INTO arsip_tujuan.{tabel} ({daftar}) SELECT {daftar} FROM main.{tabel} WHERE semester_id = ?",
+                             (semester_id,))
+            sidik = _sidik(conn, "main", semester_id)
+            if _sidik(conn, "arsip_tujuan", semester_id) != sidik:
+                raise RuntimeError("Salinan arsip tidak cocok dengan data semester.")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("DETACH DATABASE arsip_tujuan")
+    return sidik
+
+
+def _tandai_arsip(conn, semester_id, berkas, sidik):
+    """Fungsi tulis: mencatat berkas arsip semester jika datanya masih sama dengan salinan."""
+    if _sidik(conn, "main", semester_id) != sidik:
+        raise RuntimeError("Data semester berubah selama disalin ke arsip. Ulangi pengarsipan.")
+    diubah = conn.execute(
+        "UPDATE semester SET berkas_arsip = ? WHERE id = ? AND aktif = 0 AND berkas_arsip IS NULL",
+        (berkas, semester_id)
+    ).rowcount
+    if diubah != 1:
+        raise RuntimeError("Semester sudah aktif atau sudah diarsipkan.")
+
+
+def _hapus_batch(conn, tabel, semester_id, batas):
+    """Fungsi tulis: menghapus sebagian baris semester yang sudah diarsipkan dari database utama."""
+    return conn.execute(f"""
+        DELETE FROM {tabel} WHERE rowid IN (
+            SELECT rowid FROM {tabel}
+            WHERE semester_id = ?
+              AND EXISTS (SELECT 1 FROM semester WHERE id = ? AND berkas_arsip IS NOT NULL)
+            LIMIT ?
+        )
+    """, (semester_id, semester_id, batas)).rowcount
+
+
+def _sisipkan(conn, tabel, kolom, rows):
+    """Fungsi tulis: mengembalikan baris arsip ke database utama (baris yang sudah ada dilewati)."""
+    tanda = ", ".join("?" * len(kolom))
+    return conn.executemany(f"INSERT OR IGNORE INTO {tabel} ({', '.join(kolom)}) VALUES ({tanda})", rows).rowcount
+
+
+def _lepas_tanda(conn, semester_id):
+    """Fungsi tulis: semester kembali dibaca dari database utama."""
+    conn.execute("UPDATE semester SET berkas_arsip = NULL WHERE id = ?", (semester_id,))
+
+
+def arsipkan(semester_id, log=print):
+    """Memindahkan nilai dan penugasan satu semester yang tidak aktif ke berkas arsip tahun
+    ajarannya. Mengembalikan jumlah baris nilai yang dihapus dari database utama."""
+    conn = db.get_connection()
+    try:
+        sem = _info_semester(conn, semester_id)
+        if sem["aktif"]:
+            raise ValueError("Semester aktif tidak bisa diarsipkan.")
+        berkas = sem["berkas_arsip"]
+        if berkas is None:
+            berkas = nama_berkas(sem["th_ajar"])
+            sidik = _salin_ke_arsip(conn, semester_id, berkas)
+            if log:
+                log(f"{sem['nama_semester']}: {sidik[0]} nilai dan {sidik[3]} penugasan disalin ke {berkas}")
+            writer.tulis(_tandai_arsip, semester_id, berkas, sidik)
+    finally:
+        conn.close()
+
+    dihapus = {}
+    for tabel in KOLOM:
+        dihapus[tabel] = 0
+        while True:
+            n = writer.tulis(_hapus_batch, tabel, semester_id, BATCH)
+            if not n:
+                break
+            dihapus[tabel] += n
+    if log:
+        log(f"{sem['nama_semester']}: {dihapus['nilai']} nilai dan {dihapus['guru_mapel_kelas']} penugasan dihapus dari database utama")
+    return dihapus["nilai"]
+
+
+def _uri_baca(path):
+    return "file:" + urllib.parse.quote(os.path.abspath(path)) + "?mode=ro"
+
+
+def kembalikan(semester_id, log=print):
+    """Memindahkan kembali nilai dan penugasan semester dari arsip ke database utama. Baris
+    yang induknya sudah dihapus (siswa, mapel, ...) dilewati seperti ON DELETE CASCADE; guru
+    yang sudah dihapus dikosongkan seperti ON DELETE SET NULL. Mengembalikan jumlah nilai."""
+    conn = db.get_read_connection()
+    try:
+        sem = _info_semester(conn, semester_id)
+        berkas = sem["berkas_arsip"]
+        if berkas is None:
+            raise ValueError("Semester ini tidak diarsipkan.")
+        relasi = integritas.relasi(conn)
+        induk = {}
+        for r in relasi:
+            kunci = (r["induk"], r["kolom_induk"])
+            if kunci not in induk:
+                induk[kunci] = {row[0] for row in conn.execute(f"SELECT {r['kolom_induk']} FROM {r['induk']}")}
+    finally:
+        conn.close()
+
+    dikembalikan = {}
+    arsip_conn = sqlite3.connect(_uri_baca(_path(berkas)), uri=True)
+    try:
+        for tabel, kolom in KOLOM.items():
+            dikembalikan[tabel] = 0
+            fk = [(kolom.index(r["kolom"]), r["on_delete"], induk[(r["induk"], r["kolom_induk"])])
+                  for r in relasi if r["tabel"] == tabel]
+            cur = arsip_conn.execute(f"SELECT {', '.join(kolom)} FROM {tabel} WHERE semester_id = ? ORDER BY id", (semester_id,))
+            while True:
+                rows = cur.fetchmany(BATCH)
+                if not rows:
+                    break
+                siap = []
+                for row in rows:
+                    row = list(row)
+                    for i, on_delete, ada in fk:
+                        if row[i] is not None and row[i] not in ada:
+                            if on_delete != "SET NULL":
+                                break
+                            row[i] = None
+                    else:
+                        siap.append(row)
+                dikembalikan[tabel] += writer.tulis(_sisipkan, tabel, kolom, siap)
+    finally:
+        arsip_conn.close()
+
+    writer.tulis(_lepas_tanda, semester_id)
+    hapus_dari_arsip(berkas, semester_id)
+    if log:
+        log(f"{sem['nama_semester']}: {dikembalikan['nilai']} nilai dan {dikembalikan['guru_mapel_kelas']} penugasan dikembalikan dari {berkas}")
+    return dikembalikan["nilai"]
+
+
+def hapus_dari_arsip(berkas, semester_id):
+    """Menghapus baris satu semester dari berkas arsip (setelah dikembalikan atau semesternya dihapus)."""
+    path = _path(berkas)
+    if not os.path.exists(path):
+        return
+    arsip_conn = sqlite3.connect(path)
+    try:
+        with arsip_conn:
+            for tabel in KOLOM:
+                arsip_conn.execute(f"DELETE FROM {tabel} WHERE semester_id = ?", (semester_id,))
+    finally:
+        arsip_conn.close()
+
+
+@contextlib.contextmanager
+def nilai_semua(conn, semester_ids=None):
+    """Sumber nilai gabungan database utama + arsip untuk klausa FROM, misalnya
+    `f"SELECT ... FROM {sumber} n WHERE n.semester_id = ?"`.
+
+    Hanya berkas arsip milik `semester_ids` (atau semua berkas jika None) yang di-ATTACH
+    read-only, dan dilepas lagi saat keluar dari blok `with`. Jika tidak ada yang diarsipkan,
+    hasilnya cukup "nilai" tanpa ATTACH. `conn` harus koneksi dari db.get_read_connection().
+    """
+    if not conn.execute("PRAGMA query_only").fetchone()[0]:
+        raise ValueError("nilai_semua() hanya untuk koneksi baca (db.get_read_connection).")
+    sql, params = "SELECT DISTINCT berkas_arsip FROM semester WHERE berkas_arsip IS NOT NULL", []
+    if semester_ids is not None:
+        sql += f" AND id IN ({', '.join('?' * len(semester_ids))})"
+        params = list(semester_ids)
+    daftar_berkas = [row[0] for row in conn.execute(sql, params)]
+    if not daftar_berkas:
+        yield "nilai"
+        return
+
+    kolom = ", ".join(KOLOM["nilai"])
+    bagian = [f"SELECT {kolom} FROM main.nilai WHERE semester_id NOT IN "
+              f"(SELECT id FROM main.semester WHERE berkas_arsip IS NOT NULL)"]
+    terpasang = []
+    try:
+        for i, berkas in enumerate(daftar_berkas):
+            alias = f"arsip_{i}"
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (_uri_baca(_path(berkas)),))
+            terpasang.append(alias)
+            # Hanya semester yang sudah ditandai: salinan yang belum selesai tidak terbaca ganda
+            bagian.append(f"SELECT {kolom} FROM {alias}.nilai WHERE semester_id IN "
+                          f"(SELECT id FROM main.semester WHERE berkas_arsip = '{berkas.replace(chr(39), chr(39) * 2)}')")
+        yield "(" + " UNION ALL ".join(bagian) + ")"
+    finally:
+        for alias in terpasang:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+
+def penugasan_arsip(conn, guru_id):
+    """Baris konteks guru (kolom seperti queries.KONTEKS_GURU) untuk semester yang sudah
+    diarsipkan. Setiap berkas arsip di-ATTACH read-only satu per satu, jadi jumlah berkas tidak
+    dibatasi batas ATTACH SQLite. Berkas yang hilang dilewati."""
+    rows = []
+    daftar_berkas = [row[0] for row in conn.execute(
+        "SELECT DISTINCT berkas_arsip FROM semester WHERE berkas_arsip IS NOT NULL").fetchall()]
+    for berkas in daftar_berkas:
+        if not os.path.exists(_path(berkas)):
+            continue
+        conn.execute("ATTACH DATABASE ? AS arsip_konteks", (_uri_baca(_path(berkas)),))
+        try:
+            rows.extend(conn.execute(queries.KONTEKS_GURU_ARSIP.format(alias="arsip_konteks"), (guru_id, berkas)).fetchall())
+        finally:
+            conn.execute("DETACH DATABASE arsip_konteks")
+    return rows
+
+
+def periksa(conn, log=print):
+    """Memastikan nilai setiap semester yang diarsipkan masih bisa dipilih di riwayat nilai guru:
+    semesternya ada di konteks guru, dan jumlah nilai lewat query riwayat (filter semester)
+    sama dengan isi berkas arsip. Mengembalikan jumlah masalah yang ditemukan."""
+    import konteks_guru
+
+    masalah = 0
+    for sem in conn.execute("SELECT id, nama_semester, berkas_arsip FROM semester WHERE berkas_arsip IS NOT NULL").fetchall():
+        if not os.path.exists(_path(sem["berkas_arsip"])):
+            log(f"{sem['nama_semester']}: berkas {sem['berkas_arsip']} tidak ditemukan")
+            masalah += 1
+            continue
+        arsip_conn = sqlite3.connect(_uri_baca(_path(sem["berkas_arsip"])), uri=True)
+        try:
+            per_guru = dict(arsip_conn.execute(
+                "SELECT guru_id, COUNT(*) FROM nilai WHERE semester_id = ? GROUP BY guru_id", (sem["id"],)).fetchall())
+        finally:
+            arsip_conn.close()
+        tanpa_konteks = terjangkau = 0
+        with nilai_semua(conn, [sem["id"]]) as sumber:
+            for guru_id in per_guru:
+                if guru_id is None:
+                    continue
+                konteks = konteks_guru.bangun_konteks(conn, guru_id)
+                if sem["id"] not in konteks["semester"]:
+                    tanpa_konteks += 1
+                sql, params = queries.riwayat_jumlah(guru_id, {"semester_id": sem["id"]}, sumber)
+                terjangkau += conn.execute(sql, params).fetchone()[0]
+        total = sum(n for guru_id, n in per_guru.items() if guru_id is not None)
+        ok = not tanpa_konteks and terjangkau == total
+        log(f"{sem['nama_semester']}: {terjangkau}/{total} nilai terjangkau dari riwayat {len(per_guru)} guru"
+            + (f", {tanpa_konteks} guru tanpa semester ini di konteksnya" if tanpa_konteks else "")
+            + ("" if ok else "  <-- MASALAH"))
+        masalah += not ok
+    return masalah
+
+
+def daftar(conn):
+    """Semua semester beserta berkas arsip dan jumlah nilai yang masih di database utama."""
+    return conn.execute("""
+        SELECT s.id, s.nama_semester, s.aktif, s.berkas_arsip,
+               (SELECT COUNT(*) FROM nilai n WHERE n.semester_id = s.id) AS nilai_utama
+        FROM semester s
+        ORDER BY s.id
+    """).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arsip nilai semester lama ke berkas per tahun ajaran.")
+    parser.add_argument("--db", default=db.DB_PATH)
+    aksi = parser.add_mutually_exclusive_group(required=True)
+    aksi.add_argument("--daftar", action="store_true", help="Tampilkan status arsip setiap semester")
+    aksi.add_argument("--arsipkan", type=int, nargs="+", metavar="SEMESTER_ID")
+    aksi.add_argument("--kembalikan", type=int, nargs="+", metavar="SEMESTER_ID")
+    aksi.add_argument("--periksa", action="store_true",
+                      help="Pastikan nilai semester yang diarsipkan masih terjangkau dari riwayat guru")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+
+    if args.daftar:
+        conn = db.get_read_connection()
+        try:
+            for row in daftar(conn):
+                status = "aktif" if row["aktif"] else (f"arsip: {row['berkas_arsip']}" if row["berkas_arsip"] else "-")
+                print(f"  {row['id']:>4}  {row['nama_semester']:<28} {row['nilai_utama']:>9} nilai di utama   {status}")
+        finally:
+            conn.close()
+        return 0
+
+    if args.periksa:
+        conn = db.get_read_connection()
+        try:
+            return 1 if periksa(conn) else 0
+        finally:
+            conn.close()
+
+    for semester_id in args.arsipkan or args.kembalikan:
+        try:
+            (arsipkan if args.arsipkan else kembalikan)(semester_id)
+        except (ValueError, RuntimeError) as e:
+            print(f"Semester {semester_id}: {e}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+# Backup online database utama dan berkas arsip memakai sqlite3 backup API.
+#
+#     python backup.py --db sinfomik.db                      # buat snapshot baru
+#     python backup.py --db sinfomik.db --daftar             # daftar snapshot + cek checksum
+#     python backup.py --db sinfomik.db --pulihkan 20261018-170000
+#     python backup.py --db sinfomik.db --ukur               # throughput dan dampak ke latensi
+#
+# Snapshot ditulis ke SINFOMIK_BACKUP_DIR (default folder backup/ di samping database), satu
+# subfolder per snapshot `YYYYmmdd-HHMMSS/` berisi database utama, arsip/*.db (lihat arsip.py),
+# dan SHA256SUMS (format sha256sum, bisa dicek dengan `sha256sum -c SHA256SUMS`). Snapshot
+# ditulis ke folder .tmp lalu di-rename, jadi snapshot yang setengah jadi tidak pernah terlihat
+# lengkap. Hanya SINFOMIK_BACKUP_SIMPAN snapshot terbaru yang disimpan.
+#
+# Penyalinan berjalan SINFOMIK_BACKUP_HALAMAN halaman per langkah dengan jeda
+# SINFOMIK_BACKUP_JEDA_MS di antaranya, sehingga thread lain (sesi, thread penulis) tetap
+# mendapat giliran CPU dan disk. Koneksi sumber memegang satu transaksi baca sampai selesai:
+# dengan WAL penulis tetap berjalan seperti biasa, dan backup tidak diulang dari halaman pertama
+# setiap kali ada commit. Tanpa transaksi itu backup API mengulang dari awal begitu database
+# berubah di antara dua langkah, sehingga di jam sibuk backup tidak pernah selesai. Selama
+# backup berjalan WAL tidak bisa di-checkpoint melewati titik awal snapshot, jadi berkas -wal
+# bisa membesar sementara.
+#
+# Di aplikasi, set SINFOMIK_BACKUP_INTERVAL_MENIT agar backup berjalan berkala di thread latar
+# (lihat mulai_terjadwal(), dipanggil dari sinfomik.py).
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+
+import db
+
+HALAMAN = int(os.getenv("SINFOMIK_BACKUP_HALAMAN", "256"))
+JEDA_MS = float(os.getenv("SINFOMIK_BACKUP_JEDA_MS", "5"))
+SIMPAN = int(os.getenv("SINFOMIK_BACKUP_SIMPAN", "7"))
+INTERVAL_MENIT = float(os.getenv("SINFOMIK_BACKUP_INTERVAL_MENIT", "0"))  # 0 = tidak terjadwal
+
+_logger = logging.getLogger("sinfomik.backup")
+_lock = threading.Lock()
+_thread = None
+
+
+def folder():
+    return os.getenv("SINFOMIK_BACKUP_DIR") or os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "backup")
+
+
+def _uri_baca(path):
+    return "file:" + urllib.parse.quote(os.path.abspath(path)) + "?mode=ro"
+
+
+def _berkas_arsip():
+    # Diimpor di sini: arsip.py mengimpor writer, yang tidak diperlukan untuk sekadar backup
+    import arsip
+    return sorted(glob.glob(os.path.join(arsip.folder(), "*.db")))
+
+
+def _salin(sumber, tujuan, halaman=HALAMAN, jeda_ms=JEDA_MS):
+    """Menyalin database `sumber` (koneksi) ke berkas baru `tujuan` dengan backup API per langkah.
+    Mengembalikan statistik: jumlah langkah, halaman, ukuran halaman, dan berapa kali diulang."""
+    stat = {"langkah": 0, "halaman": 0, "ulang": 0}
+    sisa_sebelumnya = [None]
+
+    def progres(status, sisa, total):
+        stat["langkah"] += 1
+        stat["halaman"] = total
+        # Sisa halaman yang bertambah berarti backup mulai ulang dari awal
+        if sisa_sebelumnya[0] is not None and sisa > sisa_sebelumnya[0]:
+            stat["ulang"] += 1
+        sisa_sebelumnya[0] = sisa
+        if jeda_ms and sisa:
+            time.sleep(jeda_ms / 1000)
+
+    dst = sqlite3.connect(tujuan)
+    try:
+        # Transaksi baca dipegang sampai selesai: snapshot tetap dan backup tidak diulang
+        sumber.execute("BEGIN")
+        sumber.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        try:
+            sumber.backup(dst, pages=halaman, progress=progres)
+        finally:
+            sumber.rollback()
+        stat["ukuran_halaman"] = dst.execute("PRAGMA page_size").fetchone()[0]
+        # Snapshot berupa satu berkas mandiri tanpa -wal/-shm
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+    return stat
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for blok in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(blok)
+    return h.hexdigest()
+
+
+def buat(halaman=HALAMAN, jeda_ms=JEDA_MS, cek=True, rotasi=True, log=print):
+    """Membuat satu snapshot (database utama + berkas arsip) dan mengembalikan ringkasannya:
+    nama, ukuran (byte), detik, MB/detik, langkah, dan berapa kali backup diulang."""
+    nama = time.strftime("%Y%m%d-%H%M%S")
+    while os.path.exists(os.path.join(folder(), nama)):
+        nama += "b"
+    tujuan = os.path.join(folder(), nama)
+    sementara = tujuan + ".tmp"
+    os.makedirs(os.path.join(sementara, "arsip"), exist_ok=True)
+
+    mulai = time.perf_counter()
+    daftar = []  # (path relatif di snapshot, statistik)
+    try:
+        conn = db.open_read_connection()
+        try:
+            relatif = os.path.basename(db.DB_PATH)
+            daftar.append((relatif, _salin(conn, os.path.join(sementara, relatif), halaman, jeda_ms)))
+        finally:
+            conn.close()
+        for path in _berkas_arsip():
+            relatif = os.path.join("arsip", os.path.basename(path))
+            conn = sqlite3.connect(_uri_baca(path), uri=True)
+            try:
+                daftar.append((relatif, _salin(conn, os.path.join(sementara, relatif), halaman, jeda_ms)))
+            finally:
+                conn.close()
+        detik_salin = time.perf_counter() - mulai
+
+        if cek:
+            for relatif, _ in daftar:
+                cek_conn = sqlite3.connect(_uri_baca(os.path.join(sementara, relatif)), uri=True)
+                try:
+                    hasil = cek_conn.execute("PRAGMA quick_check").fetchone()[0]
+                finally:
+                    cek_conn.close()
+                if hasil != "ok":
+                    raise RuntimeError(f"quick_check gagal untuk {relatif}: {hasil}")
+
+        with open(os.path.join(sementara, "SHA256SUMS"), "w", encoding="utf-8") as f:
+            for relatif, _ in daftar:
+                f.write(f"{_sha256(os.path.join(sementara, relatif))}  {relatif.replace(os.sep, '/')}\n")
+        os.replace(sementara, tujuan)
+    except BaseException:
+        shutil.rmtree(sementara, ignore_errors=True)
+        raise
+
+    ukuran = sum(os.path.getsize(os.path.join(tujuan, relatif)) for relatif, _ in daftar)
+    ringkasan = {
+        "nama": nama,
+        "berkas": len(daftar),
+        "ukuran": ukuran,
+        "detik": round(time.perf_counter() - mulai, 2),
+        "detik_salin": round(detik_salin, 2),
+        "mb_per_detik": round(ukuran / 1024 / 1024 / detik_salin, 1) if detik_salin else 0.0,
+        "langkah": sum(s["langkah"] for _, s in daftar),
+        "ulang": sum(s["ulang"] for _, s in daftar),
+    }
+    if log:
+        log(f"Snapshot {nama}: {len(daftar)} berkas, {ukuran / 1024 / 1024:.1f} MB dalam {ringkasan['detik_salin']} s "
+            f"({ringkasan['mb_per_detik']} MB/s, {ringkasan['langkah']} langkah, diulang {ringkasan['ulang']}x)")
+    if rotasi:
+        for lama in daftar_snapshot()[SIMPAN:]:
+            shutil.rmtree(os.path.join(folder(), lama))
+            if log:
+                log(f"Snapshot lama {lama} dihapus")
+    return ringkasan
+
+
+def daftar_snapshot():
+    """Nama snapshot yang lengkap, terbaru lebih dulu."""
+    if not os.path.isdir(folder()):
+        return []
+    return sorted(
+        (nama for nama in os.listdir(folder())
+         if not nama.endswith(".tmp") and os.path.isfile(os.path.join(folder(), nama, "SHA256SUMS"))),
+        reverse=True,
+    )
+
+
+def verifikasi(nama):
+    """Mencocokkan checksum setiap berkas snapshot; mengembalikan daftar berkas yang rusak/hilang."""
+    lokasi = os.path.join(folder(), nama)
+    rusak = []
+    with open(os.path.join(lokasi, "SHA256SUMS"), encoding="utf-8") as f:
+        for baris in f:
+            checksum, relatif = baris.rstrip("\n").split("  ", 1)
+            path = os.path.join(lokasi, relatif)
+            if not os.path.exists(path) or _sha256(path) != checksum:
+                rusak.append(relatif)
+    return rusak
+
+
+def pulihkan(nama, cadangan=True, log=print):
+    """Memulihkan database utama dan berkas arsip dari snapshot `nama`.
+
+    Checksum dicek lebih dulu. Keadaan sekarang disimpan dulu sebagai snapshot baru (kecuali
+    `cadangan=False`). Database utama ditimpa lewat backup API dalam satu langkah, sehingga aman
+    walaupun aplikasi sedang berjalan: koneksi lain melihat isi lama atau isi baru, tidak pernah
+    campuran. Migrasi dijalankan ulang jika snapshot berasal dari versi skema yang lebih lama.
+    Katalog di memori proses aplikasi baru segar setelah aplikasi dijalankan ulang.
+    """
+    import migrations
+
+    lokasi = os.path.join(folder(), nama)
+    if not os.path.isfile(os.path.join(lokasi, "SHA256SUMS")):
+        raise ValueError(f"Snapshot {nama} tidak ditemukan.")
+    rusak = verifikasi(nama)
+    if rusak:
+        raise RuntimeError(f"Checksum snapshot {nama} tidak cocok: {', '.join(rusak)}")
+    # Nama berkas database utama di snapshot mengikuti DB_PATH saat backup dibuat
+    utama = glob.glob(os.path.join(lokasi, "*.db"))
+    if len(utama) != 1:
+        raise RuntimeError(f"Snapshot {nama} tidak berisi tepat satu database utama.")
+    if cadangan:
+        ringkasan = buat(rotasi=False, log=None)
+        if log:
+            log(f"Keadaan sekarang disimpan sebagai snapshot {ringkasan['nama']}")
+
+    import arsip
+    pasangan = [(utama[0], db.DB_PATH)]
+    pasangan += [(path, os.path.join(arsip.folder(), os.path.basename(path)))
+                 for path in sorted(glob.glob(os.path.join(lokasi, "arsip", "*.db")))]
+    os.makedirs(arsip.folder(), exist_ok=True)
+    for sumber, tujuan in pasangan:
+        src = sqlite3.connect(_uri_baca(sumber), uri=True)
+        dst = sqlite3.connect(tujuan, timeout=db.PRAGMA_SETTINGS["busy_timeout"] / 1000)
+        try:
+            src.backup(dst)
+            if tujuan == db.DB_PATH:
+                migrations.migrate(dst)
+        finally:
+            src.close()
+            dst.close()
+        if log:
+            log(f"{os.path.relpath(sumber, lokasi)} -> {tujuan}")
+
+
+def _tulis_probe(conn, baris):
+    """Fungsi tulis (lihat writer.py) untuk ukur(): menyimpan ulang satu nilai dengan isi yang sama."""
+    import queries
+    conn.execute(queries.UPSERT_NILAI, baris)
+
+
+def _persentil(nilai, p):
+    urut = sorted(nilai)
+    return urut[min(len(urut) - 1, round(p / 100 * (len(urut) - 1)))] if urut else 0.0
+
+
+def ukur(detik_dasar=5.0, jeda_probe_ms=20, halaman=HALAMAN, jeda_ms=JEDA_MS, log=print):
+    """Mengukur throughput backup dan dampaknya ke latensi latar depan.
+
+    Probe membaca nilai satu kelas (query gradebook) dan menyimpan ulang satu nilai lewat
+    writer setiap `jeda_probe_ms`: dulu selama `detik_dasar` tanpa backup sebagai acuan, lalu
+    selama backup berjalan di thread latar. Snapshot hasil pengukuran tidak ikut dirotasi."""
+    import queries
+    import writer
+
+    conn = db.get_read_connection()
+    try:
+        baris = conn.execute("""
+            SELECT n.siswa_id, n.mapel_id, n.semester_id, n.tahap_id, n.nilai, n.tanggal_input, n.guru_id, n.catatan,
+                   s.kelas_id
+            FROM nilai n JOIN siswa s ON s.id = n.siswa_id
+            ORDER BY n.id DESC LIMIT 1
+        """).fetchone()
+        if baris is None:
+            raise SystemExit("Database belum berisi nilai untuk probe.")
+        baris_tulis, kelas_id = tuple(baris)[:8], baris["kelas_id"]
+
+        def probe(berhenti):
+            baca, tulis = [], []
+            while not berhenti():
+                t0 = time.perf_counter()
+                conn.execute(queries.NILAI_KELAS_MAPEL, (baris["semester_id"], baris["mapel_id"], kelas_id)).fetchall()
+                t1 = time.perf_counter()
+                writer.tulis(_tulis_probe, baris_tulis)
+                t2 = time.perf_counter()
+                baca.append((t1 - t0) * 1000)
+                tulis.append((t2 - t1) * 1000)
+                time.sleep(jeda_probe_ms / 1000)
+            return baca, tulis
+
+        batas = time.perf_counter() + detik_dasar
+        dasar = probe(lambda: time.perf_counter() >= batas)
+
+        hasil_backup = {}
+
+        def jalankan_backup():
+            try:
+                hasil_backup.update(buat(halaman, jeda_ms, rotasi=False, log=None))
+            except Exception as e:
+                hasil_backup["galat"] = repr(e)
+
+        t = threading.Thread(target=jalankan_backup, name="sinfomik-backup", daemon=True)
+        t.start()
+        selama = probe(lambda: not t.is_alive())
+        t.join()
+    finally:
+        conn.close()
+    if "galat" in hasil_backup:
+        raise RuntimeError(f"Backup gagal: {hasil_backup['galat']}")
+
+    def ringkas(ms):
+        return {"n": len(ms), "p50_ms": round(_persentil(ms, 50), 2), "p95_ms": round(_persentil(ms, 95), 2),
+                "maks_ms": round(max(ms), 2) if ms else 0.0}
+
+    laporan = {
+        "backup": hasil_backup,
+        "halaman_per_langkah": halaman,
+        "jeda_ms": jeda_ms,
+        "baca": {"dasar": ringkas(dasar[0]), "selama_backup": ringkas(selama[0])},
+        "tulis": {"dasar": ringkas(dasar[1]), "selama_backup": ringkas(selama[1])},
+    }
+    if log:
+        log(f"Backup {hasil_backup['ukuran'] / 1024 / 1024:.1f} MB dalam {hasil_backup['detik_salin']} s "
+            f"({hasil_backup['mb_per_detik']} MB/s), {hasil_backup['langkah']} langkah x {halaman} halaman, "
+            f"diulang {hasil_backup['ulang']}x")
+        for jenis in ("baca", "tulis"):
+            a, b = laporan[jenis]["dasar"], laporan[jenis]["selama_backup"]
+            log(f"  {jenis:<6} p50 {a['p50_ms']:8.2f} -> {b['p50_ms']:8.2f} ms   p95 {a['p95_ms']:8.2f} -> {b['p95_ms']:8.2f} ms"
+                f"   maks {a['maks_ms']:8.2f} -> {b['maks_ms']:8.2f} ms   (n {a['n']} / {b['n']})")
+    return laporan
+
+
+def _loop_terjadwal():
+    while True:
+        time.sleep(INTERVAL_MENIT * 60)
+        try:
+            buat(log=_logger.info)
+        except Exception:
+            _logger.exception("Backup terjadwal gagal")
+
+
+def mulai_terjadwal():
+    """Menjalankan backup berkala di thread latar jika SINFOMIK_BACKUP_INTERVAL_MENIT > 0.
+    Aman dipanggil di setiap rerun: thread hanya dibuat sekali per proses."""
+    global _thread
+    if INTERVAL_MENIT <= 0:
+        return
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop_terjadwal, name="sinfomik-backup", daemon=True)
+            _thread.start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup dan restore online database SINFOMIK.")
+    parser.add_argument("--db", default=db.DB_PATH)
+    aksi = parser.add_mutually_exclusive_group()
+    aksi.add_argument("--daftar", action="store_true", help="Daftar snapshot beserta hasil cek checksum")
+    aksi.add_argument("--pulihkan", metavar="SNAPSHOT", help="Pulihkan dari snapshot ini (nama folder)")
+    aksi.add_argument("--ukur", action="store_true", help="Ukur throughput backup dan dampaknya ke latensi")
+    parser.add_argument("--halaman", type=int, default=HALAMAN, help="Halaman database per langkah backup")
+    parser.add_argument("--jeda-ms", type=float, default=JEDA_MS, help="Jeda antar langkah backup")
+    parser.add_argument("--tanpa-cek", action="store_true", help="Lewati PRAGMA quick_check pada hasil backup")
+    parser.add_argument("--tanpa-cadangan", action="store_true", help="Saat memulihkan, jangan simpan keadaan sekarang dulu")
+    parser.add_argument("--output", help="Tulis laporan --ukur ke file JSON ini")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+
+    if args.daftar:
+        for nama in daftar_snapshot():
+            rusak = verifikasi(nama)
+            ukuran = sum(os.path.getsize(p) for p in glob.glob(os.path.join(folder(), nama, "**", "*.db"), recursive=True))
+            print(f"  {nama}  {ukuran / 1024 / 1024:9.1f} MB   {'RUSAK: ' + ', '.join(rusak) if rusak else 'checksum ok'}")
+        return 0
+    if args.pulihkan:
+        try:
+            pulihkan(args.pulihkan, cadangan=not args.tanpa_cadangan)
+        except (ValueError, RuntimeError) as e:
+            print(e)
+            return 1
+        print("Selesai. Jalankan ulang aplikasi agar katalog di memori dimuat ulang.")
+        return 0
+    if args.ukur:
+        laporan = ukur(halaman=args.halaman, jeda_ms=args.jeda_ms)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(laporan, f, indent=2, ensure_ascii=False)
+        return 0
+    buat(args.halaman, args.jeda_ms, cek=not args.tanpa_cek)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# Benchmark beban query per halaman terhadap database sintetis (lihat data_sintetis.py).
+#
+#     python data_sintetis.py --db bench.db --skala distrik
+#     python benchmark.py --db bench.db --output hasil_bench/sebelum.json
+#     python benchmark.py --db bench.db --output hasil_bench/sesudah.json --banding hasil_bench/sebelum.json
+#
+# Setiap workload menjalankan query yang sama persis dengan halamannya (SQL dari queries.py
+# dan fungsi halaman yang bisa dipanggil tanpa UI) lewat db.get_connection(), sehingga
+# pool, pragma, dan tracer ikut terukur. Parameter (guru, kelas, kata kunci, ...) dipilih
+# secara deterministik dari isi database, sehingga hasil antar-commit bisa dibandingkan.
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def _persentil(nilai, p):
+    urut = sorted(nilai)
+    return urut[min(len(urut) - 1, round(p / 100 * (len(urut) - 1)))]
+
+
+def _ukur(fungsi, ulang):
+    """Menjalankan fungsi `ulang` kali; mengembalikan statistik waktu (ms), rata-rata baris,
+    dan puncak alokasi memori Python (KiB) satu kali jalan.
+
+    Waktu diukur tanpa tracemalloc (yang memperlambat setiap alokasi, sehingga workload yang
+    banyak mengalokasi terlihat jauh lebih lambat dari sebenarnya). Memori diukur terpisah
+    dengan satu jalan tambahan di bawah tracemalloc."""
+    waktu, baris = [], []
+    for i in range(ulang):
+        mulai = time.perf_counter()
+        baris.append(fungsi(i))
+        waktu.append((time.perf_counter() - mulai) * 1000)
+    tracemalloc.start()
+    try:
+        fungsi(0)
+        _, puncak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "n": ulang,
+        "rata_ms": round(sum(waktu) / len(waktu), 3),
+        "p50_ms": round(_persentil(waktu, 50), 3),
+        "p95_ms": round(_persentil(waktu, 95), 3),
+        "maks_ms": round(max(waktu), 3),
+        "baris": round(sum(baris) / len(baris), 1),
+        "mem_puncak_kib": round(puncak / 1024, 1),
+    }
+
+
+def workloads(conn, rng):
+    """Daftar (nama, fungsi(i) -> jumlah baris) untuk setiap beban halaman."""
+    # Modul halaman diimpor di sini agar SINFOMIK_DB sudah terpasang sebelum db diimpor
+    import konteks_guru
+    import leger
+    import matapelajaran
+    import queries
+    from nilai import ambil_halaman_riwayat
+
+    cur = conn.cursor()
+    semester_aktif = cur.execute("SELECT id FROM semester WHERE aktif = 1").fetchone()[0]
+    penugasan_aktif = cur.execute(
+        "SELECT user_id, kelas_id, mapel_id FROM guru_mapel_kelas WHERE semester_id = ? ORDER BY id", (semester_aktif,)
+    ).fetchall()
+    guru_ids = sorted({p["user_id"] for p in penugasan_aktif})
+    tahap_ids = [r[0] for r in cur.execute("SELECT id FROM tahap_penilaian ORDER BY id")]
+    mapel_ids = [r[0] for r in cur.execute("SELECT id FROM mata_pelajaran ORDER BY id")]
+    semester_ids = [r[0] for r in cur.execute("SELECT id FROM semester ORDER BY id")]
+    nama_siswa = [r[0] for r in cur.execute("SELECT nama FROM siswa ORDER BY id LIMIT 2000")]
+    nisn_siswa = [str(r[0]) for r in cur.execute("SELECT nisn FROM siswa ORDER BY id LIMIT 2000")]
+    if not penugasan_aktif or not nama_siswa:
+        raise SystemExit("Database belum berisi penugasan/siswa. Jalankan data_sintetis.py terlebih dahulu.")
+
+    pilih = lambda daftar: daftar[rng.randrange(len(daftar))]
+
+    def nilai_konteks(i):
+        konteks = konteks_guru.bangun_konteks(conn, pilih(guru_ids))
+        return sum(len(s["kelas"]) for s in konteks["semester"].values())
+
+    def nilai_roster(i):
+        p = pilih(penugasan_aktif)
+        siswa = cur.execute(queries.SISWA_KELAS, (p["kelas_id"],)).fetchall()
+        nilai = cur.execute(queries.NILAI_KELAS_TAHAP, (semester_aktif, p["mapel_id"], pilih(tahap_ids), p["kelas_id"])).fetchall()
+        return len(siswa) + len(nilai)
+
+    def nilai_gradebook(i):
+        p = pilih(penugasan_aktif)
+        return len(cur.execute(queries.NILAI_KELAS_MAPEL, (semester_aktif, p["mapel_id"], p["kelas_id"])).fetchall())
+
+    def riwayat(filter_riwayat_dari):
+        def jalankan(i):
+            guru_id = pilih(guru_ids)
+            filter_riwayat = filter_riwayat_dari(guru_id)
+            sql, params = queries.riwayat_jumlah(guru_id, filter_riwayat)
+            cur.execute(sql, params).fetchone()
+            # Halaman pertama lalu dua halaman berikutnya lewat kursor keyset
+            total, kursor = 0, None
+            for _ in range(3):
+                rows, kursor = ambil_halaman_riwayat(cur, guru_id, filter_riwayat, kursor)
+                total += len(rows)
+                if kursor is None:
+                    break
+            return total
+        return jalankan
+
+    def filter_kelas_mapel(guru_id):
+        p = next(p for p in penugasan_aktif if p["user_id"] == guru_id)
+        return {"kelas_id": p["kelas_id"], "mapel_id": p["mapel_id"], "semester_id": semester_aktif, "tahap_id": None}
+
+    def siswa_daftar(i):
+        cur.execute(*queries.siswa_jumlah()).fetchone()
+        rows = cur.execute(*queries.siswa_halaman(batas=queries.SISWA_PER_HALAMAN + 1)).fetchall()
+        # Lompat ke halaman "tengah" lewat keyset dari nama acak
+        rows += cur.execute(*queries.siswa_halaman(setelah=(pilih(nama_siswa), 0), batas=queries.SISWA_PER_HALAMAN + 1)).fetchall()
+        return len(rows)
+
+    def siswa_cari(kata_kunci):
+        def jalankan(i):
+            cari = kata_kunci()
+            total = cur.execute(*queries.siswa_jumlah(cari)).fetchone()[0]
+            sql, params = queries.siswa_halaman(cari, batas=queries.SISWA_PER_HALAMAN + 1,
+                                                berperingkat=total <= queries.SISWA_CARI_PERINGKAT_MAKS)
+            return len(cur.execute(sql, params).fetchall())
+        return jalankan
+
+    def guru_penugasan(i):
+        return len(cur.execute(queries.PENUGASAN_DAFTAR).fetchall())
+
+    def mapel_config(i):
+        mapel_id = pilih(mapel_ids)
+        config = {row["semester_id"]: row["is_active"] for row in cur.execute(queries.CONFIG_MAPEL, (mapel_id,))}
+        # Simpan ulang konfigurasi yang sama seperti tombol simpan di halaman, lalu batalkan
+        matapelajaran.simpan_config_mapel(conn, mapel_id, {s: config.get(s, 0) for s in semester_ids})
+        conn.rollback()
+        return len(config)
+
+    def leger_sekolah(i):
+        # Leger seluruh sekolah untuk semester aktif: muat, pivot, dan tulis workbook
+        with tempfile.TemporaryDirectory() as folder:
+            return leger.buat(semester_aktif, os.path.join(folder, "leger.xlsx"))["siswa"]
+
+    # (nama, fungsi) atau (nama, fungsi, batas pengulangan) untuk workload yang berat
+    return [
+        ("nilai.konteks_guru", nilai_konteks),
+        ("nilai.roster_tahap", nilai_roster),
+        ("nilai.gradebook", nilai_gradebook),
+        ("nilai.riwayat_semua", riwayat(lambda guru_id: {})),
+        ("nilai.riwayat_terfilter", riwayat(filter_kelas_mapel)),
+        ("siswa.daftar", siswa_daftar),
+        ("siswa.cari_nama", siswa_cari(lambda: pilih(nama_siswa))),
+        ("siswa.cari_awalan", siswa_cari(lambda: pilih(nama_siswa)[:2])),
+        ("siswa.cari_nisn", siswa_cari(lambda: pilih(nisn_siswa)[:7])),
+        ("guru.load_penugasan", guru_penugasan),
+        ("matapelajaran.config", mapel_config),
+        ("leger.sekolah", leger_sekolah, 3),
+    ]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def jalankan(db_path, ulang=50, seed=1, hanya=None):
+    os.environ["SINFOMIK_DB"] = db_path
+    # Yang diukur adalah query-nya, bukan cache hasil query (cache_query.py)
+    os.environ["SINFOMIK_CACHE_QUERY"] = "0"
+    import db
+
+    conn = db.get_connection()
+    try:
+        rng = random.Random(seed)
+        ukuran = {
+            tabel: conn.execute(f"SELECT COUNT(*) FROM {tabel}").fetchone()[0]
+            for tabel in ("siswa", "user", "semester", "kelas", "guru_mapel_kelas", "nilai")
+        }
+        hasil = {}
+        for nama, fungsi, *batas in workloads(conn, rng):
+            if hanya and not any(nama.startswith(h) for h in hanya):
+                continue
+            # Urutan parameter tiap workload tidak bergantung pada workload lain (--hanya)
+            rng.seed(f"{seed}:{nama}")
+            fungsi(0)  # pemanasan: cache halaman SQLite dan import
+            hasil[nama] = _ukur(fungsi, min([ulang] + batas))
+            print(f"  {nama:<26} p50 {hasil[nama]['p50_ms']:9.2f} ms   p95 {hasil[nama]['p95_ms']:9.2f} ms"
+                  f"   baris {hasil[nama]['baris']:>9}   mem {hasil[nama]['mem_puncak_kib']:>9} KiB")
+    finally:
+        conn.close()
+
+    return {
+        "meta": {
+            "waktu": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "db": os.path.abspath(db_path),
+            "ukuran_db_mb": round(os.path.getsize(db_path) / 1024 / 1024, 1),
+            "ukuran_tabel": ukuran,
+            "ulang": ulang,
+            "seed": seed,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "hasil": hasil,
+    }
+
+
+def banding(hasil, acuan):
+    """Mencetak perbandingan p50/p95 terhadap file hasil sebelumnya."""
+    print(f"\nPerbandingan dengan {acuan['meta'].get('commit')} ({acuan['meta'].get('waktu')}):")
+    for nama, baru in hasil["hasil"].items():
+        lama = acuan["hasil"].get(nama)
+        if not lama:
+            print(f"  {nama:<26} (baru)")
+            continue
+        rasio = lambda k: baru[k] / lama[k] if lama[k] else float("inf")
+        print(f"  {nama:<26} p50 {lama['p50_ms']:9.2f} -> {baru['p50_ms']:9.2f} ms (x{rasio('p50_ms'):.2f})"
+              f"   p95 {lama['p95_ms']:9.2f} -> {baru['p95_ms']:9.2f} ms (x{rasio('p95_ms'):.2f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark beban query halaman SINFOMIK.")
+    parser.add_argument("--db", required=True, help="Database hasil data_sintetis.py")
+    parser.add_argument("--ulang", type=int, default=50, help="Jumlah pengulangan per workload")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--hanya", nargs="*", help="Hanya workload berawalan ini (misal: nilai siswa.cari)")
+    parser.add_argument("--output", help="Tulis hasil ke file JSON ini")
+    parser.add_argument("--banding", help="File JSON hasil sebelumnya sebagai acuan")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    print(f"Benchmark {args.db} ({args.ulang}x per workload)")
+    hasil = jalankan(args.db, args.ulang, args.seed, args.hanya)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(hasil, f, indent=2, ensure_ascii=False)
+        print(f"\nHasil ditulis ke {args.output}")
+    if args.banding:
+        with open(args.banding, encoding="utf-8") as f:
+            banding(hasil, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# Cache hasil query (LRU) yang dikunci oleh teks SQL, parameter, dan versi data database.
+#
+# Versi data dibaca dari `PRAGMA data_version` pada satu koneksi pengawas khusus yang tidak
+# pernah menulis. Nilainya berubah setiap kali koneksi LAIN meng-commit perubahan: thread
+# penulis (writer.py), koneksi sesi lain, maupun proses lain seperti skrip impor. Jadi hasil
+# yang tersimpan otomatis tidak terpakai lagi begitu data berubah, tanpa invalidasi manual.
+# Versi dibaca SEBELUM query dijalankan; jika ada commit di antaranya, hasil yang tersimpan
+# lebih baru dari versinya dan tetap benar.
+#
+# Berbeda dengan katalog.py (tabel referensi kecil, invalidasi eksplisit per nama), cache ini
+# untuk query halaman yang berulang dengan parameter sama di rerun berikutnya (misalnya hanya
+# toggle UI yang berubah). Setiap commit mengosongkan seluruh isinya.
+#
+# Batas memori: SINFOMIK_CACHE_QUERY_ENTRI entri dan SINFOMIK_CACHE_QUERY_BARIS baris total;
+# entri yang paling lama tidak dipakai dibuang lebih dulu. Hasil berupa tuple sqlite3.Row
+# yang dipakai bersama antar sesi, jadi jangan diubah. Matikan dengan SINFOMIK_CACHE_QUERY=0.
+import os
+import threading
+from collections import OrderedDict
+
+import db
+
+AKTIF = os.getenv("SINFOMIK_CACHE_QUERY", "1") != "0"
+MAKS_ENTRI = int(os.getenv("SINFOMIK_CACHE_QUERY_ENTRI", "256"))
+MAKS_BARIS = int(os.getenv("SINFOMIK_CACHE_QUERY_BARIS", "300000"))
+
+_lock = threading.Lock()
+_lru = OrderedDict()  # (sql, params, versi) -> tuple baris
+_versi_terakhir = None
+_pengawas = None
+_stats = {"hit": 0, "miss": 0, "dibuang": 0, "perubahan_data": 0, "terlalu_besar": 0}
+_total_baris = 0
+
+
+def versi_data():
+    """Nilai PRAGMA data_version dari koneksi pengawas (berubah setelah setiap commit)."""
+    global _pengawas
+    with _lock:
+        if _pengawas is None:
+            _pengawas = db.open_read_connection()
+        return _pengawas.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _kosongkan_tanpa_lock():
+    global _total_baris
+    _lru.clear()
+    _total_baris = 0
+
+
+def ambil(conn, sql, params=()):
+    """Hasil `conn.execute(sql, params).fetchall()` sebagai tuple, dari cache bila data
+    belum berubah sejak hasil itu disimpan. `conn` boleh koneksi atau cursor."""
+    global _versi_terakhir, _total_baris
+    if not AKTIF:
+        return tuple(conn.execute(sql, params).fetchall())
+
+    versi = versi_data()
+    kunci = (sql, tuple(params), versi)
+    with _lock:
+        if versi != _versi_terakhir:
+            # Semua entri versi lama tidak akan pernah cocok lagi: buang sekarang
+            if _versi_terakhir is not None:
+                _stats["perubahan_data"] += 1
+            _kosongkan_tanpa_lock()
+            _versi_terakhir = versi
+        hasil = _lru.get(kunci)
+        if hasil is not None:
+            _lru.move_to_end(kunci)
+            _stats["hit"] += 1
+            return hasil
+        _stats["miss"] += 1
+
+    hasil = tuple(conn.execute(sql, params).fetchall())
+
+    with _lock:
+        if len(hasil) > MAKS_BARIS:
+            _stats["terlalu_besar"] += 1
+        elif versi == _versi_terakhir and kunci not in _lru:
+            _lru[kunci] = hasil
+            _total_baris += len(hasil)
+            while len(_lru) > MAKS_ENTRI or _total_baris > MAKS_BARIS:
+                _, dibuang = _lru.popitem(last=False)
+                _total_baris -= len(dibuang)
+                _stats["dibuang"] += 1
+    return hasil
+
+
+def kosongkan():
+    with _lock:
+        _kosongkan_tanpa_lock()
+
+
+def statistik():
+    """Hit/miss sejak proses berjalan, jumlah entri dan baris yang tersimpan, entri yang
+    dibuang karena batas LRU, berapa kali data berubah, dan hasil yang terlalu besar."""
+    with _lock:
+        s = dict(_stats, entri=len(_lru), baris=_total_baris)
+    total = s["hit"] + s["miss"]
+    s["rasio_hit"] = round(s["hit"] / total, 3) if total else 0.0
+    return s
@@ -0,0 +1,307 @@
+# Cetak rapor PDF massal: satu PDF per siswa atau satu PDF per kelas (satu halaman per siswa),
+# dikemas dalam satu ZIP.
+#
+#     python cetak_rapor.py --db sinfomik.db --semester 20 --output rapor.zip
+#     python cetak_rapor.py --db sinfomik.db --semester 20 --per-kelas --kelas 1 2 3 --proses 4
+#
+# Alurnya:
+# 1. Nilai akhir, predikat, dan peringkat dihitung sekali oleh rapor.py (di halaman Rapor hasil
+#    yang sudah ada di sesi dipakai ulang).
+# 2. Hasil itu ditulis ke satu berkas SQLite sementara (snapshot) yang dibuka read-only
+#    (immutable) oleh setiap proses pekerja, sehingga pekerja tidak menyentuh database aplikasi
+#    dan tidak perlu menerima data besar lewat pickle.
+# 3. Satu tugas = satu kelas. Tugas dibagi ke ProcessPoolExecutor (start method "spawn": aman
+#    untuk proses Streamlit yang punya banyak thread, dan sama di Windows). Paling banyak
+#    2 x jumlah proses tugas yang berjalan sekaligus.
+# 4. Setiap PDF yang selesai langsung ditulis ke ZIP di disk lalu dibuang dari memori, jadi
+#    pemakaian memori tidak bergantung pada jumlah siswa.
+# Berkas hasil halaman Rapor (ZIP, leger, ekspor nilai) disimpan di folder() dan baru dibaca saat
+# tombol unduh diklik (pembaca). Setiap kali berkas baru dibuat, bersihkan() menghapus berkas
+# yang lebih tua dari SINFOMIK_CETAK_UMUR_JAM (default 24 jam) milik sesi mana pun.
+import argparse
+import concurrent.futures
+import datetime
+import io
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.parse
+import zipfile
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+PROSES = int(os.getenv("SINFOMIK_CETAK_PROSES", "0")) or os.cpu_count() or 1
+# Berkas di folder cetak (ZIP rapor, leger, ekspor nilai) dihapus setelah sekian jam
+UMUR_BERKAS_JAM = float(os.getenv("SINFOMIK_CETAK_UMUR_JAM", "24"))
+
+_SKEMA = """
+    CREATE TABLE meta (kunci TEXT PRIMARY KEY, nilai TEXT);
+    CREATE TABLE kelas (kelas_id INTEGER PRIMARY KEY, label TEXT, jumlah_siswa INTEGER);
+    CREATE TABLE siswa (siswa_id INTEGER PRIMARY KEY, kelas_id INTEGER, nisn TEXT, nama TEXT, rata REAL, peringkat INTEGER);
+    CREATE TABLE rapor (siswa_id INTEGER, mapel TEXT, nilai_akhir REAL, predikat TEXT, tahap_kurang INTEGER);
+"""
+_INDEX = """
+    CREATE INDEX idx_siswa_kelas ON siswa (kelas_id, nama);
+    CREATE INDEX idx_rapor_siswa ON rapor (siswa_id, mapel);
+"""
+
+
+def folder():
+    import db
+    return os.getenv("SINFOMIK_CETAK_DIR") or os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), "cetak")
+
+
+def bersihkan(umur_jam=UMUR_BERKAS_JAM):
+    """Menghapus berkas di folder cetak yang lebih tua dari `umur_jam`, termasuk hasil sesi lain
+    yang sudah ditinggalkan dan sisa .tmp. Mengembalikan jumlah berkas yang dihapus."""
+    path = folder()
+    if not os.path.isdir(path):
+        return 0
+    batas = time.time() - umur_jam * 3600
+    dihapus = 0
+    for entri in os.scandir(path):
+        try:
+            if entri.is_file() and entri.stat().st_mtime < batas:
+                os.remove(entri.path)
+                dihapus += 1
+        except OSError:
+            # Sudah dihapus sesi lain, atau masih dibuka (Windows)
+            pass
+    return dihapus
+
+
+def pembaca(path):
+    """Fungsi tanpa argumen untuk `data` st.download_button: berkas baru dibaca saat tombol
+    unduh diklik, bukan di setiap rerun halaman."""
+    def baca():
+        with open(path, "rb") as f:
+            return f.read()
+    return baca
+
+
+def buat_snapshot(hasil, semester_id, path, kelas_ids=None):
+    """Menulis hasil rapor.hitung_rapor() untuk satu semester ke berkas SQLite `path`.
+    Mengembalikan daftar (kelas_id, jumlah siswa) yang punya rapor, urut label kelas."""
+    import katalog
+    import rapor
+
+    nilai = hasil["rapor"][hasil["rapor"]["semester_id"] == semester_id]
+    urutan = hasil["peringkat"][hasil["peringkat"]["semester_id"] == semester_id]
+    if kelas_ids is not None:
+        urutan = urutan[urutan["kelas_id"].isin(kelas_ids)]
+    nilai = nilai[nilai["siswa_id"].isin(urutan["siswa_id"])]
+    siswa = hasil["siswa"].set_index("siswa_id").loc[urutan["siswa_id"]]
+    jumlah_per_kelas = urutan.groupby("kelas_id").size()
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(_SKEMA)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("semester", katalog.label("semester", semester_id)),
+            ("predikat", ", ".join(f"{p}: {b}-100" if i == 0 else f"{p}: {b}-{rapor.BATAS_PREDIKAT[i - 1][0] - 1}"
+                                   for i, (b, p) in enumerate(rapor.BATAS_PREDIKAT))),
+            ("tanggal", datetime.date.today().strftime("%d-%m-%Y")),
+        ])
+        conn.executemany("INSERT INTO kelas VALUES (?, ?, ?)", [
+            (int(k), katalog.label("kelas", int(k)), int(n)) for k, n in jumlah_per_kelas.items()])
+        conn.executemany("INSERT INTO siswa VALUES (?, ?, ?, ?, ?, ?)", zip(
+            urutan["siswa_id"].tolist(), urutan["kelas_id"].tolist(), siswa["nisn"].astype(str).tolist(),
+            siswa["nama"].tolist(), urutan["rata"].tolist(), urutan["peringkat"].tolist()))
+        label_mapel = {m: katalog.label("mapel", m) for m in nilai["mapel_id"].unique().tolist()}
+        conn.executemany("INSERT INTO rapor VALUES (?, ?, ?, ?, ?)", zip(
+            nilai["siswa_id"].tolist(), [label_mapel[m] for m in nilai["mapel_id"].tolist()],
+            nilai["nilai_akhir"].tolist(), nilai["predikat"].tolist(), nilai["tahap_kurang"].tolist()))
+        conn.executescript(_INDEX)
+        conn.commit()
+        return [tuple(r) for r in conn.execute("SELECT kelas_id, jumlah_siswa FROM kelas ORDER BY label")]
+    finally:
+        conn.close()
+
+
+# --- Proses pekerja ---
+
+_snapshot = None
+
+
+def _mulai_pekerja(path):
+    global _snapshot
+    uri = "file:" + urllib.parse.quote(os.path.abspath(path)) + "?mode=ro&immutable=1"
+    _snapshot = sqlite3.connect(uri, uri=True)
+
+
+def _nama_berkas(teks):
+    return re.sub(r"[^\w.-]+", "_", teks).strip("_")
+
+
+def _halaman_siswa(meta, kelas_label, siswa, jumlah_siswa, baris_nilai, gaya):
+    siswa_id, nisn, nama, rata, peringkat = siswa
+    elemen = [
+        Paragraph("LAPORAN HASIL BELAJAR", gaya["Title"]),
+        Table([["Nama", f": {nama}", "Kelas", f": {kelas_label}"],
+               ["NISN", f": {nisn}", "Semester", f": {meta['semester']}"]],
+              colWidths=[2.2 * cm, 7.3 * cm, 2.2 * cm, 5.3 * cm]),
+        Spacer(1, 0.5 * cm),
+    ]
+    tabel = [["No", "Mata Pelajaran", "Nilai Akhir", "Predikat", "Keterangan"]]
+    for i, (mapel, nilai_akhir, predikat, tahap_kurang) in enumerate(baris_nilai, 1):
+        keterangan = f"Belum lengkap ({tahap_kurang} tahap)" if tahap_kurang else ""
+        tabel.append([i, mapel, f"{nilai_akhir:.2f}", predikat, keterangan])
+    t = Table(tabel, colWidths=[1 * cm, 7 * cm, 2.5 * cm, 2 * cm, 4.5 * cm], repeatRows=1)
+    t.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("ALIGN", (2, 1), (3, -1), "CENTER"),
+        ("ALIGN", (0, 1), (0, -1), "CENTER"),
+    ]))
+    elemen += [
+        t,
+        Spacer(1, 0.5 * cm),
+        Paragraph(f"Rata-rata nilai akhir: <b>{rata:.2f}</b> &nbsp;&nbsp; "
+                  f"Peringkat: <b>{peringkat}</b> dari {jumlah_siswa} siswa", gaya["Normal"]),
+        Paragraph(f"Predikat &mdash; {meta['predikat']}", gaya["Normal"]),
+        Spacer(1, 1 * cm),
+        Paragraph(f"Dicetak {meta['tanggal']}", gaya["Normal"]),
+    ]
+    return elemen
+
+
+def _pdf(elemen, judul):
+    buf = io.BytesIO()
+    SimpleDocTemplate(buf, pagesize=A4, title=judul, leftMargin=2 * cm, rightMargin=2 * cm,
+                      topMargin=2 * cm, bottomMargin=2 * cm).build(elemen)
+    return buf.getvalue()
+
+
+def _render_kelas(kelas_id, per_kelas):
+    """Tugas satu kelas di proses pekerja: daftar (nama berkas di ZIP, isi PDF)."""
+    meta = dict(_snapshot.execute("SELECT kunci, nilai FROM meta"))
+    kelas_label, jumlah_siswa = _snapshot.execute(
+        "SELECT label, jumlah_siswa FROM kelas WHERE kelas_id = ?", (kelas_id,)).fetchone()
+    daftar_siswa = _snapshot.execute(
+        "SELECT siswa_id, nisn, nama, rata, peringkat FROM siswa WHERE kelas_id = ? ORDER BY nama", (kelas_id,)).fetchall()
+    gaya = getSampleStyleSheet()
+    folder_kelas = _nama_berkas(kelas_label)
+
+    hasil, semua = [], []
+    for siswa in daftar_siswa:
+        baris_nilai = _snapshot.execute(
+            "SELECT mapel, nilai_akhir, predikat, tahap_kurang FROM rapor WHERE siswa_id = ? ORDER BY mapel",
+            (siswa[0],)).fetchall()
+        elemen = _halaman_siswa(meta, kelas_label, siswa, jumlah_siswa, baris_nilai, gaya)
+        if per_kelas:
+            semua += elemen + [PageBreak()]
+        else:
+            hasil.append((f"{folder_kelas}/{siswa[1]}_{_nama_berkas(siswa[2])}.pdf",
+                          _pdf(elemen, f"Rapor {siswa[2]}")))
+    if per_kelas and semua:
+        hasil.append((f"{folder_kelas}.pdf", _pdf(semua[:-1], f"Rapor kelas {kelas_label}")))
+    return hasil
+
+
+# --- Proses utama ---
+
+def cetak(hasil, semester_id, tujuan, per_kelas=False, kelas_ids=None, proses=PROSES, progres=None):
+    """Merender rapor satu semester ke ZIP `tujuan`. `hasil` adalah keluaran
+    rapor.hitung_rapor(). `progres(selesai, total)` dipanggil setiap satu kelas selesai
+    (dalam jumlah siswa). Mengembalikan ringkasan: siswa, berkas, ukuran, detik per tahap."""
+    waktu = {}
+    mulai = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(tujuan)), exist_ok=True)
+    fd, snapshot = tempfile.mkstemp(suffix=".db", prefix="snapshot_", dir=os.path.dirname(os.path.abspath(tujuan)))
+    os.close(fd)
+    os.remove(snapshot)
+    try:
+        daftar_kelas = buat_snapshot(hasil, semester_id, snapshot, kelas_ids)
+        waktu["snapshot"] = time.perf_counter() - mulai
+
+        mulai = time.perf_counter()
+        total = sum(n for _, n in daftar_kelas)
+        selesai, berkas = 0, 0
+        jumlah_siswa = dict(daftar_kelas)
+        antre = iter(daftar_kelas)
+        sementara = tujuan + ".tmp"
+        with zipfile.ZipFile(sementara, "w", zipfile.ZIP_DEFLATED) as zf, \
+                concurrent.futures.ProcessPoolExecutor(
+                    max_workers=proses, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_mulai_pekerja, initargs=(snapshot,)) as pool:
+            berjalan = {}
+
+            def isi_antrean():
+                # Jendela terbatas: hasil yang menunggu ditulis tidak menumpuk di memori
+                while len(berjalan) < 2 * proses:
+                    kelas = next(antre, None)
+                    if kelas is None:
+                        return
+                    berjalan[pool.submit(_render_kelas, kelas[0], per_kelas)] = kelas[0]
+
+            isi_antrean()
+            while berjalan:
+                siap, _ = concurrent.futures.wait(berjalan, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in siap:
+                    kelas_id = berjalan.pop(fut)
+                    for nama, isi in fut.result():
+                        zf.writestr(nama, isi)
+                        berkas += 1
+                    selesai += jumlah_siswa[kelas_id]
+                    if progres:
+                        progres(selesai, total)
+                isi_antrean()
+        os.replace(sementara, tujuan)
+        waktu["render"] = time.perf_counter() - mulai
+    except BaseException:
+        if os.path.exists(tujuan + ".tmp"):
+            os.remove(tujuan + ".tmp")
+        raise
+    finally:
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+    return {"siswa": total, "kelas": len(daftar_kelas), "berkas": berkas, "ukuran": os.path.getsize(tujuan),
+            "proses": proses, "waktu": waktu}
+
+
+def main(argv=None):
+    import db
+
+    parser = argparse.ArgumentParser(description="Cetak rapor PDF massal ke satu ZIP.")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--semester", type=int, required=True, metavar="ID")
+    parser.add_argument("--kelas", type=int, nargs="+", metavar="ID", help="Hanya kelas ini (default semua)")
+    parser.add_argument("--per-kelas", action="store_true", help="Satu PDF per kelas, bukan per siswa")
+    parser.add_argument("--proses", type=int, default=PROSES, help="Jumlah proses pekerja")
+    parser.add_argument("--output", required=True, help="Berkas ZIP tujuan")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+    import rapor
+
+    mulai = time.perf_counter()
+    hasil = rapor.hitung_rapor([args.semester])
+    detik_hitung = time.perf_counter() - mulai
+
+    def progres(selesai, total):
+        print(f"\r  {selesai}/{total} siswa", end="", flush=True)
+
+    ringkasan = cetak(hasil, args.semester, args.output, args.per_kelas, args.kelas, args.proses, progres)
+    print()
+    waktu = ringkasan["waktu"]
+    print(f"{ringkasan['siswa']} siswa di {ringkasan['kelas']} kelas -> {ringkasan['berkas']} PDF, "
+          f"{ringkasan['ukuran'] / 1024 / 1024:.1f} MB ({args.output})")
+    print(f"  hitung {detik_hitung:.2f} s   snapshot {waktu['snapshot']:.2f} s   render {waktu['render']:.2f} s "
+          f"dengan {ringkasan['proses']} proses ({ringkasan['siswa'] / waktu['render']:.0f} siswa/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
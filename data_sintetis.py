@@ -0,0 +1,215 @@
+# Generator data sekolah sintetis untuk uji skala dan benchmark.
+#
+# Mengisi skema asli (lewat migrations.migrate) dengan data yang deterministik: seed dan
+# skala yang sama selalu menghasilkan isi database yang sama, sehingga hasil benchmark
+# antar-commit bisa dibandingkan. Contoh:
+#
+#     python data_sintetis.py --db bench.db --skala distrik
+#     python data_sintetis.py --db kecil.db --skala kecil --siswa 2000 --seed 7
+#
+# Skala "distrik" menghasilkan 50 ribu siswa, 500 guru, 20 semester, dan sekitar
+# 3,2 juta baris nilai.
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+import migrations
+
+SKALA = {
+    "kecil": {"siswa": 1000, "guru": 30, "semester": 4, "kelas": 30, "mapel": 12,
+              "mapel_per_kelas": 6, "semester_dinilai": 2},
+    "sedang": {"siswa": 10000, "guru": 150, "semester": 10, "kelas": 300, "mapel": 16,
+               "mapel_per_kelas": 8, "semester_dinilai": 2},
+    "distrik": {"siswa": 50000, "guru": 500, "semester": 20, "kelas": 1500, "mapel": 20,
+                "mapel_per_kelas": 8, "semester_dinilai": 2},
+}
+
+NAMA_DEPAN = [
+    "Adi", "Agus", "Ahmad", "Aisyah", "Andi", "Anisa", "Ayu", "Bagus", "Bayu", "Budi", "Citra", "Dani",
+    "Dewi", "Dian", "Dimas", "Eka", "Eko", "Fajar", "Fitri", "Galih", "Gita", "Hadi", "Hana", "Indah",
+    "Intan", "Joko", "Kartika", "Lestari", "Lina", "Made", "Maya", "Muhammad", "Nadia", "Nur", "Putri",
+    "Putu", "Rahmat", "Ratna", "Rizky", "Sari", "Siti", "Sri", "Taufik", "Tri", "Wahyu", "Wati", "Yoga",
+    "Yusuf", "Zahra", "Zulkifli",
+]
+NAMA_BELAKANG = [
+    "Pratama", "Saputra", "Santoso", "Wijaya", "Kurniawan", "Hidayat", "Nugroho", "Setiawan", "Lestari",
+    "Rahayu", "Permata", "Siregar", "Nasution", "Harahap", "Simanjuntak", "Sihombing", "Gunawan",
+    "Purnomo", "Utami", "Wulandari", "Susanti", "Hakim", "Ramadhan", "Maharani", "Kusuma", "Putra",
+    "Anggraini", "Firmansyah", "Suryadi", "Halim",
+]
+MAPEL = [
+    "Matematika", "Bahasa Indonesia", "Bahasa Inggris", "Fisika", "Kimia", "Biologi", "Sejarah",
+    "Geografi", "Ekonomi", "Sosiologi", "PPKn", "Pendidikan Agama", "Seni Budaya", "PJOK",
+    "Informatika", "Prakarya", "Bahasa Jawa", "Bahasa Sunda", "Antropologi", "Bahasa Arab",
+    "Bahasa Jepang", "Bahasa Jerman", "Sastra Indonesia", "Matematika Lanjut",
+]
+TINGKAT = ["10", "11", "12"]
+UKURAN_BATCH = 50000
+
+
+def _nama_kelas(i):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'A2', ... agar nama kelas per tingkat selalu unik."""
+    huruf = chr(ord("A") + i % 26)
+    putaran = i // 26
+    return huruf if putaran == 0 else f"{huruf}{putaran + 1}"
+
+
+def _batch(iterable, ukuran=UKURAN_BATCH):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= ukuran:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(conn, siswa, guru, semester, kelas, mapel, mapel_per_kelas, semester_dinilai, seed=42, log=print):
+    """Mengisi database yang sudah dimigrasi. Data awal dari migrasi (admin, siti, kelas,
+    mapel, tahap) dibiarkan; data sintetis ditambahkan di atasnya."""
+    rng = random.Random(seed)
+    cur = conn.cursor()
+    mulai = time.perf_counter()
+
+    def selesai(langkah, jumlah):
+        log(f"  {langkah:<24} {jumlah:>10,} baris  ({time.perf_counter() - mulai:6.1f} s)")
+
+    # Tahun ajaran dan semester: 2 semester per tahun ajaran, yang terakhir aktif
+    jumlah_tahun = (semester + 1) // 2
+    tahun_awal = 2025 - jumlah_tahun + 1
+    cur.executemany("INSERT OR IGNORE INTO tahun_ajaran (th_ajar) VALUES (?)",
+                    [(f"{t}/{t + 1}",) for t in range(tahun_awal, tahun_awal + jumlah_tahun)])
+    th_ajar_id = dict(cur.execute("SELECT th_ajar, id FROM tahun_ajaran").fetchall())
+    sm_pil_id = dict(cur.execute("SELECT sm_pil, id FROM semester_pil").fetchall())
+    cur.execute("UPDATE semester SET aktif = 0")
+    daftar_semester = []  # (id, tanggal mulai)
+    for i in range(semester):
+        tahun = tahun_awal + i // 2
+        pil = "Ganjil" if i % 2 == 0 else "Genap"
+        th_ajar = f"{tahun}/{tahun + 1}"
+        cur.execute(
+            "INSERT OR IGNORE INTO semester (th_ajar_id, sm_pil_id, nama_semester, aktif) VALUES (?, ?, ?, 0)",
+            (th_ajar_id[th_ajar], sm_pil_id[pil], f"{pil} {th_ajar}"),
+        )
+        sem_id = cur.execute("SELECT id FROM semester WHERE th_ajar_id = ? AND sm_pil_id = ?",
+                             (th_ajar_id[th_ajar], sm_pil_id[pil])).fetchone()[0]
+        daftar_semester.append((sem_id, date(tahun, 7, 15) if pil == "Ganjil" else date(tahun + 1, 1, 8)))
+    cur.execute("UPDATE semester SET aktif = 1 WHERE id = ?", (daftar_semester[-1][0],))
+    selesai("semester", semester)
+
+    # Kelas, dibagi rata ke tingkat 10-12
+    cur.executemany("INSERT OR IGNORE INTO kelas (nama_kelas, tingkat) VALUES (?, ?)",
+                    [(_nama_kelas(i // len(TINGKAT)), TINGKAT[i % len(TINGKAT)]) for i in range(kelas)])
+    kelas_ids = [r[0] for r in cur.execute("SELECT id FROM kelas ORDER BY id").fetchall()][:kelas]
+    selesai("kelas", len(kelas_ids))
+
+    # Mata pelajaran (nama diulang dengan nomor jika skala melebihi daftar)
+    cur.executemany("INSERT OR IGNORE INTO mata_pelajaran (nama_mapel, kode_mapel) VALUES (?, ?)", [
+        (MAPEL[i % len(MAPEL)] + ("" if i < len(MAPEL) else f" {i // len(MAPEL) + 1}"), f"SIN-{i + 1:03d}")
+        for i in range(mapel)
+    ])
+    mapel_ids = [r[0] for r in cur.execute("SELECT id FROM mata_pelajaran WHERE kode_mapel LIKE 'SIN-%' ORDER BY id")]
+    tahap_ids = [r[0] for r in cur.execute("SELECT id FROM tahap_penilaian ORDER BY id")]
+    selesai("mata_pelajaran", len(mapel_ids))
+
+    # Akun guru
+    cur.executemany("INSERT OR IGNORE INTO user (username, password, role) VALUES (?, ?, 'guru')",
+                    [(f"guru{i + 1:04d}", f"guru{i + 1:04d}") for i in range(guru)])
+    guru_ids = [r[0] for r in cur.execute("SELECT id FROM user WHERE username LIKE 'guru____' ORDER BY id")]
+    selesai("guru", len(guru_ids))
+
+    # Siswa; kelas tetap sepanjang data (cukup untuk kebutuhan benchmark)
+    nisn_awal = 1000000000 + rng.randrange(0, 1000) * 1000000
+    data_siswa = [
+        (nisn_awal + i, f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}", kelas_ids[i % len(kelas_ids)])
+        for i in range(siswa)
+    ]
+    for batch in _batch(data_siswa):
+        cur.executemany("INSERT OR IGNORE INTO siswa (nisn, nama, kelas_id) VALUES (?, ?, ?)", batch)
+    siswa_per_kelas = {}
+    for siswa_id, kelas_id in cur.execute("SELECT id, kelas_id FROM siswa WHERE nisn >= ? ORDER BY id", (nisn_awal,)):
+        siswa_per_kelas.setdefault(kelas_id, []).append(siswa_id)
+    selesai("siswa", siswa)
+
+    # Mapel yang diajarkan tiap kelas (tetap antar semester) dan gurunya per semester
+    mapel_kelas = {k: rng.sample(mapel_ids, min(mapel_per_kelas, len(mapel_ids))) for k in kelas_ids}
+    penugasan = {}  # (semester_id, kelas_id, mapel_id) -> guru_id
+    for sem_id, _ in daftar_semester:
+        for kelas_id in kelas_ids:
+            for mapel_id in mapel_kelas[kelas_id]:
+                penugasan[(sem_id, kelas_id, mapel_id)] = rng.choice(guru_ids)
+    for batch in _batch((g, m, k, s) for (s, k, m), g in penugasan.items()):
+        cur.executemany("INSERT OR IGNORE INTO guru_mapel_kelas (user_id, mapel_id, kelas_id, semester_id) VALUES (?, ?, ?, ?)", batch)
+    selesai("guru_mapel_kelas", len(penugasan))
+
+    # Konfigurasi mapel per semester: ~90% aktif
+    config = [(m, s, 1 if rng.random() < 0.9 else 0) for s, _ in daftar_semester for m in mapel_ids]
+    cur.executemany("INSERT OR IGNORE INTO mapel_semester_config (mapel_id, semester_id, is_active) VALUES (?, ?, ?)", config)
+    selesai("mapel_semester_config", len(config))
+
+    # Nilai untuk semester-semester terakhir; dibangkitkan bertahap agar memori tetap kecil
+    def baris_nilai():
+        for sem_id, tanggal_mulai in daftar_semester[-semester_dinilai:]:
+            for kelas_id in kelas_ids:
+                for mapel_id in mapel_kelas[kelas_id]:
+                    guru_id = penugasan[(sem_id, kelas_id, mapel_id)]
+                    for urutan, tahap_id in enumerate(tahap_ids):
+                        tanggal = (tanggal_mulai + timedelta(days=20 + urutan * 25 + rng.randrange(10))).isoformat()
+                        for siswa_id in siswa_per_kelas.get(kelas_id, ()):
+                            nilai = round(min(100.0, max(0.0, rng.gauss(78, 10))), 1)
+                            yield (siswa_id, mapel_id, sem_id, tahap_id, nilai, tanggal, guru_id)
+
+    jumlah_nilai = 0
+    for batch in _batch(baris_nilai()):
+        cur.executemany(
+            "INSERT OR IGNORE INTO nilai (siswa_id, mapel_id, semester_id, tahap_id, nilai, tanggal_input, guru_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        jumlah_nilai += len(batch)
+    selesai("nilai", jumlah_nilai)
+    conn.commit()
+    cur.execute("ANALYZE")
+    conn.commit()
+    return jumlah_nilai
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Isi database SINFOMIK dengan data sekolah sintetis.")
+    parser.add_argument("--db", required=True, help="Path database tujuan (dibuat baru)")
+    parser.add_argument("--skala", choices=sorted(SKALA), default="kecil")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timpa", action="store_true", help="Hapus database tujuan jika sudah ada")
+    for nama in SKALA["kecil"]:
+        parser.add_argument(f"--{nama.replace('_', '-')}", type=int, dest=nama, help="Menimpa nilai dari --skala")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        if not args.timpa:
+            parser.error(f"{args.db} sudah ada; pakai --timpa untuk membuat ulang.")
+        for akhiran in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + akhiran):
+                os.remove(args.db + akhiran)
+
+    ukuran = dict(SKALA[args.skala])
+    ukuran.update({k: getattr(args, k) for k in ukuran if getattr(args, k) is not None})
+    ukuran["semester_dinilai"] = min(ukuran["semester_dinilai"], ukuran["semester"])
+
+    conn = sqlite3.connect(args.db)
+    # Pemuatan massal: jurnal dan fsync dimatikan, WAL dinyalakan lagi setelah selesai
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-200000")
+    migrations.migrate(conn)
+    print(f"Membuat data sintetis '{args.skala}' (seed {args.seed}) di {args.db}: {ukuran}")
+    generate(conn, seed=args.seed, **ukuran)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    print("Selesai.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,201 +1,253 @@
+import os
 import sqlite3
+import threading
+import urllib.parse
+import weakref
 
-DB_PATH = "sinfomik.db"
+import migrations
+import tracer
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+DB_PATH = os.getenv("SINFOMIK_DB", "sinfomik.db")
+
+# Pengaturan PRAGMA untuk setiap koneksi baru. Bisa diubah lewat environment
+# variable tanpa menyentuh kode (misal SINFOMIK_SYNCHRONOUS=FULL).
+PRAGMA_SETTINGS = {
+    "synchronous": os.getenv("SINFOMIK_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("SINFOMIK_CACHE_SIZE", "-16000")),  # negatif = KiB, jadi ~16 MB
+    "mmap_size": int(os.getenv("SINFOMIK_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "busy_timeout": int(os.getenv("SINFOMIK_BUSY_TIMEOUT", "5000")),  # milidetik
+}
+
+POOL_SIZE = int(os.getenv("SINFOMIK_POOL_SIZE", "8"))
+READ_POOL_SIZE = int(os.getenv("SINFOMIK_READ_POOL_SIZE", "16"))
+POOL_TIMEOUT = float(os.getenv("SINFOMIK_POOL_TIMEOUT", "2.0"))  # detik menunggu koneksi bebas
+
+
+def _open_connection():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    # WAL bersifat persisten di file database, tapi tetap di-set agar file baru ikut WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    for name, value in PRAGMA_SETTINGS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    # Foreign key selalu ditegakkan: ON DELETE CASCADE/SET NULL di skema (migrasi 5)
+    # hanya bekerja jika pragma ini aktif, dan SQLite mematikannya secara default
+    conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
+
+def _open_read_connection():
+    # Jalur baca: mode=ro di level file, ditambah query_only sebagai pengaman kedua.
+    # Dengan WAL setiap query membaca snapshot yang sudah di-commit, sehingga pembaca
+    # tidak pernah menunggu penulis dan penulis tidak pernah menunggu pembaca.
+    uri = "file:" + urllib.parse.quote(os.path.abspath(DB_PATH)) + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name in ("cache_size", "mmap_size", "busy_timeout"):
+        conn.execute(f"PRAGMA {name}={PRAGMA_SETTINGS[name]}")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+class ConnectionPool:
+    """Pool koneksi SQLite yang dipakai bersama oleh semua sesi/thread Streamlit.
+
+    Koneksi hanya dipinjamkan ke satu peminjam dalam satu waktu. Jika pool penuh,
+    peminjam menunggu hingga `timeout` detik; setelah itu dibuka koneksi tambahan
+    (overflow) yang langsung ditutup saat dikembalikan, agar tidak pernah deadlock.
+    """
+
+    def __init__(self, factory, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self._factory = factory
+        self._size = size
+        self._timeout = timeout
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "overflow": 0}
+
+    def acquire(self):
+        with self._cond:
+            if not self._idle and self._open >= self._size:
+                self.stats["waits"] += 1
+                self._cond.wait_for(lambda: self._idle, timeout=self._timeout)
+            if self._idle:
+                self.stats["hits"] += 1
+                return self._idle.pop(), True
+            if self._open < self._size:
+                self.stats["misses"] += 1
+                self._open += 1
+                pooled = True
+            else:
+                self.stats["overflow"] += 1
+                pooled = False
+        try:
+            return self._factory(), pooled
+        except Exception:
+            if pooled:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+            raise
+
+    def release(self, raw, pooled):
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+            raw.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            # Koneksi rusak: buang saja, slotnya dibebaskan
+            raw.close()
+            if pooled:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+            return
+        if not pooled:
+            raw.close()
+            return
+        with self._cond:
+            self._idle.append(raw)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw in idle:
+            raw.close()
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, open=self._open, idle=len(self._idle), size=self._size)
+
+
+class PooledConnection:
+    """Pembungkus koneksi pinjaman dari pool.
+
+    Berperilaku seperti sqlite3.Connection biasa, tetapi `close()` (dan keluar dari
+    blok `with`) mengembalikan koneksi ke pool alih-alih menutupnya. Jika peminjam lupa
+    mengembalikan (misalnya karena st.rerun() memotong eksekusi sebelum conn.close()),
+    koneksi otomatis dikembalikan saat objek ini dibuang oleh garbage collector.
+
+    Cursor yang dibuat lewat `cursor()`, `execute()`, dan `executemany()` dicatat oleh
+    tracer (lihat tracer.py).
+    """
+
+    def __init__(self, pool, raw, pooled):
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_finalizer", weakref.finalize(self, pool.release, raw, pooled))
+
+    def __getattr__(self, name):
+        if not self._finalizer.alive:
+            raise sqlite3.ProgrammingError("Koneksi sudah dikembalikan ke pool.")
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+    def cursor(self, *args):
+        return tracer.bungkus(self.__getattr__("cursor")(*args))
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_params):
+        return self.cursor().executemany(sql, seq_params)
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._raw.commit()
+            else:
+                self._raw.rollback()
+        finally:
+            self.close()
+        return False
+
+
+_pool = ConnectionPool(_open_connection)
+_read_pool = ConnectionPool(_open_read_connection, size=READ_POOL_SIZE)
+
+
+def get_connection():
+    """Koneksi baca-tulis. Halaman tidak memakainya langsung: perubahan data dikirim lewat
+    writer.py. Dipakai migrasi, thread penulis, dan skrip (data_sintetis, benchmark)."""
+    if not _schema_ready:
+        init_db()
+    raw, pooled = _pool.acquire()
+    return PooledConnection(_pool, raw, pooled)
+
+
+def get_read_connection():
+    """Koneksi hanya-baca (mode=ro, query_only) dari pool terpisah, untuk semua halaman
+    dan query yang hanya membaca. Penelusuran data yang berat tidak memakai slot pool
+    baca-tulis, dan upaya menulis lewat koneksi ini gagal dengan sqlite3.OperationalError."""
+    if not _schema_ready:
+        init_db()
+    raw, pooled = _read_pool.acquire()
+    return PooledConnection(_read_pool, raw, pooled)
+
+
+def open_read_connection():
+    """Koneksi hanya-baca khusus di luar pool dan tanpa tracer, untuk pemakaian internal
+    yang berumur panjang (misalnya pengawas PRAGMA data_version di cache_query.py)."""
+    if not _schema_ready:
+        init_db()
+    return _open_read_connection()
+
+
+def open_write_connection():
+    """Koneksi khusus di luar pool untuk thread penulis (lihat writer.py). Tetap berupa
+    PooledConnection agar cursor-nya ikut dilacak tracer; close() menutupnya."""
+    if not _schema_ready:
+        init_db()
+    pool = ConnectionPool(_open_connection, size=1)
+    raw, pooled = pool.acquire()
+    return PooledConnection(pool, raw, pooled)
+
+
+def pool_stats():
+    """Counter pool: hits (koneksi dipakai ulang), misses (koneksi baru dibuka),
+    waits (peminjam harus menunggu), overflow, serta jumlah koneksi terbuka/menganggur."""
+    return _pool.snapshot()
+
+
+def read_pool_stats():
+    """Counter yang sama untuk pool hanya-baca (get_read_connection)."""
+    return _read_pool.snapshot()
+
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
 def init_db():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-
-        # Tabel Siswa: Ditambahkan kelas_id
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS siswa (
-                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                nisn INTEGER NOT NULL UNIQUE,
-                nama TEXT NOT NULL,
-                kelas_id INTEGER,
-                FOREIGN KEY (kelas_id) REFERENCES kelas(id) ON DELETE SET NULL
-            );
-        ''')
-
-        # Tabel Tahun Ajaran: Tetap
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tahun_ajaran (
-                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                th_ajar TEXT NOT NULL UNIQUE
-            );
-        ''')
-
-        # Tabel Semester Pilihan (Ganjil/Genap): Tetap
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS semester_pil (
-                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                sm_pil TEXT NOT NULL UNIQUE
-            );
-        ''')
-        # Pastikan ada data awal untuk semester_pil jika belum ada
-        cursor.execute("SELECT COUNT(*) FROM semester_pil")
-        if cursor.fetchone()[0] == 0:
-            semester_pilihan_data = [('Ganjil',), ('Genap',)]
-            cursor.executemany("INSERT INTO semester_pil (sm_pil) VALUES (?)", semester_pilihan_data)
-
-
-        # Tabel Semester: Tetap, mungkin perlu penyesuaian data awal jika ada
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS semester (
-                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                th_ajar_id INTEGER NOT NULL,
-                sm_pil_id INTEGER NOT NULL,
-                aktif BOOLEAN DEFAULT 0, -- Menandakan semester aktif secara global
-                nama_semester TEXT NOT NULL, -- Misal: "Ganjil 2023/2024"
-                FOREIGN KEY (th_ajar_id) REFERENCES tahun_ajaran(id),
-                FOREIGN KEY (sm_pil_id) REFERENCES semester_pil(id),
-                UNIQUE (th_ajar_id, sm_pil_id)
-            );
-        ''')
-
-        # Tabel User (Guru, Admin): Tetap
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE, 
-                password TEXT NOT NULL, 
-                role TEXT NOT NULL DEFAULT 'admin' CHECK(role IN ('admin', 'guru'))
-            );
-        ''')
-        cursor.execute("SELECT COUNT(*) FROM user")
-        if cursor.fetchone()[0] == 0:
-            users = [
-                ('admin', 'admin', 'admin'),
-                ('siti', 'siti123', 'guru')
-            ]
-            cursor.executemany("INSERT INTO user (username, password, role) VALUES (?, ?, ?)", users)
-        
-        # Tabel Kelas: Tetap
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS kelas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nama_kelas TEXT NOT NULL,
-                tingkat TEXT NOT NULL, -- Misal: 10, 11, 12
-                UNIQUE (nama_kelas, tingkat)
-            );
-        ''')
-        cursor.execute("SELECT COUNT(*) FROM kelas")
-        if cursor.fetchone()[0] == 0:
-            kelas_awal = [
-                ('A', '10'),
-                ('B', '10'),
-                ('C', '10'),
-                ('A', '11'),
-                ('B', '11')
-            ]
-            cursor.executemany("INSERT INTO kelas (nama_kelas, tingkat) VALUES (?, ?)", kelas_awal)
-
-        # Tabel Mata Pelajaran: Tetap
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS mata_pelajaran (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nama_mapel TEXT NOT NULL,
-                kode_mapel TEXT UNIQUE
-            );
-        ''')
-        cursor.execute("SELECT COUNT(*) FROM mata_pelajaran")
-        if cursor.fetchone()[0] == 0:
-            mapel_awal = [
-                ('Matematika Wajib', 'MTK-WAJIB-X'),
-                ('Bahasa Indonesia', 'BINDO-X'),
-                ('Fisika', 'FIS-X'),
-                ('Kimia', 'KIM-X')
-            ]
-            cursor.executemany("INSERT INTO mata_pelajaran (nama_mapel, kode_mapel) VALUES (?, ?)", mapel_awal)
-
-        # Tabel Relasi Guru - Mata Pelajaran - Kelas: Tetap
-        # Ini mendefinisikan guru siapa mengajar mapel apa di kelas mana
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS guru_mapel_kelas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL, -- id dari tabel user (guru)
-                mapel_id INTEGER NOT NULL,
-                kelas_id INTEGER NOT NULL,
-                semester_id INTEGER NOT NULL, -- Ditambahkan untuk konteks semester pengajaran
-                FOREIGN KEY (user_id) REFERENCES user(id),
-                FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id),
-                FOREIGN KEY (kelas_id) REFERENCES kelas(id),
-                FOREIGN KEY (semester_id) REFERENCES semester(id),
-                UNIQUE(user_id, mapel_id, kelas_id, semester_id)
-            );
-        ''')
-        # Contoh data awal, pastikan ID merujuk ke data yang valid setelah perubahan
-        # cursor.execute("SELECT COUNT(*) FROM guru_mapel_kelas")
-        # if cursor.fetchone()[0] == 0:
-        #     # Asumsi user_id 2 adalah guru, mapel_id 1, kelas_id 1, semester_id 1 ada
-        #     relasi_awal = [
-        #         (2, 1, 1, 1) 
-        #     ]
-        #     cursor.executemany("INSERT INTO guru_mapel_kelas (user_id, mapel_id, kelas_id, semester_id) VALUES (?, ?, ?, ?)", relasi_awal)
-
-        # Tabel Tahap (BARU)
-        # Misalnya: UTS, UAS, Tugas Harian, Praktikum Mingguan, dll.
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tahap_penilaian (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nama_tahap TEXT NOT NULL UNIQUE,
-                deskripsi TEXT
-            );
-        ''')
-        cursor.execute("SELECT COUNT(*) FROM tahap_penilaian")
-        if cursor.fetchone()[0] == 0:
-            tahap_awal = [
-                ('UTS', 'Ujian Tengah Semester'),
-                ('UAS', 'Ujian Akhir Semester'),
-                ('Tugas Harian', 'Kumpulan tugas harian'),
-                ('Praktikum', 'Kegiatan praktikum')
-            ]
-            cursor.executemany("INSERT INTO tahap_penilaian (nama_tahap, deskripsi) VALUES (?, ?)", tahap_awal)
-
-
-        # Tabel Konfigurasi Mata Pelajaran per Semester dan Tahap (BARU)
-        # Menentukan apakah suatu mapel aktif/tidak pada semester dan tahap tertentu
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS mapel_semester_config (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mapel_id INTEGER NOT NULL,
-                semester_id INTEGER NOT NULL,
-                -- tahap_id INTEGER, -- Bisa ditambahkan jika aktivasi mapel juga bergantung pada tahap tertentu
-                is_active BOOLEAN NOT NULL DEFAULT 0, -- 0 = tidak aktif, 1 = aktif
-                FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id),
-                FOREIGN KEY (semester_id) REFERENCES semester(id),
-                -- FOREIGN KEY (tahap_id) REFERENCES tahap_penilaian(id), 
-                UNIQUE (mapel_id, semester_id) -- Jika tahap_id ditambahkan, sertakan di UNIQUE
-            );
-        ''')
-        
-        # Tabel Nilai: Dimodifikasi untuk menyertakan semester_id dan tahap_id
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nilai (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                siswa_id INTEGER NOT NULL,
-                mapel_id INTEGER NOT NULL,
-                semester_id INTEGER NOT NULL, 
-                tahap_id INTEGER NOT NULL, -- Merujuk ke tahap_penilaian (UTS, UAS, dll)
-                nilai REAL NOT NULL,
-                tanggal_input DATE NOT NULL,
-                guru_id INTEGER NOT NULL, -- id dari tabel user (guru yang menginput)
-                catatan TEXT, -- Opsional, catatan dari guru
-                FOREIGN KEY (siswa_id) REFERENCES siswa(id) ON DELETE CASCADE,
-                FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id),
-                FOREIGN KEY (semester_id) REFERENCES semester(id),
-                FOREIGN KEY (tahap_id) REFERENCES tahap_penilaian(id),
-                FOREIGN KEY (guru_id) REFERENCES user(id),
-                CHECK (nilai >= 0 AND nilai <= 100),
-                UNIQUE(siswa_id, mapel_id, semester_id, tahap_id) -- Mencegah duplikasi nilai untuk kombinasi yang sama
-            );
-        ''')
-        conn.commit()
+    """Menyiapkan skema database lewat migrations.migrate(), cukup sekali per proses.
+
+    Aman dipanggil berulang kali (misalnya di setiap rerun): setelah panggilan pertama
+    berhasil, fungsi ini langsung kembali tanpa menyentuh database.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        raw, pooled = _pool.acquire()
+        try:
+            migrations.migrate(raw)
+        finally:
+            _pool.release(raw, pooled)
+        _schema_ready = True
+
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,148 @@
+# Ekspor lengkap tabel nilai ke CSV (opsional gzip) untuk kantor data: setiap nilai beserta
+# semester, NISN dan nama siswa, kelas, mapel, tahap penilaian, dan guru penginput.
+#
+#     python ekspor_nilai.py --db sinfomik.db --output nilai.csv.gz      # semua semester
+#     python ekspor_nilai.py --db sinfomik.db --semester 19 20 --output nilai_2025.csv
+#
+# Berbeda dengan tampilan riwayat yang membangun DataFrame penuh, ekspor ini tidak pernah
+# memegang lebih dari satu blok baris: kursor dibaca dengan fetchmany per blok, setiap blok
+# langsung diubah menjadi teks CSV (dan dikompres) lalu ditulis ke berkas. Memori tetap datar
+# berapa pun jumlah tahun datanya. Semester yang sudah diarsipkan dibaca dari berkas arsipnya
+# (arsip.nilai_semua), satu semester per ATTACH agar jumlah berkas arsip tidak dibatasi.
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+import zlib
+
+import arsip
+import db
+import queries
+
+KOLOM_CSV = ("nilai_id", "semester", "nisn", "nama_siswa", "kelas", "kode_mapel", "mata_pelajaran",
+             "tahap", "nilai", "tanggal_input", "guru", "catatan")
+
+_BARIS_PER_BLOK = 20000
+
+
+def semua_semester(conn):
+    """Id semua semester, urut id (termasuk yang sudah diarsipkan)."""
+    return [row[0] for row in conn.execute("SELECT id FROM semester ORDER BY id")]
+
+
+def blok_nilai(conn, semester_ids=None, ukuran_blok=_BARIS_PER_BLOK):
+    """Generator blok baris ekspor (list tuple sesuai KOLOM_CSV), semester demi semester.
+
+    `conn` harus koneksi dari db.get_read_connection() dan tetap terbuka selama generator
+    dipakai. Tanpa `semester_ids`, semua semester diekspor."""
+    if semester_ids is None:
+        semester_ids = semua_semester(conn)
+    for semester_id in semester_ids:
+        with arsip.nilai_semua(conn, [semester_id]) as sumber:
+            cur = conn.cursor()
+            # Tuple biasa (bukan sqlite3.Row) dan fetchmany per blok: kursor yang dilacak tracer
+            # mengambil satu baris per panggilan jika diiterasi langsung
+            cur.row_factory = None
+            cur.execute(queries.EKSPOR_NILAI.format(sumber=sumber), (semester_id,))
+            try:
+                while True:
+                    blok = cur.fetchmany(ukuran_blok)
+                    if not blok:
+                        break
+                    yield blok
+            finally:
+                cur.close()
+
+
+def potongan_csv(daftar_blok, kompres=False):
+    """Generator potongan bytes CSV (UTF-8, baris kepala KOLOM_CSV) dari `daftar_blok`.
+    Dengan `kompres`, potongan membentuk satu aliran gzip yang utuh."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if kompres else None
+    buf = io.StringIO()
+    penulis = csv.writer(buf, lineterminator="\n")
+    penulis.writerow(KOLOM_CSV)
+    for blok in daftar_blok:
+        penulis.writerows(blok)
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        if gz:
+            data = gz.compress(data)
+        if data:
+            yield data
+    data = buf.getvalue().encode("utf-8")
+    if gz:
+        data = gz.compress(data) + gz.flush()
+    if data:
+        yield data
+
+
+def jumlah_nilai(conn, semester_ids=None):
+    """Jumlah baris yang akan diekspor (hanya membaca index), untuk progress bar."""
+    if semester_ids is None:
+        semester_ids = semua_semester(conn)
+    total = 0
+    for semester_id in semester_ids:
+        with arsip.nilai_semua(conn, [semester_id]) as sumber:
+            total += conn.execute(f"SELECT COUNT(*) FROM {sumber} n WHERE n.semester_id = ?", (semester_id,)).fetchone()[0]
+    return total
+
+
+def tulis(tujuan, semester_ids=None, kompres=None, progres=None):
+    """Mengekspor nilai ke berkas `tujuan` (gzip jika `kompres`, default: nama berakhiran .gz).
+
+    `progres(baris, total)` dipanggil setiap blok. Mengembalikan ringkasan: jumlah baris,
+    ukuran berkas, detik, dan baris per detik."""
+    if kompres is None:
+        kompres = tujuan.endswith(".gz")
+    os.makedirs(os.path.dirname(os.path.abspath(tujuan)), exist_ok=True)
+    sementara = tujuan + ".tmp"
+    mulai = time.perf_counter()
+    conn = db.get_read_connection()
+    try:
+        total = jumlah_nilai(conn, semester_ids) if progres else None
+        hitung = [0]
+
+        def terhitung():
+            for blok in blok_nilai(conn, semester_ids):
+                hitung[0] += len(blok)
+                yield blok
+                if progres:
+                    progres(hitung[0], total)
+
+        with open(sementara, "wb") as f:
+            for potongan in potongan_csv(terhitung(), kompres):
+                f.write(potongan)
+        os.replace(sementara, tujuan)
+    finally:
+        conn.close()
+        if os.path.exists(sementara):
+            os.remove(sementara)
+    detik = time.perf_counter() - mulai
+    return {"baris": hitung[0], "ukuran": os.path.getsize(tujuan), "detik": detik,
+            "baris_per_detik": hitung[0] / detik if detik else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ekspor lengkap nilai ke CSV (opsional gzip).")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--semester", type=int, nargs="+", metavar="ID", help="Hanya semester ini (default semua)")
+    parser.add_argument("--output", required=True, help="Berkas tujuan; akhiran .gz berarti dikompres gzip")
+    parser.add_argument("--gzip", action="store_true", help="Kompres gzip walaupun nama berkas tidak berakhiran .gz")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+
+    ringkasan = tulis(args.output, args.semester, kompres=args.gzip or None)
+    print(f"{ringkasan['baris']} nilai -> {args.output} ({ringkasan['ukuran'] / 1024 / 1024:.1f} MB) "
+          f"dalam {ringkasan['detik']:.2f} s, {ringkasan['baris_per_detik']:,.0f} baris/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
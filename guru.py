@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
-from db import get_connection, init_db
+from db import get_read_connection
+import cache_query
+import katalog
+import queries
 import sqlite3
 import time
+import writer
 
 
 def show_guru():
@@ -11,59 +15,27 @@ def show_guru():
         return
 
     st.title("🧑‍🏫 Manajemen Guru dan Penugasan")
-    init_db()
 
-    conn = get_connection()
+    conn = get_read_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
-    def load_guru_users():
-        cursor.execute("SELECT id, username, role FROM user WHERE role = 'guru' ORDER BY username ASC")
-        return cursor.fetchall()
-
     def load_all_users_for_edit():
         cursor.execute("SELECT id, username, role FROM user ORDER BY username ASC")
         return cursor.fetchall()
 
-    def load_mapel():
-        cursor.execute("SELECT id, nama_mapel, kode_mapel FROM mata_pelajaran ORDER BY nama_mapel ASC")
-        return cursor.fetchall()
-
-    def load_kelas():
-        cursor.execute("SELECT id, nama_kelas, tingkat FROM kelas ORDER BY tingkat, nama_kelas ASC")
-        return cursor.fetchall()
-
-    def load_semester():
-        cursor.execute("""
-            SELECT s.id, ta.th_ajar || ' - ' || sp.sm_pil AS nama_semester_lengkap
-            FROM semester s
-            JOIN tahun_ajaran ta ON s.th_ajar_id = ta.id
-            JOIN semester_pil sp ON s.sm_pil_id = sp.id
-            ORDER BY ta.th_ajar DESC, sp.sm_pil ASC
-        """)
-        return cursor.fetchall()
-
     def load_penugasan():
-        cursor.execute("""
-            SELECT gmk.id, u.username as nama_guru, mp.nama_mapel, k.tingkat || ' - ' || k.nama_kelas as nama_kelas, 
-                   (SELECT ta.th_ajar || ' - ' || sp.sm_pil FROM semester s 
-                    JOIN tahun_ajaran ta ON s.th_ajar_id = ta.id 
-                    JOIN semester_pil sp ON s.sm_pil_id = sp.id WHERE s.id = gmk.semester_id) as nama_semester
-            FROM guru_mapel_kelas gmk
-            JOIN user u ON gmk.user_id = u.id
-            JOIN mata_pelajaran mp ON gmk.mapel_id = mp.id
-            JOIN kelas k ON gmk.kelas_id = k.id
-            ORDER BY u.username, nama_semester, mp.nama_mapel
-        """)
-        return cursor.fetchall()
+        # Dari cache selama tidak ada perubahan data sejak rerun sebelumnya
+        return cache_query.ambil(conn, queries.PENUGASAN_DAFTAR)
 
     tab1, tab2 = st.tabs(["👤 Manajemen Akun Guru", "📚 Manajemen Penugasan Mengajar"])
 
     with tab1:
         st.subheader("Daftar Akun Guru")
-        guru_users = load_guru_users()
+        # Akun guru, mapel, kelas, dan semester diambil dari katalog (tanpa query per rerun)
+        guru_users = katalog.ambil("guru")
         if guru_users:
-            df_guru = pd.DataFrame(guru_users, columns=["ID", "Username", "Role"])
+            df_guru = pd.DataFrame([(g['id'], g['username'], g['role']) for g in guru_users], columns=["ID", "Username", "Role"])
             st.dataframe(df_guru, use_container_width=True, hide_index=True)
         else:
             st.info("Belum ada pengguna dengan role 'guru'.")
@@ -129,17 +101,17 @@ def show_guru():
                         if edit_user_id_selection and edit_user_id_selection[0]: # Mode Edit
                             user_id = edit_user_id_selection[0]
                             if password_input:
-                                cursor.execute("UPDATE user SET username = ?, password = ?, role = ? WHERE id = ?",
-                                               (username_input, password_input, role_input, user_id))
+                                writer.eksekusi("UPDATE user SET username = ?, password = ?, role = ? WHERE id = ?",
+                                                (username_input, password_input, role_input, user_id))
                             else:
-                                cursor.execute("UPDATE user SET username = ?, role = ? WHERE id = ?",
-                                               (username_input, role_input, user_id))
-                            conn.commit()
+                                writer.eksekusi("UPDATE user SET username = ?, role = ? WHERE id = ?",
+                                                (username_input, role_input, user_id))
+                            katalog.invalidate("guru")
                             st.success(f"Pengguna '{username_input}' berhasil diperbarui.")
                         else: # Mode Tambah Baru
-                            cursor.execute("INSERT INTO user (username, password, role) VALUES (?, ?, ?)",
-                                           (username_input, password_input, role_input))
-                            conn.commit()
+                            writer.eksekusi("INSERT INTO user (username, password, role) VALUES (?, ?, ?)",
+                                            (username_input, password_input, role_input))
+                            katalog.invalidate("guru")
                             st.success(f"Pengguna '{username_input}' dengan role '{role_input}' berhasil ditambahkan.")
                         
                         
@@ -160,16 +132,17 @@ def show_guru():
                     st.rerun()
 
         if st.session_state.get('confirm_delete_user_id'):
-            st.warning(f"Apakah Anda yakin ingin menghapus pengguna '{st.session_state.get('confirm_delete_user_nama')}'? Tindakan ini juga akan menghapus semua penugasan mengajar terkait pengguna ini.")
+            st.warning(f"Apakah Anda yakin ingin menghapus pengguna '{st.session_state.get('confirm_delete_user_nama')}'? Tindakan ini juga akan menghapus semua penugasan mengajar terkait pengguna ini. Nilai yang pernah diinput pengguna ini tetap tersimpan.")
             
             col_confirm_del_usr, col_cancel_del_usr = st.columns([1,1])
             with col_confirm_del_usr:
                 if st.button("Ya, Hapus Pengguna", type="primary", on_click=reset_edit_user_form):
                     try:
                         user_id_to_delete = st.session_state.confirm_delete_user_id
-                        cursor.execute("DELETE FROM guru_mapel_kelas WHERE user_id = ?", (user_id_to_delete,))
-                        cursor.execute("DELETE FROM user WHERE id = ?", (user_id_to_delete,))
-                        conn.commit()
+                        # Penugasan ikut terhapus (CASCADE); nilai yang pernah diinput tetap ada
+                        # dengan guru_id dikosongkan (SET NULL)
+                        writer.eksekusi("DELETE FROM user WHERE id = ?", (user_id_to_delete,))
+                        katalog.invalidate("guru", "penugasan")
                         st.success(f"Pengguna '{st.session_state.get('confirm_delete_user_nama')}' dan penugasan mengajarnya berhasil dihapus.")
                         
                         del st.session_state.confirm_delete_user_id
@@ -199,10 +172,10 @@ def show_guru():
         st.divider()
         st.subheader("Tambah/Hapus Penugasan Mengajar")
 
-        guru_list = load_guru_users()
-        mapel_list = load_mapel()
-        kelas_list = load_kelas()
-        semester_list = load_semester()
+        guru_list = katalog.opsi("guru")
+        mapel_list = katalog.opsi("mapel")
+        kelas_list = katalog.opsi("kelas")
+        semester_list = katalog.opsi("semester")
         
         col_tambah, col_hapus = st.columns(2)
 
@@ -212,10 +185,10 @@ def show_guru():
                 st.warning("Pastikan data Guru, Mapel, Kelas, dan Semester sudah ada.")
             else:
                 with st.form("form_penugasan"):
-                    selected_guru_id = st.selectbox("Pilih Guru", options=[(g['id'], g['username']) for g in guru_list], format_func=lambda x: x[1])
-                    selected_mapel_id = st.selectbox("Pilih Mata Pelajaran", options=[(m['id'], f"{m['nama_mapel']} ({m['kode_mapel']})") for m in mapel_list], format_func=lambda x: x[1])
-                    selected_kelas_id = st.selectbox("Pilih Kelas", options=[(k['id'], f"{k['tingkat']} - {k['nama_kelas']}") for k in kelas_list], format_func=lambda x: x[1])
-                    selected_semester_id = st.selectbox("Pilih Semester", options=[(s['id'], s['nama_semester_lengkap']) for s in semester_list], format_func=lambda x: x[1])
+                    selected_guru_id = st.selectbox("Pilih Guru", options=guru_list, format_func=lambda x: x[1])
+                    selected_mapel_id = st.selectbox("Pilih Mata Pelajaran", options=mapel_list, format_func=lambda x: x[1])
+                    selected_kelas_id = st.selectbox("Pilih Kelas", options=kelas_list, format_func=lambda x: x[1])
+                    selected_semester_id = st.selectbox("Pilih Semester", options=semester_list, format_func=lambda x: x[1])
                     
                     submitted_penugasan = st.form_submit_button("Simpan Penugasan")
 
@@ -226,9 +199,9 @@ def show_guru():
                             kelas_id = selected_kelas_id[0]
                             semester_id = selected_semester_id[0]
                             
-                            cursor.execute("INSERT INTO guru_mapel_kelas (user_id, mapel_id, kelas_id, semester_id) VALUES (?, ?, ?, ?)",
-                                           (guru_id, mapel_id, kelas_id, semester_id))
-                            conn.commit()
+                            writer.eksekusi("INSERT INTO guru_mapel_kelas (user_id, mapel_id, kelas_id, semester_id) VALUES (?, ?, ?, ?)",
+                                            (guru_id, mapel_id, kelas_id, semester_id))
+                            katalog.invalidate("penugasan")
                             st.success("Penugasan berhasil ditambahkan.")
                             time.sleep(1)
                             st.rerun()
@@ -250,8 +223,8 @@ def show_guru():
                 if st.button("Hapus Penugasan Terpilih", type="secondary"):
                     try:
                         id_to_del = penugasan_id_to_delete[0]
-                        cursor.execute("DELETE FROM guru_mapel_kelas WHERE id = ?", (id_to_del,))
-                        conn.commit()
+                        writer.eksekusi("DELETE FROM guru_mapel_kelas WHERE id = ?", (id_to_del,))
+                        katalog.invalidate("penugasan")
                         st.success("Penugasan berhasil dihapus.")
                         time.sleep(1)
                         st.rerun()
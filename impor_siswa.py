@@ -0,0 +1,261 @@
+# Impor siswa massal dari CSV atau XLSX (halaman Manajemen Data Siswa, juga lewat CLI).
+#
+#     python impor_siswa.py --db sinfomik.db --file siswa_baru.xlsx --uji    # hanya validasi
+#     python impor_siswa.py --db sinfomik.db --file siswa_baru.csv
+#
+# Baris pertama berkas adalah kepala kolom: NISN, Nama, dan (opsional) Kelas, misalnya "10 - A".
+# Berkas dibaca per potongan (openpyxl mode read_only untuk XLSX), jadi seluruh isi berkas tidak
+# pernah dimuat sekaligus. Setiap potongan:
+# - divalidasi di memori: format NISN, nama kosong, NISN ganda di dalam berkas, dan nama kelas
+#   yang dicocokkan ke kelas.id lewat peta dari katalog kelas;
+# - diperiksa keunikan NISN-nya terhadap database dengan SATU query IN (...) per potongan;
+# - disisipkan dengan executemany sebagai satu permintaan writer (satu transaksi per potongan).
+# Pemeriksaan NISN dan insert berjalan di dalam transaksi writer yang sama, sehingga siswa
+# yang ditambahkan sesi lain di antara keduanya tidak bisa menggagalkan satu potongan penuh.
+# Baris yang gagal dilaporkan per nomor baris berkas; baris lain tetap diimpor.
+# Potongan yang sudah tersimpan tidak dibatalkan jika potongan berikutnya gagal disimpan (galat
+# SQLite, antrean writer sibuk) atau berkas rusak di tengah jalan: impor berhenti menyimpan,
+# sisa berkas tetap divalidasi, dan ringkasan mencatat penyebabnya serta baris yang belum disimpan.
+import argparse
+import csv
+import io
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import db
+import katalog
+import writer
+
+UKURAN_POTONGAN = 1000
+NISN_MAKS = 9999999999
+
+# Nama kepala kolom yang diterima (dibandingkan tanpa spasi/tanda baca, huruf kecil)
+_ALIAS_KOLOM = {
+    "nisn": "nisn",
+    "nama": "nama", "namasiswa": "nama", "namalengkap": "nama", "namalengkapsiswa": "nama",
+    "kelas": "kelas", "namakelas": "kelas",
+}
+
+
+def _kunci(teks):
+    return re.sub(r"[\s\-_./]+", "", str(teks)).lower()
+
+
+def peta_kelas():
+    """Peta nama kelas -> kelas.id. Label "10 - A" cocok dengan "10-A", "10 A", atau "10a";
+    nama kelas saja ("A") juga diterima jika hanya ada satu kelas dengan nama itu."""
+    peta, per_nama = {}, {}
+    for row in katalog.ambil("kelas"):
+        peta[_kunci(row["tingkat"] + row["nama_kelas"])] = row["id"]
+        per_nama.setdefault(_kunci(row["nama_kelas"]), []).append(row["id"])
+    for kunci, ids in per_nama.items():
+        if len(ids) == 1:
+            peta.setdefault(kunci, ids[0])
+    return peta
+
+
+def _baris_csv(berkas):
+    teks = io.TextIOWrapper(berkas, encoding="utf-8-sig", newline="")
+    contoh = teks.read(4096)
+    teks.seek(0)
+    try:
+        dialek = csv.Sniffer().sniff(contoh, delimiters=",;\t")
+    except csv.Error:
+        dialek = csv.excel
+    try:
+        yield from csv.reader(teks, dialek)
+    finally:
+        teks.detach()
+
+
+def _baris_xlsx(berkas):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(berkas, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def baca_potongan(berkas, nama_berkas, ukuran=UKURAN_POTONGAN):
+    """Generator potongan [(nomor_baris, nisn, nama, kelas), ...] dari berkas CSV/XLSX.
+
+    Nomor baris mengikuti berkas (kepala kolom = baris 1); baris kosong dilewati. Nilai sel
+    dikembalikan apa adanya (str, int, float, atau None). ValueError jika jenis berkas tidak
+    dikenal atau kolom NISN/Nama tidak ada."""
+    akhiran = os.path.splitext(nama_berkas)[1].lower()
+    if akhiran == ".csv":
+        sumber = _baris_csv(berkas)
+    elif akhiran in (".xlsx", ".xlsm"):
+        sumber = _baris_xlsx(berkas)
+    else:
+        raise ValueError(f"Jenis berkas {akhiran or nama_berkas} tidak didukung (gunakan .csv atau .xlsx).")
+
+    kepala = next(sumber, None) or ()
+    posisi = {}
+    for i, teks in enumerate(kepala):
+        kolom = _ALIAS_KOLOM.get(_kunci(teks or ""))
+        if kolom and kolom not in posisi:
+            posisi[kolom] = i
+    kurang = [k.upper() if k == "nisn" else k.capitalize() for k in ("nisn", "nama") if k not in posisi]
+    if kurang:
+        raise ValueError(f"Kolom wajib tidak ditemukan di baris pertama: {', '.join(kurang)}.")
+
+    def sel(baris, kolom):
+        i = posisi.get(kolom)
+        return baris[i] if i is not None and i < len(baris) else None
+
+    potongan = []
+    for nomor, baris in enumerate(sumber, start=2):
+        if not any(v not in (None, "") and str(v).strip() for v in baris):
+            continue
+        potongan.append((nomor, sel(baris, "nisn"), sel(baris, "nama"), sel(baris, "kelas")))
+        if len(potongan) >= ukuran:
+            yield potongan
+            potongan = []
+    if potongan:
+        yield potongan
+
+
+def _nisn(nilai):
+    """NISN dari sel berkas sebagai int, atau None jika bukan angka 1-10 digit."""
+    if isinstance(nilai, float) and nilai.is_integer():
+        nilai = int(nilai)
+    if isinstance(nilai, int) and not isinstance(nilai, bool):
+        return nilai if 0 < nilai <= NISN_MAKS else None
+    teks = str(nilai or "").strip()
+    if teks.endswith(".0"):
+        teks = teks[:-2]
+    return int(teks) if teks.isdigit() and len(teks) <= 10 and int(teks) > 0 else None
+
+
+def _periksa(potongan, kelas, terlihat, galat):
+    """Validasi di memori; mengembalikan [(nomor_baris, nisn, nama, kelas_id), ...] yang lolos."""
+    lolos = []
+    for nomor, nisn_sel, nama, kelas_sel in potongan:
+        nisn = _nisn(nisn_sel)
+        nama = str(nama or "").strip()
+        kelas_teks = str(kelas_sel or "").strip()
+        kelas_id = kelas.get(_kunci(kelas_teks)) if kelas_teks else None
+        if nisn is None:
+            galat.append((nomor, nisn_sel, "NISN harus angka 1-10 digit."))
+        elif not nama:
+            galat.append((nomor, nisn_sel, "Nama siswa kosong."))
+        elif kelas_teks and kelas_id is None:
+            galat.append((nomor, nisn_sel, f"Kelas '{kelas_teks}' tidak ditemukan."))
+        elif nisn in terlihat:
+            galat.append((nomor, nisn_sel, f"NISN ganda di dalam berkas (sudah ada di baris {terlihat[nisn]})."))
+        else:
+            terlihat[nisn] = nomor
+            lolos.append((nomor, nisn, nama, kelas_id))
+    return lolos
+
+
+def nisn_terdaftar(conn, daftar_nisn):
+    """Himpunan NISN dari `daftar_nisn` yang sudah ada di tabel siswa (satu query)."""
+    if not daftar_nisn:
+        return set()
+    sql = f"SELECT nisn FROM siswa WHERE nisn IN ({', '.join('?' * len(daftar_nisn))})"
+    return {row[0] for row in conn.execute(sql, list(daftar_nisn))}
+
+
+def _sisipkan(conn, lolos):
+    # Dijalankan di thread writer: pemeriksaan dan insert dalam transaksi yang sama
+    terdaftar = nisn_terdaftar(conn, [b[1] for b in lolos])
+    conn.executemany("INSERT INTO siswa (nisn, nama, kelas_id) VALUES (?, ?, ?)",
+                     [(nisn, nama, kelas_id) for _, nisn, nama, kelas_id in lolos if nisn not in terdaftar])
+    return terdaftar
+
+
+def impor(berkas, nama_berkas, uji=False, ukuran=UKURAN_POTONGAN, progres=None):
+    """Mengimpor siswa dari berkas CSV/XLSX (file-like biner). Dengan `uji`, semua
+    pemeriksaan dijalankan tanpa menulis apa pun.
+
+    `progres(baris_diproses)` dipanggil setiap potongan. Mengembalikan ringkasan: jumlah
+    baris, jumlah siswa yang ditambahkan (atau siap ditambahkan), daftar galat
+    (nomor_baris, nisn, pesan) urut nomor baris, dan detik. Jika sebuah potongan gagal disimpan
+    atau berkas tidak bisa dibaca setelah potongan pertama, `gagal` berisi penyebabnya,
+    potongan sebelumnya tetap tersimpan, dan baris valid yang belum disimpan dihitung di
+    `tidak_disimpan` (juga dicatat di galat). ValueError/galat baca lain sebelum potongan
+    pertama diteruskan ke pemanggil."""
+    mulai = time.perf_counter()
+    kelas = peta_kelas()
+    terlihat, galat = {}, []
+    jumlah_baris = berhasil = tidak_disimpan = 0
+    gagal = None
+    daftar_potongan = baca_potongan(berkas, nama_berkas, ukuran)
+    conn = db.get_read_connection() if uji else None
+    try:
+        while True:
+            try:
+                potongan = next(daftar_potongan, None)
+            except Exception as e:
+                if not jumlah_baris:
+                    raise
+                # Potongan sebelumnya sudah tersimpan: laporkan sebagai impor sebagian
+                gagal = f"Berkas tidak bisa dibaca setelah baris {nomor_terakhir}: {e}"
+                break
+            if potongan is None:
+                break
+            jumlah_baris += len(potongan)
+            nomor_terakhir = potongan[-1][0]
+            lolos = _periksa(potongan, kelas, terlihat, galat)
+            if lolos and gagal is None:
+                try:
+                    terdaftar = nisn_terdaftar(conn, [b[1] for b in lolos]) if uji else writer.tulis(_sisipkan, lolos)
+                except sqlite3.Error as e:
+                    gagal = f"Potongan baris {potongan[0][0]}-{nomor_terakhir} gagal {'diperiksa' if uji else 'disimpan'}: {e}"
+                else:
+                    for nomor, nisn, _, _ in lolos:
+                        if nisn in terdaftar:
+                            galat.append((nomor, nisn, "NISN sudah terdaftar di database."))
+                    berhasil += len(lolos) - len(terdaftar)
+                    lolos = []
+            # Sesudah kegagalan, sisa berkas hanya divalidasi
+            for nomor, nisn, _, _ in lolos:
+                galat.append((nomor, nisn, f"Belum {'diperiksa' if uji else 'disimpan'}: impor berhenti sebelum baris ini."))
+            tidak_disimpan += len(lolos)
+            if progres:
+                progres(jumlah_baris)
+    finally:
+        if conn is not None:
+            conn.close()
+    galat.sort(key=lambda g: g[0])
+    return {"baris": jumlah_baris, "berhasil": berhasil, "galat": galat, "uji": uji,
+            "gagal": gagal, "tidak_disimpan": tidak_disimpan, "detik": time.perf_counter() - mulai}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Impor siswa massal dari CSV/XLSX (kolom NISN, Nama, Kelas).")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--file", required=True, help="Berkas .csv atau .xlsx")
+    parser.add_argument("--uji", action="store_true", help="Hanya validasi, tanpa menyimpan")
+    parser.add_argument("--potongan", type=int, default=UKURAN_POTONGAN, metavar="N", help="Baris per potongan")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+
+    with open(args.file, "rb") as f:
+        ringkasan = impor(f, args.file, uji=args.uji, ukuran=args.potongan)
+    status = "lolos validasi" if args.uji else "ditambahkan"
+    print(f"{ringkasan['baris']} baris: {ringkasan['berhasil']} siswa {status}, {len(ringkasan['galat'])} galat "
+          f"({ringkasan['detik']:.2f} s)")
+    if ringkasan["gagal"]:
+        print(f"IMPOR BERHENTI: {ringkasan['gagal']}")
+        print(f"  {ringkasan['tidak_disimpan']} baris valid belum {'diperiksa' if args.uji else 'disimpan'}")
+    for nomor, nisn, pesan in ringkasan["galat"][:20]:
+        print(f"  baris {nomor}: {nisn}: {pesan}")
+    if len(ringkasan["galat"]) > 20:
+        print(f"  ... dan {len(ringkasan['galat']) - 20} galat lain")
+    return 1 if ringkasan["galat"] or ringkasan["gagal"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# Pemindaian baris yatim: baris anak yang foreign key-nya menunjuk ke baris induk yang sudah
+# tidak ada. Sebelum migrasi 5, PRAGMA foreign_keys tidak pernah aktif, jadi database lama
+# bisa berisi nilai/penugasan milik siswa, mapel, semester, atau guru yang sudah dihapus.
+#
+#     python integritas.py --db sinfomik.db               # laporan saja
+#     python integritas.py --db sinfomik.db --bersihkan   # perbaiki per batch
+#     python integritas.py --db sinfomik.db --bersihkan --hapus-tanpa-aksi
+#
+# Daftar relasi dibaca dari skema (PRAGMA foreign_key_list), dan perbaikannya mengikuti aksi
+# ON DELETE relasi itu: CASCADE -> baris anak dihapus, SET NULL -> kolomnya dikosongkan.
+# Relasi tanpa aksi (misalnya nilai.tahap_id) hanya dilaporkan, karena tidak jelas datanya
+# harus diapakan; dengan --hapus-tanpa-aksi baris yatimnya ikut dihapus.
+#
+# Tabel anak dipindai berurutan rowid dalam jendela SINFOMIK_INTEGRITAS_BATCH baris lewat
+# koneksi baca, sehingga tidak ada lock tulis selama pemindaian. Rowid yatim yang ditemukan
+# diperbaiki per jendela sebagai satu transaksi pendek dan kondisi yatim dicek ulang di sana,
+# jadi aman dijalankan saat aplikasi sedang dipakai. Dari dalam aplikasi transaksi itu dikirim
+# ke thread penulis (writer.py). CLI membuka berkas langsung dengan sqlite3, tanpa modul db:
+# db menjalankan migrasi saat koneksi pertama, dan migrasi 8 justru gagal selama masih ada
+# baris yatim tanpa aksi, jadi skrip ini harus tetap bisa jalan di database yang belum
+# termigrasi.
+import argparse
+import os
+import sqlite3
+import sys
+import urllib.parse
+
+BATCH = int(os.getenv("SINFOMIK_INTEGRITAS_BATCH", "5000"))
+
+_PERBAIKAN = {"CASCADE": "hapus", "SET NULL": "kosongkan"}
+
+
+def relasi(conn):
+    """Semua foreign key di skema: daftar dict tabel, id (fkid di PRAGMA foreign_key_check),
+    kolom, induk, kolom_induk, on_delete, aksi. `conn` boleh koneksi atau cursor apa pun
+    (baris dibaca per posisi, tidak bergantung row_factory)."""
+    hasil = []
+    tabel_list = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name").fetchall()]
+    for tabel in tabel_list:
+        # (id, seq, table, from, to, on_update, on_delete, match)
+        for fk in conn.execute(f"PRAGMA foreign_key_list({tabel})").fetchall():
+            hasil.append({
+                "tabel": tabel,
+                "id": fk[0],
+                "kolom": fk[3],
+                "induk": fk[2],
+                "kolom_induk": fk[4] or "rowid",
+                "on_delete": fk[6],
+                "aksi": _PERBAIKAN.get(fk[6]),
+            })
+    return hasil
+
+
+def _kondisi_yatim(r):
+    return (f"{r['tabel']}.{r['kolom']} IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM {r['induk']} WHERE {r['induk']}.{r['kolom_induk']} = {r['tabel']}.{r['kolom']})")
+
+
+def cari_yatim(conn, r, setelah=0, batas=BATCH):
+    """Satu jendela pemindaian: (rowid yatim, rowid terakhir yang dipindai atau None jika tabel habis)."""
+    rows = conn.execute(
+        f"SELECT {r['tabel']}.rowid, {_kondisi_yatim(r)} FROM {r['tabel']} "
+        f"WHERE {r['tabel']}.rowid > ? ORDER BY {r['tabel']}.rowid LIMIT ?",
+        (setelah, batas)
+    ).fetchall()
+    if not rows:
+        return [], None
+    return [row[0] for row in rows if row[1]], rows[-1][0]
+
+
+def perbaiki(conn, r, rowids):
+    """Fungsi tulis (lihat writer.py): menghapus/mengosongkan baris yatim sesuai aksi relasi.
+    Mengembalikan jumlah baris yang diperbaiki."""
+    if r["aksi"] == "hapus":
+        sql = f"DELETE FROM {r['tabel']} WHERE rowid = ? AND {_kondisi_yatim(r)}"
+    elif r["aksi"] == "kosongkan":
+        sql = f"UPDATE {r['tabel']} SET {r['kolom']} = NULL WHERE rowid = ? AND {_kondisi_yatim(r)}"
+    else:
+        raise ValueError(f"Relasi {r['tabel']}.{r['kolom']} tidak punya aksi perbaikan.")
+    return conn.executemany(sql, [(rowid,) for rowid in rowids]).rowcount
+
+
+def pindai(conn, bersihkan=False, batas=BATCH, log=print, hapus_tanpa_aksi=False, tulis=None):
+    """Memindai semua relasi; jika `bersihkan`, baris yatim diperbaiki per jendela lewat
+    `tulis(fungsi, *args)` (default writer.tulis). Dengan `hapus_tanpa_aksi`, yatim pada relasi
+    tanpa ON DELETE dihapus. Mengembalikan daftar dict relasi dengan tambahan jumlah `yatim`
+    dan `diperbaiki`."""
+    if tulis is None:
+        import writer
+        tulis = writer.tulis
+
+    laporan = []
+    for r in relasi(conn):
+        r = dict(r, yatim=0, diperbaiki=0)
+        if r["aksi"] is None and hapus_tanpa_aksi:
+            r["aksi"] = "hapus"
+        setelah = 0
+        while setelah is not None:
+            rowids, setelah = cari_yatim(conn, r, setelah, batas)
+            r["yatim"] += len(rowids)
+            if rowids and bersihkan and r["aksi"]:
+                r["diperbaiki"] += tulis(perbaiki, r, rowids)
+        laporan.append(r)
+        if log and r["yatim"]:
+            if not r["aksi"]:
+                keterangan = "tidak diperbaiki (tanpa ON DELETE, lihat --hapus-tanpa-aksi)"
+            elif bersihkan:
+                keterangan = f"{r['diperbaiki']} diperbaiki ({r['aksi']})"
+            else:
+                keterangan = f"akan di{r['aksi']}"
+            log(f"  {r['tabel'] + '.' + r['kolom']:<30} -> {r['induk']:<16} yatim {r['yatim']:>8}   {keterangan}")
+    return laporan
+
+
+def _tulis_langsung(conn):
+    """Pengganti writer.tulis untuk CLI: setiap panggilan satu transaksi di `conn`."""
+    def tulis(fungsi, *args):
+        with conn:
+            return fungsi(conn, *args)
+    return tulis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memeriksa dan membersihkan baris yatim (foreign key rusak).")
+    parser.add_argument("--db", default=os.getenv("SINFOMIK_DB", "sinfomik.db"))
+    parser.add_argument("--bersihkan", action="store_true", help="Perbaiki baris yatim (CASCADE: hapus, SET NULL: kosongkan)")
+    parser.add_argument("--hapus-tanpa-aksi", action="store_true",
+                        help="Bersama --bersihkan: hapus juga baris yatim pada relasi tanpa ON DELETE (misalnya nilai.tahap_id)")
+    parser.add_argument("--batch", type=int, default=BATCH, help="Jumlah baris per jendela pemindaian/transaksi")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    if args.hapus_tanpa_aksi and not args.bersihkan:
+        parser.error("--hapus-tanpa-aksi hanya berlaku bersama --bersihkan.")
+
+    print(f"Memindai {args.db} ...")
+    # Bukan lewat db: koneksi pertama db menjalankan migrasi, yang gagal selama ada yatim
+    conn = sqlite3.connect("file:" + urllib.parse.quote(os.path.abspath(args.db)) + "?mode=ro", uri=True)
+    conn_tulis = sqlite3.connect(args.db, timeout=30) if args.bersihkan else None
+    try:
+        laporan = pindai(conn, args.bersihkan, args.batch, hapus_tanpa_aksi=args.hapus_tanpa_aksi,
+                         tulis=_tulis_langsung(conn_tulis) if conn_tulis else None)
+    finally:
+        conn.close()
+        if conn_tulis is not None:
+            conn_tulis.close()
+
+    total = sum(r["yatim"] for r in laporan)
+    if not total:
+        print("Tidak ada baris yatim.")
+    elif args.bersihkan:
+        diperbaiki = sum(r["diperbaiki"] for r in laporan)
+        print(f"{diperbaiki} dari {total} baris yatim diperbaiki.")
+        if diperbaiki < total:
+            print("Sisanya ada pada relasi tanpa ON DELETE; tambahkan --hapus-tanpa-aksi untuk menghapusnya.")
+        return 1 if diperbaiki < total else 0
+    else:
+        print(f"{total} baris yatim. Jalankan dengan --bersihkan untuk memperbaikinya.")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
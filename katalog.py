@@ -0,0 +1,121 @@
+# Katalog data referensi: kelas, mata pelajaran, tahap penilaian, semester, tahun ajaran,
+# pilihan semester, dan akun guru. Tabel-tabel ini kecil dan jarang berubah, tetapi
+# sebelumnya di-query ulang pada setiap rerun di hampir semua halaman.
+#
+# Isi katalog disimpan di memori proses (dipakai bersama oleh semua sesi) lengkap dengan
+# label tampilan seperti "10 - A" dan "2024/2025 - Ganjil". Setiap halaman yang menulis
+# ke tabel-tabel tersebut WAJIB memanggil `invalidate(...)` setelah commit, sehingga
+# pembacaan berikutnya memuat ulang dari database dan pilihan yang tampil tidak pernah basi.
+import threading
+
+from db import get_read_connection
+
+_QUERY = {
+    "kelas": """
+        SELECT id, nama_kelas, tingkat, tingkat || ' - ' || nama_kelas AS label
+        FROM kelas
+        ORDER BY tingkat, nama_kelas ASC
+    """,
+    "mapel": """
+        SELECT id, nama_mapel, kode_mapel, nama_mapel || ' (' || kode_mapel || ')' AS label
+        FROM mata_pelajaran
+        ORDER BY nama_mapel ASC
+    """,
+    "tahap": """
+        SELECT id, nama_tahap, nama_tahap AS label
+        FROM tahap_penilaian
+        ORDER BY nama_tahap ASC
+    """,
+    "semester": """
+        SELECT s.id, s.nama_semester, s.aktif, s.th_ajar_id, s.sm_pil_id, ta.th_ajar, sp.sm_pil, s.berkas_arsip,
+               ta.th_ajar || ' - ' || sp.sm_pil AS label
+        FROM semester s
+        JOIN tahun_ajaran ta ON s.th_ajar_id = ta.id
+        JOIN semester_pil sp ON s.sm_pil_id = sp.id
+        ORDER BY ta.th_ajar DESC, sp.id ASC
+    """,
+    "tahun_ajaran": """
+        SELECT id, th_ajar, th_ajar AS label
+        FROM tahun_ajaran
+        ORDER BY th_ajar DESC
+    """,
+    "semester_pil": """
+        SELECT id, sm_pil, sm_pil AS label
+        FROM semester_pil
+        ORDER BY id ASC
+    """,
+    "guru": """
+        SELECT id, username, role, username AS label
+        FROM user
+        WHERE role = 'guru'
+        ORDER BY username ASC
+    """,
+}
+
+# Katalog lain yang labelnya ikut berubah bila tabel tertentu ditulis
+# (label semester memakai th_ajar dari tabel tahun_ajaran).
+_TURUNAN = {
+    "tahun_ajaran": ("semester",),
+}
+
+_lock = threading.Lock()
+_data = {}   # nama -> (versi saat dimuat, tuple baris, dict id -> baris)
+_versi = {}  # nama -> nomor versi, naik setiap kali invalidate
+
+
+def versi(nama):
+    """Nomor versi katalog; berubah setiap kali tabelnya ditulis. Berguna untuk cache
+    turunan (misalnya per sesi) yang perlu tahu kapan harus dibangun ulang."""
+    with _lock:
+        return _versi.get(nama, 0)
+
+
+def invalidate(*nama_list):
+    """Tandai katalog basi. Dipanggil halaman admin setelah commit ke tabel terkait.
+    Nama yang tidak punya query di katalog (misalnya "penugasan") hanya menaikkan versinya."""
+    with _lock:
+        for nama in nama_list:
+            for n in (nama,) + _TURUNAN.get(nama, ()):
+                _versi[n] = _versi.get(n, 0) + 1
+                _data.pop(n, None)
+
+
+def _muat(nama):
+    with _lock:
+        tersimpan = _data.get(nama)
+        versi_muat = _versi.get(nama, 0)
+    if tersimpan is not None:
+        return tersimpan
+
+    conn = get_read_connection()
+    try:
+        rows = tuple(conn.execute(_QUERY[nama]).fetchall())
+    finally:
+        conn.close()
+    isi = (versi_muat, rows, {row["id"]: row for row in rows})
+
+    with _lock:
+        # Jangan simpan hasil yang sudah basi karena ada invalidate selama query berjalan
+        if _versi.get(nama, 0) == versi_muat:
+            _data[nama] = isi
+    return isi
+
+
+def ambil(nama):
+    """Semua baris katalog (sqlite3.Row, sudah terurut) sebagai tuple."""
+    return _muat(nama)[1]
+
+
+def baris(nama, id_):
+    """Satu baris katalog menurut id, atau None jika tidak ada."""
+    return _muat(nama)[2].get(id_)
+
+
+def label(nama, id_, default="-"):
+    row = baris(nama, id_)
+    return row["label"] if row is not None else default
+
+
+def opsi(nama):
+    """Pilihan selectbox berupa [(id, label), ...]."""
+    return [(row["id"], row["label"]) for row in ambil(nama)]
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-from db import get_connection, init_db
+from db import get_read_connection
+import katalog
 import sqlite3
+import writer
 
 def show_kelas():
     # Pastikan user adalah admin
@@ -10,22 +12,16 @@ def show_kelas():
         return
 
     st.title("🏫 Manajemen Kelas")
-    init_db() # Inisialisasi database jika belum ada
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    # Fungsi untuk memuat data kelas
-    def load_data_kelas():
-        cursor.execute("SELECT id, nama_kelas, tingkat FROM kelas ORDER BY tingkat, nama_kelas ASC")
-        return cursor.fetchall()
-
-    # Menampilkan daftar kelas
+    # Menampilkan daftar kelas (dari katalog, tanpa query selama tidak ada perubahan)
     st.subheader("Daftar Kelas")
-    data_kelas = load_data_kelas()
+    data_kelas = katalog.ambil("kelas")
 
     if data_kelas:
-        df_kelas = pd.DataFrame(data_kelas, columns=["ID", "Nama Kelas", "Tingkat"])
+        df_kelas = pd.DataFrame([(k['id'], k['nama_kelas'], k['tingkat']) for k in data_kelas], columns=["ID", "Nama Kelas", "Tingkat"])
         st.dataframe(df_kelas, use_container_width=True, hide_index=True)
     else:
         st.info("Belum ada data kelas.")
@@ -37,7 +33,7 @@ def show_kelas():
 
     # Pilihan untuk edit atau tambah baru
     edit_id_kelas = st.selectbox("Pilih Kelas untuk Diedit (kosongkan untuk menambah baru)", 
-                                 options=[("", "Tambah Baru")] + [(k['id'], f"{k['tingkat']} - {k['nama_kelas']}") for k in data_kelas],
+                                 options=[("", "Tambah Baru")] + katalog.opsi("kelas"),
                                  format_func=lambda x: x[1], key="edit_kelas_id")
 
     current_nama_kelas = ""
@@ -81,14 +77,14 @@ def show_kelas():
             else:
                 try:
                     if edit_id_kelas and edit_id_kelas[0]: # Mode Edit
-                        cursor.execute("UPDATE kelas SET nama_kelas = ?, tingkat = ? WHERE id = ?", 
-                                       (nama_kelas_input, tingkat_input, edit_id_kelas[0]))
-                        conn.commit()
+                        writer.eksekusi("UPDATE kelas SET nama_kelas = ?, tingkat = ? WHERE id = ?", 
+                                        (nama_kelas_input, tingkat_input, edit_id_kelas[0]))
+                        katalog.invalidate("kelas")
                         st.success(f"Kelas '{tingkat_input} - {nama_kelas_input}' berhasil diperbarui.")
                     else: # Mode Tambah Baru
-                        cursor.execute("INSERT INTO kelas (nama_kelas, tingkat) VALUES (?, ?)", 
-                                       (nama_kelas_input, tingkat_input))
-                        conn.commit()
+                        writer.eksekusi("INSERT INTO kelas (nama_kelas, tingkat) VALUES (?, ?)", 
+                                        (nama_kelas_input, tingkat_input))
+                        katalog.invalidate("kelas")
                         st.success(f"Kelas '{tingkat_input} - {nama_kelas_input}' berhasil ditambahkan.")
                     
                     st.session_state.edit_kelas_id = ("", "Tambah Baru")
@@ -105,15 +101,16 @@ def show_kelas():
 
     # Logika konfirmasi penghapusan kelas
     if 'confirm_delete_kelas_id' in st.session_state and st.session_state.confirm_delete_kelas_id:
-        st.warning(f"Apakah Anda yakin ingin menghapus kelas '{st.session_state.confirm_delete_kelas_nama}'? Menghapus kelas akan mengatur ulang `kelas_id` pada siswa yang terdaftar di kelas ini menjadi KOSONG (NULL). Data siswa tidak akan terhapus.")
+        st.warning(f"Apakah Anda yakin ingin menghapus kelas '{st.session_state.confirm_delete_kelas_nama}'? Menghapus kelas akan mengatur ulang `kelas_id` pada siswa yang terdaftar di kelas ini menjadi KOSONG (NULL) dan menghapus penugasan mengajar di kelas ini. Data siswa tidak akan terhapus.")
         
         col_confirm_del_kelas, col_cancel_del_kelas = st.columns(2)
         with col_confirm_del_kelas:
             if st.button("Ya, Hapus Kelas", type="primary"):
                 try:
-                    # Hapus kelas (siswa.kelas_id akan di-set NULL karena ON DELETE SET NULL)
-                    cursor.execute("DELETE FROM kelas WHERE id = ?", (st.session_state.confirm_delete_kelas_id,))
-                    conn.commit()
+                    # Hapus kelas (siswa.kelas_id akan di-set NULL karena ON DELETE SET NULL,
+                    # penugasan di kelas ini ikut terhapus karena ON DELETE CASCADE)
+                    writer.eksekusi("DELETE FROM kelas WHERE id = ?", (st.session_state.confirm_delete_kelas_id,))
+                    katalog.invalidate("kelas", "penugasan")
                     st.success(f"Kelas '{st.session_state.confirm_delete_kelas_nama}' berhasil dihapus. Siswa yang sebelumnya di kelas ini kini tidak memiliki kelas.")
                     
                     del st.session_state.confirm_delete_kelas_id
@@ -0,0 +1,118 @@
+# Konteks mengajar guru: semester -> kelas -> mapel (beserta status aktif mapel di semester
+# itu), dibangun dengan SATU query dan disimpan di session. Halaman nilai bernavigasi
+# sepenuhnya dari objek ini, sehingga memilih kelas/mapel tidak lagi memicu query.
+#
+# Konteks dibangun ulang otomatis bila ada penulisan yang memengaruhinya: penugasan guru,
+# aktivasi semester, konfigurasi mapel per semester, atau data kelas/mapel (lihat
+# katalog.invalidate di halaman admin). Penugasan semester yang sudah diarsipkan tidak lagi ada
+# di database utama dan dibaca dari berkas arsipnya (arsip.penugasan_arsip).
+import streamlit as st
+
+from db import get_read_connection
+import arsip
+import katalog
+import queries
+
+# Nama versi katalog yang menentukan kapan konteks harus dibangun ulang
+_SUMBER_VERSI = ("semester", "kelas", "mapel", "penugasan", "mapel_semester_config")
+
+
+def _versi_sumber():
+    return tuple(katalog.versi(nama) for nama in _SUMBER_VERSI)
+
+
+def bangun_konteks(conn, guru_id):
+    """Membangun konteks mengajar guru dari satu query.
+
+    Hasilnya dict:
+        {"guru_id", "semester_aktif": {"id", "nama_semester"} atau None,
+         "semester": {semester_id: {"id", "nama_semester", "aktif",
+                                    "kelas": {kelas_id: {"id", "label",
+                                                         "mapel": {mapel_id: {"id", "label", "nama_mapel", "aktif"}}}}}}}
+    Kelas dan mapel sudah terurut menurut labelnya.
+    """
+    rows = conn.execute(queries.KONTEKS_GURU, (guru_id,)).fetchall() + arsip.penugasan_arsip(conn, guru_id)
+    rows = sorted(rows, key=lambda r: (r["semester_id"], r["nama_kelas"] or "", r["nama_lengkap_mapel"] or ""))
+
+    semester = {}
+    semester_aktif = None
+    for row in rows:
+        sem = semester.setdefault(row["semester_id"], {
+            "id": row["semester_id"],
+            "nama_semester": row["nama_semester"],
+            "aktif": bool(row["aktif"]),
+            "kelas": {},
+        })
+        if row["aktif"]:
+            semester_aktif = {"id": row["semester_id"], "nama_semester": row["nama_semester"]}
+        if row["kelas_id"] is None:
+            continue
+        kelas = sem["kelas"].setdefault(row["kelas_id"], {
+            "id": row["kelas_id"],
+            "label": row["nama_kelas"],
+            "mapel": {},
+        })
+        kelas["mapel"][row["mapel_id"]] = {
+            "id": row["mapel_id"],
+            "label": row["nama_lengkap_mapel"],
+            "nama_mapel": row["nama_mapel"],
+            "aktif": bool(row["mapel_aktif"]),
+        }
+    return {"guru_id": guru_id, "semester_aktif": semester_aktif, "semester": semester}
+
+
+def ambil_konteks(guru_id, conn=None):
+    """Konteks guru dari session; dibangun ulang hanya jika belum ada, milik guru lain,
+    atau data sumbernya sudah berubah sejak konteks dibangun."""
+    versi = _versi_sumber()
+    konteks = st.session_state.get("konteks_guru")
+    if konteks and konteks["guru_id"] == guru_id and konteks["versi"] == versi:
+        return konteks
+
+    conn_sendiri = conn is None
+    if conn_sendiri:
+        conn = get_read_connection()
+    try:
+        konteks = bangun_konteks(conn, guru_id)
+    finally:
+        if conn_sendiri:
+            conn.close()
+    konteks["versi"] = versi
+    st.session_state.konteks_guru = konteks
+    return konteks
+
+
+def kelas_semester(konteks, semester_id):
+    """[(kelas_id, label), ...] untuk kelas yang diajar pada semester tersebut."""
+    sem = konteks["semester"].get(semester_id)
+    if not sem:
+        return []
+    return [(k["id"], k["label"]) for k in sem["kelas"].values()]
+
+
+def mapel_kelas(konteks, semester_id, kelas_id, hanya_aktif=True):
+    """[(mapel_id, label), ...] yang diajar di kelas tersebut; default hanya mapel yang
+    dikonfigurasi aktif untuk semester itu."""
+    kelas = konteks["semester"].get(semester_id, {}).get("kelas", {}).get(kelas_id)
+    if not kelas:
+        return []
+    return [(m["id"], m["label"]) for m in kelas["mapel"].values() if m["aktif"] or not hanya_aktif]
+
+
+def semua_kelas(konteks):
+    """Semua kelas yang pernah diajar guru (semua semester), untuk filter riwayat."""
+    hasil = {}
+    for sem in konteks["semester"].values():
+        for k in sem["kelas"].values():
+            hasil[k["id"]] = k["label"]
+    return sorted(hasil.items(), key=lambda x: x[1])
+
+
+def semua_mapel(konteks):
+    """Semua mapel yang pernah diajar guru (semua semester), untuk filter riwayat."""
+    hasil = {}
+    for sem in konteks["semester"].values():
+        for k in sem["kelas"].values():
+            for m in k["mapel"].values():
+                hasil[m["id"]] = m["nama_mapel"]
+    return sorted(hasil.items(), key=lambda x: x[1])
@@ -0,0 +1,191 @@
+# Leger nilai: satu baris per siswa, kolom setiap mapel x tahap penilaian ditambah nilai akhir
+# mapel (lihat rapor.py), rata-rata, dan peringkat kelas. Satu sheet Excel per kelas.
+#
+#     python leger.py --db sinfomik.db --semester 20 --output leger.xlsx
+#     python leger.py --db sinfomik.db --semester 20 --kelas 1 2 --output leger_10.xlsx
+#
+# Nilai satu semester dimuat dengan satu query kolom (rapor.muat_nilai), lalu dibentuk menjadi
+# tabel lebar siswa x (mapel, tahap) dengan satu pivot untuk seluruh sekolah; setiap kelas
+# cukup mengambil baris siswanya dan membuang kolom mapel yang kosong. Workbook ditulis oleh
+# xlsxwriter dalam mode constant_memory: setiap baris langsung dibuang ke berkas sementara
+# begitu baris berikutnya ditulis, jadi memori tidak bergantung pada jumlah siswa.
+import argparse
+import itertools
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import db
+import katalog
+import rapor
+
+# Penanda kolom nilai akhir di level tahap (id tahap selalu >= 1)
+_AKHIR = 0
+
+
+def susun(semester_id, kelas_ids=None):
+    """Tabel leger satu semester: (lebar, siswa, peringkat, waktu).
+
+    `lebar` ber-index siswa_id dengan kolom MultiIndex (mapel_id, tahap_id), tahap_id 0 untuk
+    nilai akhir; `siswa` berisi nisn, nama, kelas_id per siswa_id; `peringkat` berisi rata dan
+    peringkat per siswa_id."""
+    waktu = {}
+    mulai = time.perf_counter()
+    conn = db.get_read_connection()
+    try:
+        nilai = rapor.muat_nilai(conn, [semester_id])
+        bobot = rapor.matriks_bobot(conn)
+        siswa = rapor.muat_siswa(conn)
+    finally:
+        conn.close()
+    if kelas_ids is not None:
+        siswa = siswa[siswa["kelas_id"].isin(kelas_ids)]
+        nilai = nilai[nilai["siswa_id"].isin(siswa["siswa_id"])]
+    waktu["muat"] = time.perf_counter() - mulai
+
+    mulai = time.perf_counter()
+    akhir = rapor.hitung(nilai, bobot)
+    per_tahap = nilai.pivot(index="siswa_id", columns=["mapel_id", "tahap_id"], values="nilai")
+    per_mapel = akhir.pivot(index="siswa_id", columns="mapel_id", values="nilai_akhir")
+    per_mapel.columns = pd.MultiIndex.from_arrays(
+        [per_mapel.columns, np.full(len(per_mapel.columns), _AKHIR)], names=["mapel_id", "tahap_id"])
+    lebar = pd.concat([per_tahap, per_mapel], axis=1)
+    urutan = rapor.peringkat(akhir, siswa).set_index("siswa_id")
+    waktu["susun"] = time.perf_counter() - mulai
+    return lebar, siswa.set_index("siswa_id"), urutan, waktu
+
+
+def _urutan_kolom(kolom):
+    """Kolom (mapel_id, tahap_id) urut label mapel, lalu urutan tahap di katalog, nilai akhir terakhir."""
+    posisi_tahap = {row["id"]: i for i, row in enumerate(katalog.ambil("tahap"))}
+    return sorted(kolom, key=lambda k: (katalog.label("mapel", k[0]), k[1] == _AKHIR, posisi_tahap.get(k[1], k[1])))
+
+
+def _nama_sheet(teks, terpakai):
+    nama = re.sub(r"[\[\]:*?/\\]", "-", teks)[:31] or "Kelas"
+    dasar, i = nama, 2
+    while nama.lower() in terpakai:
+        akhiran = f" ({i})"
+        nama, i = dasar[:31 - len(akhiran)] + akhiran, i + 1
+    terpakai.add(nama.lower())
+    return nama
+
+
+def tulis(tujuan, lebar, siswa, urutan, judul):
+    """Menulis leger ke workbook `tujuan`, satu sheet per kelas (urut label kelas).
+    Mengembalikan jumlah sheet dan baris siswa yang ditulis."""
+    wb = xlsxwriter.Workbook(tujuan, {"constant_memory": True})
+    f_judul = wb.add_format({"bold": True, "font_size": 12})
+    f_kepala = wb.add_format({"bold": True, "align": "center", "valign": "vcenter", "border": 1, "bg_color": "#D9D9D9"})
+    f_akhir = wb.add_format({"bold": True, "num_format": "0.00"})
+    f_angka = wb.add_format({"num_format": "0.##"})
+
+    # Sekali untuk seluruh sekolah; per kelas cukup indexing array (tanpa reindex pandas per kelas)
+    semua_nilai = lebar.to_numpy(dtype=np.float64)
+    semua_kolom = list(lebar.columns)
+    posisi_kolom = {k: j for j, k in enumerate(semua_kolom)}
+    baris_siswa = lebar.index
+    urutan = urutan.reindex(siswa.index)
+    per_kelas = {k: anggota for k, anggota in siswa.sort_values("nama").groupby("kelas_id")}
+
+    kelas_ada = set(siswa.loc[siswa.index.intersection(lebar.index), "kelas_id"].dropna().astype(int))
+    terpakai, jumlah_baris = set(), 0
+    daftar_kelas = [k for k in katalog.ambil("kelas") if k["id"] in kelas_ada]
+    for kelas in daftar_kelas:
+        anggota = per_kelas[kelas["id"]]
+        pos = baris_siswa.get_indexer(anggota.index)
+        nilai = np.full((len(anggota), len(semua_kolom)), np.nan)
+        nilai[pos >= 0] = semua_nilai[pos[pos >= 0]]
+        ada = ~np.isnan(nilai).all(axis=0)
+        kolom = _urutan_kolom([k for k, a in zip(semua_kolom, ada) if a])
+        nilai = nilai[:, [posisi_kolom[k] for k in kolom]]
+
+        ws = wb.add_worksheet(_nama_sheet(kelas["label"], terpakai))
+        ws.write(0, 0, f"Leger Nilai {judul} - Kelas {kelas['label']}", f_judul)
+        # Dua baris kepala: nama mapel (digabung selebar kolom tahapnya), lalu nama tahap
+        for c, teks in enumerate(["No", "NISN", "Nama"]):
+            ws.merge_range(2, c, 3, c, teks, f_kepala)
+        c = 3
+        for mapel_id, grup in itertools.groupby(k[0] for k in kolom):
+            jumlah = len(list(grup))
+            label_mapel = katalog.label("mapel", mapel_id)
+            if jumlah > 1:
+                ws.merge_range(2, c, 2, c + jumlah - 1, label_mapel, f_kepala)
+            else:
+                ws.write(2, c, label_mapel, f_kepala)
+            c += jumlah
+        for c_rata, teks in enumerate(["Rata-rata", "Peringkat"], start=c):
+            ws.merge_range(2, c_rata, 3, c_rata, teks, f_kepala)
+        ws.write_row(3, 3, ["Akhir" if t == _AKHIR else katalog.label("tahap", t) for _, t in kolom], f_kepala)
+        ws.set_column(1, 1, 12)
+        ws.set_column(2, 2, 28)
+        ws.freeze_panes(4, 3)
+
+        # NaN (belum dinilai) menjadi sel kosong
+        isi = np.where(np.isnan(nilai), None, nilai).tolist()
+        akhir = [k[1] == _AKHIR for k in kolom]
+        rata = urutan.loc[anggota.index, "rata"].tolist()
+        posisi = urutan.loc[anggota.index, "peringkat"].tolist()
+        for i, (nisn, nama, baris) in enumerate(zip(anggota["nisn"].tolist(), anggota["nama"].tolist(), isi)):
+            r = 4 + i
+            ws.write_number(r, 0, i + 1)
+            ws.write_string(r, 1, str(nisn))
+            ws.write_string(r, 2, nama)
+            for j, v in enumerate(baris):
+                if v is not None:
+                    ws.write_number(r, 3 + j, v, f_akhir if akhir[j] else f_angka)
+            if not pd.isna(rata[i]):
+                ws.write_number(r, 3 + len(kolom), rata[i], f_akhir)
+                ws.write_number(r, 4 + len(kolom), posisi[i])
+        jumlah_baris += len(anggota)
+    if not daftar_kelas:
+        wb.add_worksheet("Leger").write(0, 0, f"Leger Nilai {judul}: belum ada nilai.")
+    wb.close()
+    return len(daftar_kelas), jumlah_baris
+
+
+def buat(semester_id, tujuan, kelas_ids=None):
+    """Menyusun dan menulis leger satu semester ke `tujuan` (.xlsx). Mengembalikan ringkasan:
+    jumlah sheet (kelas), siswa, ukuran berkas, dan detik per tahap (muat, susun, tulis)."""
+    lebar, siswa, urutan, waktu = susun(semester_id, kelas_ids)
+    mulai = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(tujuan)), exist_ok=True)
+    sementara = tujuan + ".tmp"
+    try:
+        kelas, baris = tulis(sementara, lebar, siswa, urutan, katalog.label("semester", semester_id))
+        os.replace(sementara, tujuan)
+    finally:
+        if os.path.exists(sementara):
+            os.remove(sementara)
+    waktu["tulis"] = time.perf_counter() - mulai
+    return {"kelas": kelas, "siswa": baris, "ukuran": os.path.getsize(tujuan), "waktu": waktu}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ekspor leger nilai (Excel, satu sheet per kelas).")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--semester", type=int, required=True, metavar="ID")
+    parser.add_argument("--kelas", type=int, nargs="+", metavar="ID", help="Hanya kelas ini (default semua)")
+    parser.add_argument("--output", required=True, help="Berkas .xlsx tujuan")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+
+    ringkasan = buat(args.semester, args.output, args.kelas)
+    waktu = ringkasan["waktu"]
+    print(f"{ringkasan['siswa']} siswa di {ringkasan['kelas']} kelas -> {args.output} "
+          f"({ringkasan['ukuran'] / 1024 / 1024:.1f} MB)")
+    print("  " + "   ".join(f"{k} {v:.2f} s" for k, v in waktu.items()) + f"   total {sum(waktu.values()):.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
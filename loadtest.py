@@ -0,0 +1,402 @@
+# Uji beban sesi bersamaan: menjalankan sinfomik.py tanpa browser lewat AppTest Streamlit.
+#
+#     python data_sintetis.py --db bench.db --skala sedang
+#     python loadtest.py --db bench.db --tingkat 1 2 4 8 16 --durasi 30
+#
+# Setiap sesi virtual adalah satu AppTest (session state sendiri) di PROSESNYA sendiri:
+# AppTest memasang Runtime Streamlit global per run, sehingga beberapa AppTest tidak bisa
+# berjalan paralel dalam satu proses. Lock tulis SQLite berlaku lintas proses, jadi jalur
+# tulis tetap teruji seperti di server; yang tidak ikut teruji adalah antrean pool koneksi
+# bersama dan GIL satu proses server (render di sini berjalan paralel penuh). Setiap proses
+# memakai ~100 MB memori.
+#
+# Guru bergantian memilih kelas/mapel/tahap di show_nilai lalu menekan "Simpan Nilai";
+# admin menelusuri show_siswa (halaman berikutnya, pencarian) dan membuka show_guru.
+#
+# Untuk setiap tingkat konkurensi dilaporkan: persentil waktu rerun per aksi, throughput
+# simpan nilai, waktu tulis yang dilaporkan halaman (termasuk menunggu lock SQLite), jumlah
+# simpan yang menunggu lock (waktu tulis di atas --ambang-lock-ms), galat "database is
+# locked", dan persentase aksi yang gagal. Dari situ diperkirakan titik jenuh jalur tulis:
+# tingkat di mana throughput simpan tidak lagi naik walau jumlah sesi bertambah.
+#
+# Secara default uji berjalan pada SALINAN database (nilai semester aktif dikosongkan agar
+# guru selalu punya formulir baru untuk diisi); --langsung memakai file aslinya.
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sinfomik.py")
+
+# Komposisi aksi admin (bobot relatif)
+AKSI_ADMIN = [("siswa.berikutnya", 4), ("siswa.cari", 4), ("siswa.buka", 1), ("guru.buka", 1)]
+
+
+def _persentil(nilai, p):
+    if not nilai:
+        return 0.0
+    urut = sorted(nilai)
+    return urut[min(len(urut) - 1, round(p / 100 * (len(urut) - 1)))]
+
+
+def siapkan_database(sumber, tujuan):
+    """Menyalin database (aman walau sedang WAL) lalu mengosongkan nilai semester aktif."""
+    src = sqlite3.connect(sumber)
+    dst = sqlite3.connect(tujuan)
+    try:
+        src.backup(dst)
+        dst.execute("DELETE FROM nilai WHERE semester_id = (SELECT id FROM semester WHERE aktif = 1)")
+        dst.commit()
+    finally:
+        src.close()
+        dst.close()
+
+
+class Sesi:
+    """Satu sesi pengguna virtual. `langkah()` menjalankan satu aksi dan mencatatnya."""
+
+    def __init__(self, user, rng, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.user = user
+        self.rng = rng
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.at.session_state.logged_in = True
+        self.at.session_state.role = user["role"]
+        self.at.session_state.user_id = user["id"]
+        self.at.session_state.username = user["username"]
+        self.catatan = []  # (aksi, ms, galat)
+        self.simpan_ms = []  # waktu tulis yang dilaporkan halaman nilai
+        self.baris_disimpan = 0
+        self.busy = 0
+
+    def _jalankan(self, aksi, widget=None):
+        """Menjalankan satu rerun (lewat widget jika ada) dan mencatat waktu serta galatnya."""
+        mulai = time.perf_counter()
+        galat = None
+        try:
+            (widget or self.at).run()
+            pesan = [e.value for e in self.at.exception] + [
+                e.value for e in self.at.error if "Gagal" in e.value or "kesalahan" in e.value
+            ]
+            if pesan:
+                galat = str(pesan[0])
+        except Exception as e:  # timeout AppTest, dsb.
+            galat = f"{type(e).__name__}: {e}"
+        ms = (time.perf_counter() - mulai) * 1000
+        if galat and "locked" in galat:
+            self.busy += 1
+        self.catatan.append((aksi, ms, galat))
+        return galat is None
+
+    def pemanasan(self):
+        """Rerun pertama (import modul halaman, cache katalog) tidak ikut diukur."""
+        self.langkah()
+        self.catatan.clear()
+        self.simpan_ms.clear()
+        self.baris_disimpan = self.busy = 0
+
+
+class SesiGuru(Sesi):
+    def __init__(self, user, rng, timeout):
+        super().__init__(user, rng, timeout)
+        self.at.session_state.page = "nilai"
+        self.kombinasi = []
+
+    def _isi_kombinasi(self):
+        import katalog
+        import konteks_guru
+
+        if not self._jalankan("nilai.buka"):
+            return
+        konteks = self.at.session_state["konteks_guru"]
+        semester_id = konteks["semester_aktif"]["id"] if konteks["semester_aktif"] else None
+        tahap = [(t["id"], t["nama_tahap"]) for t in katalog.ambil("tahap")]
+        self.kombinasi = [
+            (kelas, mapel, t)
+            for kelas in konteks_guru.kelas_semester(konteks, semester_id)
+            for mapel in konteks_guru.mapel_kelas(konteks, semester_id, kelas[0])
+            for t in tahap
+        ]
+        self.rng.shuffle(self.kombinasi)
+
+    def _pilih(self, key, nilai):
+        widget = self.at.selectbox(key=key)
+        if widget.value != nilai:
+            return self._jalankan("nilai.pilih", widget.set_value(nilai))
+        return True
+
+    def langkah(self):
+        if not self.kombinasi:
+            self._isi_kombinasi()
+            if not self.kombinasi:
+                # Semua formulir guru ini sudah terisi: kosongkan lagi (tidak diukur)
+                from db import get_connection
+                with get_connection() as conn:
+                    conn.execute("DELETE FROM nilai WHERE guru_id = ? AND semester_id = "
+                                 "(SELECT id FROM semester WHERE aktif = 1)", (self.user["id"],))
+                self._isi_kombinasi()
+                if not self.kombinasi:
+                    time.sleep(0.5)  # guru tanpa penugasan di semester aktif
+                    return
+        kelas, mapel, tahap = self.kombinasi.pop()
+        try:
+            if not (self._pilih("nilai_select_kelas", kelas) and self._pilih("nilai_select_mapel", mapel)
+                    and self._pilih("nilai_select_tahap", tahap)):
+                return
+        except KeyError:
+            return  # widget tidak tampil (misal kelas tanpa siswa)
+
+        terbuka = [n for n in self.at.number_input if n.key and n.key.startswith("nilai_") and not n.disabled]
+        if not terbuka:
+            return
+        for n in terbuka:
+            n.set_value(float(round(min(100, max(0, self.rng.gauss(78, 10))))))
+        tombol = next(b for b in self.at.button if b.label == "Simpan Nilai")
+        if self._jalankan("nilai.simpan", tombol.click()):
+            self.baris_disimpan += len(terbuka)
+            for c in self.at.caption:
+                cocok = re.match(r"Waktu simpan: ([\d.]+) ms", c.value)
+                if cocok:
+                    self.simpan_ms.append(float(cocok.group(1)))
+
+
+class SesiAdmin(Sesi):
+    def __init__(self, user, rng, timeout, kata_kunci):
+        super().__init__(user, rng, timeout)
+        self.kata_kunci = kata_kunci
+        self.at.session_state.page = "siswa"
+        self.sudah_buka = False
+
+    def langkah(self):
+        if not self.sudah_buka:
+            self.sudah_buka = self._jalankan("siswa.buka")
+            return
+        aksi = self.rng.choices([a for a, _ in AKSI_ADMIN], [b for _, b in AKSI_ADMIN])[0]
+        halaman = self.at.session_state["page"]
+        if aksi == "guru.buka":
+            self.at.session_state.page = "guru"
+            self._jalankan(aksi)
+        elif halaman != "siswa" or aksi == "siswa.buka":
+            self.at.session_state.page = "siswa"
+            self._jalankan("siswa.buka")
+        elif aksi == "siswa.berikutnya":
+            tombol = self.at.button(key="siswa_berikutnya")
+            if tombol.disabled:
+                cari = next(t for t in self.at.text_input if t.label.startswith("Cari"))
+                self._jalankan("siswa.cari", cari.input(""))
+            else:
+                self._jalankan(aksi, tombol.click())
+        else:
+            kata = self.rng.choice(self.kata_kunci)
+            cari = next(t for t in self.at.text_input if t.label.startswith("Cari"))
+            self._jalankan(aksi, cari.input(kata[: self.rng.choice((2, 3, len(kata)))]))
+
+
+def _pekerja(jenis, user, kata_kunci, seed, args, mulai_bersama, selesai_pada, antrian):
+    """Isi satu proses sesi: menunggu semua sesi siap, beraksi sampai tenggat
+    `selesai_pada.value` (time.time()), lalu mengirim catatannya ke `antrian`."""
+    hasil = {"catatan": [], "simpan_ms": [], "baris_disimpan": 0, "busy": 0}
+    try:
+        rng = random.Random(seed)
+        if jenis == "guru":
+            s = SesiGuru(user, rng, args.timeout)
+        else:
+            s = SesiAdmin(user, rng, args.timeout, kata_kunci)
+        s.pemanasan()
+        mulai_bersama.wait(timeout=300)  # semua proses siap
+        mulai_bersama.wait(timeout=300)  # tenggat sudah dipasang
+        while time.time() < selesai_pada.value:
+            s.langkah()
+            if args.jeda:
+                time.sleep(rng.uniform(0, 2 * args.jeda))
+        hasil = {"catatan": s.catatan, "simpan_ms": s.simpan_ms, "baris_disimpan": s.baris_disimpan, "busy": s.busy}
+    except Exception as e:
+        hasil["catatan"].append(("sesi", 0.0, f"{type(e).__name__}: {e}"))
+    finally:
+        antrian.put(hasil)
+
+
+def _pengguna(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        guru = [dict(r) for r in conn.execute(
+            "SELECT DISTINCT u.id, u.username, u.role FROM user u "
+            "JOIN guru_mapel_kelas gmk ON gmk.user_id = u.id "
+            "JOIN semester s ON s.id = gmk.semester_id AND s.aktif = 1 ORDER BY u.id")]
+        admin = [dict(r) for r in conn.execute("SELECT id, username, role FROM user WHERE role = 'admin' ORDER BY id")]
+        kata_kunci = [r[0] for r in conn.execute("SELECT nama FROM siswa ORDER BY id LIMIT 2000")]
+        kata_kunci += [str(r[0])[:6] for r in conn.execute("SELECT nisn FROM siswa ORDER BY id LIMIT 200")]
+    finally:
+        conn.close()
+    if not guru or not admin or not kata_kunci:
+        raise SystemExit("Database belum berisi guru dengan penugasan aktif, admin, dan siswa. "
+                         "Jalankan data_sintetis.py terlebih dahulu.")
+    return guru, admin, kata_kunci
+
+
+def jalankan_tingkat(n, guru, admin, kata_kunci, args, seed):
+    """Menjalankan n sesi bersamaan selama args.durasi detik; mengembalikan ringkasannya."""
+    ctx = multiprocessing.get_context("spawn")
+    rng = random.Random(seed)
+    jumlah_guru = max(1, round(n * args.rasio_guru)) if args.rasio_guru > 0 else 0
+    mulai_bersama = ctx.Barrier(n + 1)
+    antrian = ctx.Queue()
+    # Tenggat dihitung setelah semua proses siap (startup proses tidak ikut diukur)
+    selesai_pada = ctx.Value("d", 0.0)
+    proses = []
+    for i in range(n):
+        jenis, user = ("guru", guru[i % len(guru)]) if i < jumlah_guru else ("admin", admin[i % len(admin)])
+        proses.append(ctx.Process(target=_pekerja, daemon=True, args=(
+            jenis, user, kata_kunci, rng.random(), args, mulai_bersama, selesai_pada, antrian)))
+    for p in proses:
+        p.start()
+    mulai_bersama.wait(timeout=300)
+    mulai = time.time()
+    selesai_pada.value = mulai + args.durasi
+    mulai_bersama.wait(timeout=300)
+    sesi = [antrian.get(timeout=args.durasi + 10 * args.timeout + 60) for _ in proses]
+    for p in proses:
+        p.join()
+    durasi = time.time() - mulai
+
+    catatan = [tuple(c) for s in sesi for c in s["catatan"]]
+    per_aksi = {}
+    for aksi, ms, galat in catatan:
+        a = per_aksi.setdefault(aksi, {"ms": [], "galat": 0})
+        a["ms"].append(ms)
+        a["galat"] += galat is not None
+    simpan_ms = [ms for s in sesi for ms in s["simpan_ms"]]
+    jumlah_simpan = len(per_aksi.get("nilai.simpan", {"ms": []})["ms"]) - per_aksi.get("nilai.simpan", {"galat": 0})["galat"]
+    galat = [g for _, _, g in catatan if g]
+    semua_ms = [ms for _, ms, _ in catatan]
+
+    return {
+        "sesi": n,
+        "sesi_guru": jumlah_guru,
+        "durasi_s": round(durasi, 1),
+        "aksi": len(catatan),
+        "aksi_per_s": round(len(catatan) / durasi, 2),
+        "simpan_per_s": round(jumlah_simpan / durasi, 2),
+        "baris_per_s": round(sum(s["baris_disimpan"] for s in sesi) / durasi, 1),
+        "rerun_p50_ms": round(_persentil(semua_ms, 50), 1),
+        "rerun_p95_ms": round(_persentil(semua_ms, 95), 1),
+        "rerun_p99_ms": round(_persentil(semua_ms, 99), 1),
+        "tulis_p50_ms": round(_persentil(simpan_ms, 50), 1),
+        "tulis_p95_ms": round(_persentil(simpan_ms, 95), 1),
+        "galat_persen": round(100 * len(galat) / len(catatan), 2) if catatan else 0.0,
+        "tunggu_lock": sum(ms >= args.ambang_lock_ms for ms in simpan_ms),
+        "database_locked": sum(s["busy"] for s in sesi),
+        "per_aksi": {
+            aksi: {
+                "n": len(a["ms"]),
+                "p50_ms": round(_persentil(a["ms"], 50), 1),
+                "p95_ms": round(_persentil(a["ms"], 95), 1),
+                "p99_ms": round(_persentil(a["ms"], 99), 1),
+                "galat": a["galat"],
+            }
+            for aksi, a in sorted(per_aksi.items())
+        },
+        "contoh_galat": sorted(set(galat))[:5],
+    }
+
+
+def titik_jenuh(hasil, ambang=0.10):
+    """Tingkat konkurensi pertama di mana throughput simpan naik kurang dari `ambang`
+    dibanding tingkat sebelumnya, padahal jumlah sesi bertambah (None jika belum jenuh)."""
+    for sebelum, sesudah in zip(hasil, hasil[1:]):
+        if sebelum["simpan_per_s"] and sesudah["simpan_per_s"] < sebelum["simpan_per_s"] * (1 + ambang):
+            return sebelum["sesi"]
+    return None
+
+
+def cetak_tingkat(r):
+    print(f"  {r['sesi']:>4} sesi ({r['sesi_guru']} guru)  {r['aksi_per_s']:7.2f} aksi/s  "
+          f"{r['simpan_per_s']:6.2f} simpan/s  rerun p50/p95/p99 {r['rerun_p50_ms']:7.1f}/{r['rerun_p95_ms']:7.1f}/"
+          f"{r['rerun_p99_ms']:7.1f} ms  tulis p50/p95 {r['tulis_p50_ms']:6.1f}/{r['tulis_p95_ms']:6.1f} ms  "
+          f"tunggu lock {r['tunggu_lock']}  locked {r['database_locked']}  galat {r['galat_persen']:5.2f}%")
+    for aksi, a in r["per_aksi"].items():
+        print(f"         {aksi:<18} n={a['n']:<6} p50 {a['p50_ms']:8.1f}  p95 {a['p95_ms']:8.1f}  "
+              f"p99 {a['p99_ms']:8.1f} ms  galat {a['galat']}")
+    for g in r["contoh_galat"]:
+        print(f"         ! {g[:160]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Uji beban sesi Streamlit bersamaan untuk SINFOMIK.")
+    parser.add_argument("--db", required=True, help="Database sumber (misal hasil data_sintetis.py)")
+    parser.add_argument("--tingkat", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Jumlah sesi bersamaan")
+    parser.add_argument("--durasi", type=float, default=30, help="Detik per tingkat konkurensi")
+    parser.add_argument("--rasio-guru", type=float, default=0.8, help="Porsi sesi guru (sisanya admin)")
+    parser.add_argument("--jeda", type=float, default=0.0, help="Rata-rata jeda antar aksi per sesi (detik)")
+    parser.add_argument("--ambang-lock-ms", type=float, default=50,
+                        help="Simpan dengan waktu tulis di atas ini dihitung menunggu lock")
+    parser.add_argument("--timeout", type=float, default=60, help="Batas waktu satu rerun AppTest (detik)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--langsung", action="store_true", help="Pakai --db langsung, bukan salinannya (nilai ikut berubah)")
+    parser.add_argument("--output", help="Tulis hasil ke file JSON ini")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+
+    kerja_dir = tempfile.mkdtemp(prefix="sinfomik_loadtest_")
+    try:
+        if args.langsung:
+            db_path = args.db
+        else:
+            db_path = os.path.join(kerja_dir, "loadtest.db")
+            print(f"Menyalin {args.db} ke {db_path} ...")
+            siapkan_database(args.db, db_path)
+        # Diwarisi proses sesi; harus terpasang sebelum modul aplikasi (db, tracer) diimpor
+        os.environ["SINFOMIK_DB"] = db_path
+        os.environ.setdefault("SINFOMIK_SLOW_QUERY_LOG", os.path.join(kerja_dir, "slow_queries.log"))
+        os.environ.setdefault("SINFOMIK_PROFIL_LOG", os.path.join(kerja_dir, "profil.jsonl"))
+        sys.path.insert(0, os.path.dirname(APP))
+
+        import db
+        db.init_db()  # migrasi sekali di sini, bukan berebut di setiap proses sesi
+        guru, admin, kata_kunci = _pengguna(db_path)
+        print(f"Uji beban {args.db}: {len(guru)} guru aktif, {args.durasi:g} s per tingkat, tingkat {args.tingkat}")
+
+        hasil = []
+        for i, n in enumerate(args.tingkat):
+            r = jalankan_tingkat(n, guru, admin, kata_kunci, args, args.seed + i)
+            cetak_tingkat(r)
+            hasil.append(r)
+
+        jenuh = titik_jenuh(hasil)
+        if jenuh:
+            print(f"\nPerkiraan titik jenuh jalur tulis: sekitar {jenuh} sesi bersamaan "
+                  f"(throughput simpan tidak naik lagi setelahnya).")
+            if not any(r["tunggu_lock"] or r["database_locked"] for r in hasil if r["sesi"] > jenuh):
+                print(f"Simpan tidak menunggu lock SQLite; hambatannya di luar jalur tulis "
+                      f"(CPU/render, {os.cpu_count()} CPU di mesin ini).")
+        else:
+            print("\nThroughput simpan masih naik di tingkat tertinggi; coba tingkat yang lebih besar.")
+    finally:
+        shutil.rmtree(kerja_dir, ignore_errors=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"waktu": time.strftime("%Y-%m-%dT%H:%M:%S"), "db": os.path.abspath(args.db),
+                         "durasi_s": args.durasi, "ambang_lock_ms": args.ambang_lock_ms, "rasio_guru": args.rasio_guru, "jeda_s": args.jeda,
+                         "seed": args.seed, "sqlite": sqlite3.sqlite_version},
+                "tingkat": hasil,
+                "titik_jenuh": jenuh,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Hasil ditulis ke {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
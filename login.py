@@ -1,10 +1,11 @@
 import streamlit as st
-from db import get_connection
+from db import get_read_connection
 import time
 import sqlite3
+import konteks_guru
 
 def authenticate(username, password):
-    conn = sqlite3.connect('sinfomik.db')
+    conn = get_read_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -34,8 +35,6 @@ def show_login():
         st.session_state.role = ""
     if "page" not in st.session_state:
         st.session_state.page = "login"
-    if "guru_data" not in st.session_state:
-        st.session_state.guru_data = {}
 
     # Jika sudah login, tampilkan info
     if st.session_state.logged_in:
@@ -53,7 +52,7 @@ def show_login():
         if login_button:
             if username and password:
                 try:
-                    with get_connection() as conn:
+                    with get_read_connection() as conn:
                         conn.row_factory = sqlite3.Row
                         cursor = conn.cursor()
                         
@@ -73,22 +72,10 @@ def show_login():
                             st.session_state.username = user['username']
                             st.session_state.role = user['role']
                             
-                            # Jika guru, ambil data mengajar
+                            # Jika guru, bangun konteks mengajar (semester -> kelas -> mapel)
+                            # sekali di sini; halaman nilai memakainya dari session
                             if user['role'] == 'guru':
-                                cursor.execute(
-                                    """SELECT mp.nama_mapel, k.nama_kelas 
-                                       FROM guru_mapel_kelas gmk
-                                       JOIN mata_pelajaran mp ON gmk.mapel_id = mp.id
-                                       JOIN kelas k ON gmk.kelas_id = k.id
-                                       WHERE gmk.user_id = ?""",
-                                    (user['id'],)  # Perhatikan tanda koma dan kurung tutup
-                                )
-                                mengajar = cursor.fetchall()
-                                
-                                st.session_state.guru_data = {
-                                    "mapel": list(set([m['nama_mapel'] for m in mengajar])),
-                                    "kelas": [m['nama_kelas'] for m in mengajar]
-                                }
+                                konteks_guru.ambil_konteks(user['id'], conn)
                             
                             st.success("Login berhasil!")
                             time.sleep(1.5)
@@ -8,6 +8,7 @@ def show_logout():
     if st.button("Konfirmasi Logout"):
         st.session_state.logged_in = False
         st.session_state.username = ""
+        st.session_state.pop("konteks_guru", None)
         st.session_state.page = "login"  # Redirect ke login page
         st.success("Logout berhasil! Mengalihkan ke halaman login...")
         st.rerun()
@@ -1,7 +1,25 @@
 import streamlit as st
 import pandas as pd
-from db import get_connection, init_db
+from db import get_read_connection
+import katalog
+import queries
 import sqlite3
+import writer
+
+def simpan_config_mapel(conn, mapel_id, configs):
+    """Menyimpan status aktif mapel per semester ({semester_id: aktif}) dengan satu upsert.
+    Tidak melakukan commit; dijalankan lewat writer.tulis() di halaman."""
+    conn.executemany(queries.UPSERT_CONFIG_MAPEL,
+                     [(mapel_id, semester_id, is_active) for semester_id, is_active in configs.items()])
+
+
+def simpan_bobot_mapel(conn, mapel_id, bobot):
+    """Mengganti bobot tahap penilaian satu mapel ({tahap_id: bobot}) untuk rapor.
+    Tidak melakukan commit; dijalankan lewat writer.tulis() di halaman."""
+    conn.execute("DELETE FROM bobot_tahap WHERE mapel_id = ?", (mapel_id,))
+    conn.executemany("INSERT INTO bobot_tahap (mapel_id, tahap_id, bobot) VALUES (?, ?, ?)",
+                     [(mapel_id, tahap_id, nilai_bobot) for tahap_id, nilai_bobot in bobot.items()])
+
 
 def show_matapelajaran():
     # Pastikan user adalah admin
@@ -10,40 +28,21 @@ def show_matapelajaran():
         return
 
     st.title("📖 Manajemen Mata Pelajaran")
-    init_db() 
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
     # Fungsi untuk memuat data
-    def load_data_mapel():
-        cursor.execute("SELECT id, nama_mapel, kode_mapel FROM mata_pelajaran ORDER BY nama_mapel ASC")
-        return cursor.fetchall()
-
-    def load_data_semester():
-        cursor.execute("""
-            SELECT s.id, ta.th_ajar || ' - ' || sp.sm_pil AS nama_semester_lengkap
-            FROM semester s
-            JOIN tahun_ajaran ta ON s.th_ajar_id = ta.id
-            JOIN semester_pil sp ON s.sm_pil_id = sp.id
-            ORDER BY ta.th_ajar DESC, sp.sm_pil ASC
-        """)
-        return cursor.fetchall()
-
     def load_mapel_semester_config(mapel_id):
-        cursor.execute("""
-            SELECT semester_id, is_active 
-            FROM mapel_semester_config 
-            WHERE mapel_id = ?
-        """, (mapel_id,))
+        cursor.execute(queries.CONFIG_MAPEL, (mapel_id,))
         return {row['semester_id']: row['is_active'] for row in cursor.fetchall()}
 
     # --- Manajemen Mata Pelajaran (CRUD) ---
     st.subheader("Daftar Mata Pelajaran")
-    data_mapel = load_data_mapel()
+    data_mapel = katalog.ambil("mapel")
 
     if data_mapel:
-        df_mapel = pd.DataFrame(data_mapel, columns=["ID", "Nama Mata Pelajaran", "Kode"])
+        df_mapel = pd.DataFrame([(m['id'], m['nama_mapel'], m['kode_mapel']) for m in data_mapel], columns=["ID", "Nama Mata Pelajaran", "Kode"])
         st.dataframe(df_mapel, use_container_width=True, hide_index=True)
     else:
         st.info("Belum ada data mata pelajaran.")
@@ -52,7 +51,7 @@ def show_matapelajaran():
 
     st.subheader("Tambah/Edit Mata Pelajaran")
     edit_id_mapel = st.selectbox("Pilih Mata Pelajaran untuk Diedit (kosongkan untuk menambah baru)", 
-                                 options=[("", "Tambah Baru")] + [(m['id'], f"{m['nama_mapel']} ({m['kode_mapel']})") for m in data_mapel],
+                                 options=[("", "Tambah Baru")] + katalog.opsi("mapel"),
                                  format_func=lambda x: x[1], key="edit_mapel_id")
 
     current_nama_mapel = ""
@@ -83,14 +82,14 @@ def show_matapelajaran():
             else:
                 try:
                     if edit_id_mapel and edit_id_mapel[0]: # Mode Edit
-                        cursor.execute("UPDATE mata_pelajaran SET nama_mapel = ?, kode_mapel = ? WHERE id = ?", 
-                                       (nama_mapel_input, kode_mapel_input, edit_id_mapel[0]))
-                        conn.commit()
+                        writer.eksekusi("UPDATE mata_pelajaran SET nama_mapel = ?, kode_mapel = ? WHERE id = ?", 
+                                        (nama_mapel_input, kode_mapel_input, edit_id_mapel[0]))
+                        katalog.invalidate("mapel")
                         st.success(f"Mata pelajaran '{nama_mapel_input}' berhasil diperbarui.")
                     else: # Mode Tambah Baru
-                        cursor.execute("INSERT INTO mata_pelajaran (nama_mapel, kode_mapel) VALUES (?, ?)", 
-                                       (nama_mapel_input, kode_mapel_input))
-                        conn.commit()
+                        writer.eksekusi("INSERT INTO mata_pelajaran (nama_mapel, kode_mapel) VALUES (?, ?)", 
+                                        (nama_mapel_input, kode_mapel_input))
+                        katalog.invalidate("mapel")
                         st.success(f"Mata pelajaran '{nama_mapel_input}' berhasil ditambahkan.")
                     
                     # Reset form edit ke tambah baru setelah submit berhasil
@@ -108,19 +107,16 @@ def show_matapelajaran():
 
     # Logika konfirmasi penghapusan mata pelajaran
     if st.session_state.get('confirm_delete_mapel_id'):
-        st.warning(f"Apakah Anda yakin ingin menghapus mata pelajaran '{st.session_state.confirm_delete_mapel_nama}'? Tindakan ini akan menghapus semua konfigurasi semester dan data nilai terkait mata pelajaran ini.")
+        st.warning(f"Apakah Anda yakin ingin menghapus mata pelajaran '{st.session_state.confirm_delete_mapel_nama}'? Tindakan ini akan menghapus semua konfigurasi semester, penugasan mengajar, dan data nilai terkait mata pelajaran ini.")
         
         col_confirm_del_mapel, col_cancel_del_mapel = st.columns(2)
         with col_confirm_del_mapel:
             if st.button("Ya, Hapus Mata Pelajaran", type="primary"):
                 try:
                     mapel_id_to_delete = st.session_state.confirm_delete_mapel_id
-                    # Hapus dari tabel nilai, guru_mapel_kelas, mapel_semester_config, lalu mata_pelajaran
-                    cursor.execute("DELETE FROM nilai WHERE mapel_id = ?", (mapel_id_to_delete,))
-                    cursor.execute("DELETE FROM guru_mapel_kelas WHERE mapel_id = ?", (mapel_id_to_delete,))
-                    cursor.execute("DELETE FROM mapel_semester_config WHERE mapel_id = ?", (mapel_id_to_delete,))
-                    cursor.execute("DELETE FROM mata_pelajaran WHERE id = ?", (mapel_id_to_delete,))
-                    conn.commit()
+                    # Nilai, penugasan, dan konfigurasi semesternya ikut terhapus (ON DELETE CASCADE)
+                    writer.eksekusi("DELETE FROM mata_pelajaran WHERE id = ?", (mapel_id_to_delete,))
+                    katalog.invalidate("mapel", "penugasan", "mapel_semester_config")
                     st.success(f"Mata pelajaran '{st.session_state.confirm_delete_mapel_nama}' dan data terkait berhasil dihapus.")
                     
                     del st.session_state.confirm_delete_mapel_id
@@ -143,7 +139,7 @@ def show_matapelajaran():
     # --- Konfigurasi Mata Pelajaran per Semester ---
     st.subheader("Konfigurasi Status Aktif Mata Pelajaran per Semester")
     
-    data_semester = load_data_semester()
+    data_semester = katalog.ambil("semester")
 
     if not data_mapel:
         st.info("Silakan tambahkan data mata pelajaran terlebih dahulu untuk melakukan konfigurasi semester.")
@@ -152,7 +148,7 @@ def show_matapelajaran():
     else:
         selected_mapel_id_for_config = st.selectbox(
             "Pilih Mata Pelajaran untuk Dikonfigurasi",
-            options=[(m['id'], f"{m['nama_mapel']} ({m['kode_mapel']})") for m in data_mapel],
+            options=katalog.opsi("mapel"),
             format_func=lambda x: x[1],
             key="selected_mapel_config"
         )
@@ -171,7 +167,7 @@ def show_matapelajaran():
                 for i, semester in enumerate(data_semester):
                     with cols[i]:
                         semester_id = semester['id']
-                        semester_nama = semester['nama_semester_lengkap']
+                        semester_nama = semester['label']
                         is_active_db = current_config.get(semester_id, 0) # Default tidak aktif jika belum ada di DB
                         
                         # Gunakan nilai dari session state jika ada (untuk mempertahankan state setelah error/submit)
@@ -191,16 +187,8 @@ def show_matapelajaran():
 
                 if submit_config:
                     try:
-                        for semester_id, is_active in new_configs.items():
-                            # Cek apakah sudah ada entri
-                            cursor.execute("SELECT id FROM mapel_semester_config WHERE mapel_id = ? AND semester_id = ?", (mapel_id, semester_id))
-                            existing_entry = cursor.fetchone()
-                            if existing_entry:
-                                cursor.execute("UPDATE mapel_semester_config SET is_active = ? WHERE id = ?", (is_active, existing_entry['id']))
-                            else:
-                                cursor.execute("INSERT INTO mapel_semester_config (mapel_id, semester_id, is_active) VALUES (?, ?, ?)",
-                                               (mapel_id, semester_id, is_active))
-                        conn.commit()
+                        writer.tulis(simpan_config_mapel, mapel_id, new_configs)
+                        katalog.invalidate("mapel_semester_config")
                         st.success(f"Konfigurasi status aktif untuk '{mapel_nama}' berhasil disimpan.")
                         # Tidak perlu rerun agar user bisa lanjut konfigurasi mapel lain atau semester lain
                         # Namun, state checkbox perlu diupdate jika ada perubahan
@@ -209,6 +197,75 @@ def show_matapelajaran():
                         st.rerun() # Rerun untuk memuat ulang data dari DB dan memastikan UI konsisten
                     except Exception as e:
                         st.error(f"Gagal menyimpan konfigurasi: {e}")
+
+    st.divider()
+
+    # --- Bobot Tahap Penilaian untuk Rapor ---
+    st.subheader("Bobot Tahap Penilaian untuk Rapor")
+    st.caption("Nilai akhir rapor = rata-rata berbobot nilai per tahap (lihat menu Rapor & Statistik). "
+               "Bobot bersifat relatif dan tidak harus berjumlah 100; tahap berbobot 0 tidak dihitung.")
+
+    data_tahap = katalog.ambil("tahap")
+    if not data_mapel:
+        st.info("Silakan tambahkan data mata pelajaran terlebih dahulu untuk mengatur bobot.")
+    elif not data_tahap:
+        st.info("Belum ada tahap penilaian.")
+    else:
+        selected_mapel_bobot = st.selectbox(
+            "Pilih Mata Pelajaran",
+            options=katalog.opsi("mapel"),
+            format_func=lambda x: x[1],
+            key="selected_mapel_bobot"
+        )
+        mapel_id, mapel_nama = selected_mapel_bobot
+        cursor.execute(queries.BOBOT_MAPEL, (mapel_id,))
+        bobot_db = {row['tahap_id']: row['bobot'] for row in cursor.fetchall()}
+        if not bobot_db:
+            st.info(f"Bobot '{mapel_nama}' belum diatur: semua tahap berbobot sama.")
+
+        with st.form(f"form_bobot_mapel_{mapel_id}"):
+            cols = st.columns(len(data_tahap))
+            bobot_baru = {}
+            for i, tahap in enumerate(data_tahap):
+                with cols[i]:
+                    # Tanpa bobot tersimpan, tampilkan bobot sama (bagi rata 100)
+                    bawaan = bobot_db.get(tahap['id'], 0.0) if bobot_db else round(100 / len(data_tahap), 2)
+                    bobot_baru[tahap['id']] = st.number_input(
+                        tahap['nama_tahap'], min_value=0.0, max_value=100.0, value=float(bawaan), step=5.0,
+                        key=f"bobot_{mapel_id}_{tahap['id']}"
+                    )
+
+            col_simpan_bobot, col_reset_bobot = st.columns(2)
+            with col_simpan_bobot:
+                submit_bobot = st.form_submit_button("Simpan Bobot")
+            with col_reset_bobot:
+                reset_bobot = st.form_submit_button("Kembalikan ke Bobot Sama", type="secondary",
+                                                    disabled=not bobot_db)
+
+            if submit_bobot:
+                if sum(bobot_baru.values()) <= 0:
+                    st.warning("Minimal satu tahap harus berbobot lebih dari 0.")
+                else:
+                    try:
+                        writer.tulis(simpan_bobot_mapel, mapel_id, bobot_baru)
+                        st.success(f"Bobot tahap untuk '{mapel_nama}' berhasil disimpan.")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Gagal menyimpan bobot: {e}")
+            if reset_bobot:
+                try:
+                    writer.eksekusi("DELETE FROM bobot_tahap WHERE mapel_id = ?", (mapel_id,))
+                    for tahap in data_tahap:
+                        st.session_state.pop(f"bobot_{mapel_id}_{tahap['id']}", None)
+                    st.success(f"Bobot tahap untuk '{mapel_nama}' dikembalikan ke bobot sama.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Gagal mengembalikan bobot: {e}")
+
+        if bobot_db:
+            total_bobot = sum(bobot_db.values())
+            st.caption("Porsi tersimpan: " + ", ".join(
+                f"{tahap['nama_tahap']} {bobot_db.get(tahap['id'], 0) / total_bobot:.0%}" for tahap in data_tahap))
     conn.close()
 
 if __name__ == "__main__":
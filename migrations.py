@@ -0,0 +1,438 @@
+# Daftar migrasi skema berurutan. Versi skema yang sudah diterapkan disimpan di
+# PRAGMA user_version, sehingga setiap langkah hanya dijalankan satu kali per database.
+# Untuk perubahan skema baru: tambahkan fungsi _mXXX_... dan daftarkan di MIGRATIONS
+# dengan nomor berikutnya. Jangan mengubah langkah yang sudah pernah dirilis.
+#
+# Migrasi berjalan dengan foreign key dimatikan. Migrasi 8 menjalankan PRAGMA foreign_key_check
+# sekali terhadap skema hasil migrasi 1-7 dan membersihkan baris yatim mengikuti aksi ON DELETE
+# relasinya (lihat integritas.py); relasi tanpa aksi menggagalkan migrasi, karena tidak jelas
+# datanya harus diapakan, dan pesan galatnya menyebut perintah integritas.py untuk membereskannya.
+# Pemeriksaan tidak dilakukan sebelum itu: foreign key skema lama belum punya aksi ON DELETE,
+# sehingga yatim lama baru bisa diperbaiki setelah migrasi 5.
+import logging
+
+_log = logging.getLogger(__name__)
+
+
+def _m001_skema_awal(cursor):
+    # Skema awal (sebelumnya dijalankan oleh init_db() di setiap rerun halaman).
+    # Semua pernyataan memakai IF NOT EXISTS agar aman untuk database lama yang
+    # tabelnya sudah ada tetapi user_version-nya masih 0.
+
+    # Tabel Siswa: Ditambahkan kelas_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS siswa (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            nisn INTEGER NOT NULL UNIQUE,
+            nama TEXT NOT NULL,
+            kelas_id INTEGER,
+            FOREIGN KEY (kelas_id) REFERENCES kelas(id) ON DELETE SET NULL
+        );
+    ''')
+
+    # Tabel Tahun Ajaran: Tetap
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tahun_ajaran (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            th_ajar TEXT NOT NULL UNIQUE
+        );
+    ''')
+
+    # Tabel Semester Pilihan (Ganjil/Genap): Tetap
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS semester_pil (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            sm_pil TEXT NOT NULL UNIQUE
+        );
+    ''')
+    # Pastikan ada data awal untuk semester_pil jika belum ada
+    cursor.execute("SELECT COUNT(*) FROM semester_pil")
+    if cursor.fetchone()[0] == 0:
+        semester_pilihan_data = [('Ganjil',), ('Genap',)]
+        cursor.executemany("INSERT INTO semester_pil (sm_pil) VALUES (?)", semester_pilihan_data)
+
+
+    # Tabel Semester: Tetap, mungkin perlu penyesuaian data awal jika ada
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS semester (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            th_ajar_id INTEGER NOT NULL,
+            sm_pil_id INTEGER NOT NULL,
+            aktif BOOLEAN DEFAULT 0, -- Menandakan semester aktif secara global
+            nama_semester TEXT NOT NULL, -- Misal: "Ganjil 2023/2024"
+            FOREIGN KEY (th_ajar_id) REFERENCES tahun_ajaran(id),
+            FOREIGN KEY (sm_pil_id) REFERENCES semester_pil(id),
+            UNIQUE (th_ajar_id, sm_pil_id)
+        );
+    ''')
+
+    # Tabel User (Guru, Admin): Tetap
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE, 
+            password TEXT NOT NULL, 
+            role TEXT NOT NULL DEFAULT 'admin' CHECK(role IN ('admin', 'guru'))
+        );
+    ''')
+    cursor.execute("SELECT COUNT(*) FROM user")
+    if cursor.fetchone()[0] == 0:
+        users = [
+            ('admin', 'admin', 'admin'),
+            ('siti', 'siti123', 'guru')
+        ]
+        cursor.executemany("INSERT INTO user (username, password, role) VALUES (?, ?, ?)", users)
+    
+    # Tabel Kelas: Tetap
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kelas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_kelas TEXT NOT NULL,
+            tingkat TEXT NOT NULL, -- Misal: 10, 11, 12
+            UNIQUE (nama_kelas, tingkat)
+        );
+    ''')
+    cursor.execute("SELECT COUNT(*) FROM kelas")
+    if cursor.fetchone()[0] == 0:
+        kelas_awal = [
+            ('A', '10'),
+            ('B', '10'),
+            ('C', '10'),
+            ('A', '11'),
+            ('B', '11')
+        ]
+        cursor.executemany("INSERT INTO kelas (nama_kelas, tingkat) VALUES (?, ?)", kelas_awal)
+
+    # Tabel Mata Pelajaran: Tetap
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mata_pelajaran (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_mapel TEXT NOT NULL,
+            kode_mapel TEXT UNIQUE
+        );
+    ''')
+    cursor.execute("SELECT COUNT(*) FROM mata_pelajaran")
+    if cursor.fetchone()[0] == 0:
+        mapel_awal = [
+            ('Matematika Wajib', 'MTK-WAJIB-X'),
+            ('Bahasa Indonesia', 'BINDO-X'),
+            ('Fisika', 'FIS-X'),
+            ('Kimia', 'KIM-X')
+        ]
+        cursor.executemany("INSERT INTO mata_pelajaran (nama_mapel, kode_mapel) VALUES (?, ?)", mapel_awal)
+
+    # Tabel Relasi Guru - Mata Pelajaran - Kelas: Tetap
+    # Ini mendefinisikan guru siapa mengajar mapel apa di kelas mana
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS guru_mapel_kelas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL, -- id dari tabel user (guru)
+            mapel_id INTEGER NOT NULL,
+            kelas_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL, -- Ditambahkan untuk konteks semester pengajaran
+            FOREIGN KEY (user_id) REFERENCES user(id),
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id),
+            FOREIGN KEY (kelas_id) REFERENCES kelas(id),
+            FOREIGN KEY (semester_id) REFERENCES semester(id),
+            UNIQUE(user_id, mapel_id, kelas_id, semester_id)
+        );
+    ''')
+    # Contoh data awal, pastikan ID merujuk ke data yang valid setelah perubahan
+    # cursor.execute("SELECT COUNT(*) FROM guru_mapel_kelas")
+    # if cursor.fetchone()[0] == 0:
+    #     # Asumsi user_id 2 adalah guru, mapel_id 1, kelas_id 1, semester_id 1 ada
+    #     relasi_awal = [
+    #         (2, 1, 1, 1) 
+    #     ]
+    #     cursor.executemany("INSERT INTO guru_mapel_kelas (user_id, mapel_id, kelas_id, semester_id) VALUES (?, ?, ?, ?)", relasi_awal)
+
+    # Tabel Tahap (BARU)
+    # Misalnya: UTS, UAS, Tugas Harian, Praktikum Mingguan, dll.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tahap_penilaian (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama_tahap TEXT NOT NULL UNIQUE,
+            deskripsi TEXT
+        );
+    ''')
+    cursor.execute("SELECT COUNT(*) FROM tahap_penilaian")
+    if cursor.fetchone()[0] == 0:
+        tahap_awal = [
+            ('UTS', 'Ujian Tengah Semester'),
+            ('UAS', 'Ujian Akhir Semester'),
+            ('Tugas Harian', 'Kumpulan tugas harian'),
+            ('Praktikum', 'Kegiatan praktikum')
+        ]
+        cursor.executemany("INSERT INTO tahap_penilaian (nama_tahap, deskripsi) VALUES (?, ?)", tahap_awal)
+
+
+    # Tabel Konfigurasi Mata Pelajaran per Semester dan Tahap (BARU)
+    # Menentukan apakah suatu mapel aktif/tidak pada semester dan tahap tertentu
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mapel_semester_config (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mapel_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL,
+            -- tahap_id INTEGER, -- Bisa ditambahkan jika aktivasi mapel juga bergantung pada tahap tertentu
+            is_active BOOLEAN NOT NULL DEFAULT 0, -- 0 = tidak aktif, 1 = aktif
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id),
+            FOREIGN KEY (semester_id) REFERENCES semester(id),
+            -- FOREIGN KEY (tahap_id) REFERENCES tahap_penilaian(id), 
+            UNIQUE (mapel_id, semester_id) -- Jika tahap_id ditambahkan, sertakan di UNIQUE
+        );
+    ''')
+    
+    # Tabel Nilai: Dimodifikasi untuk menyertakan semester_id dan tahap_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS nilai (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            siswa_id INTEGER NOT NULL,
+            mapel_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL, 
+            tahap_id INTEGER NOT NULL, -- Merujuk ke tahap_penilaian (UTS, UAS, dll)
+            nilai REAL NOT NULL,
+            tanggal_input DATE NOT NULL,
+            guru_id INTEGER NOT NULL, -- id dari tabel user (guru yang menginput)
+            catatan TEXT, -- Opsional, catatan dari guru
+            FOREIGN KEY (siswa_id) REFERENCES siswa(id) ON DELETE CASCADE,
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id),
+            FOREIGN KEY (semester_id) REFERENCES semester(id),
+            FOREIGN KEY (tahap_id) REFERENCES tahap_penilaian(id),
+            FOREIGN KEY (guru_id) REFERENCES user(id),
+            CHECK (nilai >= 0 AND nilai <= 100),
+            UNIQUE(siswa_id, mapel_id, semester_id, tahap_id) -- Mencegah duplikasi nilai untuk kombinasi yang sama
+        );
+    ''')
+
+
+def _m002_index_query_panas(cursor):
+    # Index sekunder untuk query yang dijalankan di hampir setiap rerun
+    # (lihat queries.HOT_QUERIES; `python queries.py` memeriksa rencana query-nya).
+    # Riwayat nilai per guru, diurutkan dari input terbaru
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nilai_guru_tanggal ON nilai (guru_id, tanggal_input)")
+    # Nilai satu kelas untuk mapel/semester/tahap tertentu; menyertakan kolom nilai
+    # agar lookup tidak perlu membaca baris tabel (covering index)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nilai_semester_mapel_tahap ON nilai (semester_id, mapel_id, tahap_id, siswa_id, nilai)")
+    # Daftar siswa per kelas, sudah terurut nama
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_siswa_kelas_nama ON siswa (kelas_id, nama)")
+    # Konteks mengajar guru: kelas/mapel per guru per semester
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gmk_user_semester ON guru_mapel_kelas (user_id, semester_id, kelas_id, mapel_id)")
+    # Pencarian semester aktif
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_semester_aktif ON semester (aktif)")
+
+
+def _m003_index_nama_siswa(cursor):
+    # Daftar siswa dipaginasi dengan keyset pada (nama, id); index ini membuat setiap
+    # halaman cukup membaca range index tanpa mengurutkan seluruh tabel
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_siswa_nama ON siswa (nama)")
+
+
+def _m004_pencarian_siswa(cursor):
+    # NISN sebagai teks (kolom generated, tidak disimpan) beserta index-nya, agar
+    # pencarian NISN persis maupun awalan bisa memakai range index
+    cursor.execute("ALTER TABLE siswa ADD COLUMN nisn_teks TEXT GENERATED ALWAYS AS (CAST(nisn AS TEXT)) VIRTUAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_siswa_nisn_teks ON siswa (nisn_teks)")
+
+    # Index full-text untuk nama siswa. Tabel FTS5 ini "external content": teksnya
+    # tetap di tabel siswa, FTS hanya menyimpan index. prefix='2 3' mempercepat
+    # pencarian awalan 2-3 huruf seperti "bu*" atau "sit*".
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS siswa_fts USING fts5(
+            nama,
+            content='siswa',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    # Trigger menjaga index tetap sinkron dengan tabel siswa
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS siswa_fts_ai AFTER INSERT ON siswa BEGIN
+            INSERT INTO siswa_fts (rowid, nama) VALUES (new.id, new.nama);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS siswa_fts_ad AFTER DELETE ON siswa BEGIN
+            INSERT INTO siswa_fts (siswa_fts, rowid, nama) VALUES ('delete', old.id, old.nama);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS siswa_fts_au AFTER UPDATE OF nama ON siswa BEGIN
+            INSERT INTO siswa_fts (siswa_fts, rowid, nama) VALUES ('delete', old.id, old.nama);
+            INSERT INTO siswa_fts (rowid, nama) VALUES (new.id, new.nama);
+        END
+    """)
+    # Isi index dari data siswa yang sudah ada
+    cursor.execute("INSERT INTO siswa_fts (siswa_fts) VALUES ('rebuild')")
+
+
+def _bangun_ulang_tabel(cursor, tabel, create_sql):
+    # SQLite tidak bisa mengubah FOREIGN KEY lewat ALTER TABLE, jadi tabel dibuat ulang:
+    # buat tabel baru, salin isinya, hapus yang lama, ganti nama, lalu pasang kembali
+    # index dan trigger-nya. Harus berjalan dengan PRAGMA foreign_keys=OFF (lihat migrate()).
+    objek = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (tabel,)
+    ).fetchall()
+    kolom = ", ".join(row[1] for row in cursor.execute(f"PRAGMA table_info({tabel})"))
+    cursor.execute(create_sql.format(tabel=f"{tabel}_baru"))
+    cursor.execute(f"INSERT INTO {tabel}_baru ({kolom}) SELECT {kolom} FROM {tabel}")
+    cursor.execute(f"DROP TABLE {tabel}")
+    cursor.execute(f"ALTER TABLE {tabel}_baru RENAME TO {tabel}")
+    for (sql,) in objek:
+        cursor.execute(sql)
+
+
+def _m005_foreign_key_cascade(cursor):
+    # Hapus semester/mapel/siswa/guru cukup satu DELETE: baris anak ikut terhapus oleh
+    # engine lewat ON DELETE CASCADE (foreign_keys=ON di setiap koneksi, lihat db.py).
+    # nilai.guru_id kini boleh NULL: menghapus akun guru tidak menghapus nilai siswa,
+    # hanya mengosongkan penginputnya. Baris yatim dari masa sebelum foreign key aktif
+    # tidak disentuh di sini; bersihkan dengan `python integritas.py --bersihkan`.
+    _bangun_ulang_tabel(cursor, "guru_mapel_kelas", '''
+        CREATE TABLE {tabel} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL, -- id dari tabel user (guru)
+            mapel_id INTEGER NOT NULL,
+            kelas_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES user(id) ON DELETE CASCADE,
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id) ON DELETE CASCADE,
+            FOREIGN KEY (kelas_id) REFERENCES kelas(id) ON DELETE CASCADE,
+            FOREIGN KEY (semester_id) REFERENCES semester(id) ON DELETE CASCADE,
+            UNIQUE(user_id, mapel_id, kelas_id, semester_id)
+        )
+    ''')
+    _bangun_ulang_tabel(cursor, "mapel_semester_config", '''
+        CREATE TABLE {tabel} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mapel_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL,
+            is_active BOOLEAN NOT NULL DEFAULT 0, -- 0 = tidak aktif, 1 = aktif
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id) ON DELETE CASCADE,
+            FOREIGN KEY (semester_id) REFERENCES semester(id) ON DELETE CASCADE,
+            UNIQUE (mapel_id, semester_id)
+        )
+    ''')
+    _bangun_ulang_tabel(cursor, "nilai", '''
+        CREATE TABLE {tabel} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            siswa_id INTEGER NOT NULL,
+            mapel_id INTEGER NOT NULL,
+            semester_id INTEGER NOT NULL,
+            tahap_id INTEGER NOT NULL, -- Merujuk ke tahap_penilaian (UTS, UAS, dll)
+            nilai REAL NOT NULL,
+            tanggal_input DATE NOT NULL,
+            guru_id INTEGER, -- id dari tabel user (guru yang menginput); NULL jika akunnya dihapus
+            catatan TEXT, -- Opsional, catatan dari guru
+            FOREIGN KEY (siswa_id) REFERENCES siswa(id) ON DELETE CASCADE,
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id) ON DELETE CASCADE,
+            FOREIGN KEY (semester_id) REFERENCES semester(id) ON DELETE CASCADE,
+            FOREIGN KEY (tahap_id) REFERENCES tahap_penilaian(id),
+            FOREIGN KEY (guru_id) REFERENCES user(id) ON DELETE SET NULL,
+            CHECK (nilai >= 0 AND nilai <= 100),
+            UNIQUE(siswa_id, mapel_id, semester_id, tahap_id)
+        )
+    ''')
+
+
+def _m006_arsip_semester(cursor):
+    # Nama berkas arsip (relatif terhadap folder arsip, lihat arsip.py) tempat nilai dan
+    # penugasan semester ini dipindahkan; NULL berarti datanya masih di database utama
+    cursor.execute("ALTER TABLE semester ADD COLUMN berkas_arsip TEXT")
+
+
+def _m007_bobot_tahap(cursor):
+    # Bobot tahap penilaian per mapel untuk nilai akhir rapor (lihat rapor.py). Bobot relatif,
+    # tidak harus berjumlah 100. Mapel tanpa baris di sini memakai bobot sama untuk semua tahap;
+    # mapel yang punya baris hanya menghitung tahap yang tercantum dengan bobot > 0.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bobot_tahap (
+            mapel_id INTEGER NOT NULL,
+            tahap_id INTEGER NOT NULL,
+            bobot REAL NOT NULL CHECK (bobot >= 0),
+            PRIMARY KEY (mapel_id, tahap_id),
+            FOREIGN KEY (mapel_id) REFERENCES mata_pelajaran(id) ON DELETE CASCADE,
+            FOREIGN KEY (tahap_id) REFERENCES tahap_penilaian(id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def _m008_bersihkan_yatim(cursor):
+    # Tidak mengubah skema. Baris yang gagal PRAGMA foreign_key_check (yatim dari masa foreign
+    # key belum aktif, terbawa ke tabel CASCADE migrasi 5) diperbaiki sesuai aksi ON DELETE
+    # relasinya. RuntimeError jika ada baris yatim pada relasi tanpa aksi.
+    import integritas
+
+    yatim = {}
+    for tabel, rowid, _, fkid in cursor.execute("PRAGMA foreign_key_check").fetchall():
+        yatim.setdefault((tabel, fkid), []).append(rowid)
+    if not yatim:
+        return
+    relasi = {(r["tabel"], r["id"]): r for r in integritas.relasi(cursor)}
+    tanpa_aksi = [f"{len(rowids)} baris {relasi[k]['tabel']}.{relasi[k]['kolom']} -> {relasi[k]['induk']}"
+                  for k, rowids in yatim.items() if relasi[k]["aksi"] is None]
+    if tanpa_aksi:
+        path = cursor.execute("PRAGMA database_list").fetchone()[2] or "sinfomik.db"
+        raise RuntimeError("Migrasi dibatalkan: ada baris yatim yang tidak bisa diperbaiki otomatis ("
+                           + "; ".join(tanpa_aksi) + "). Periksa dengan `python integritas.py --db " + path
+                           + "`, hapus dengan `python integritas.py --db " + path
+                           + " --bersihkan --hapus-tanpa-aksi`, lalu jalankan aplikasi lagi.")
+    for k, rowids in yatim.items():
+        r = relasi[k]
+        jumlah = integritas.perbaiki(cursor, r, rowids)
+        _log.warning("Migrasi: %d baris yatim %s.%s -> %s di%s.", jumlah, r["tabel"], r["kolom"], r["induk"], r["aksi"])
+    if cursor.execute("PRAGMA foreign_key_check").fetchone() is not None:
+        raise RuntimeError("Migrasi dibatalkan: PRAGMA foreign_key_check masih menemukan baris yatim.")
+
+
+MIGRATIONS = [
+    (1, "Skema awal dan data awal", _m001_skema_awal),
+    (2, "Index untuk query panas", _m002_index_query_panas),
+    (3, "Index nama siswa untuk daftar siswa berhalaman", _m003_index_nama_siswa),
+    (4, "Pencarian siswa: FTS5 nama dan index NISN teks", _m004_pencarian_siswa),
+    (5, "Foreign key ON DELETE CASCADE untuk nilai, penugasan, dan konfigurasi mapel", _m005_foreign_key_cascade),
+    (6, "Kolom berkas arsip pada semester", _m006_arsip_semester),
+    (7, "Bobot tahap penilaian per mata pelajaran untuk rapor", _m007_bobot_tahap),
+    (8, "Pembersihan baris yatim (PRAGMA foreign_key_check)", _m008_bersihkan_yatim),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Menerapkan semua migrasi yang belum dijalankan, masing-masing dalam satu transaksi.
+
+    Mengembalikan daftar nomor migrasi yang baru saja diterapkan.
+    """
+    # Foreign key dimatikan selama migrasi agar tabel bisa dibuat ulang (DROP TABLE pada
+    # tabel induk tidak memicu cascade). PRAGMA ini tidak berlaku di dalam transaksi, jadi
+    # diatur sebelum BEGIN dan dikembalikan setelah semua langkah selesai.
+    fk_semula = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys=OFF")
+    diterapkan = []
+    try:
+        for nomor, keterangan, langkah in MIGRATIONS:
+            if nomor <= current_version(conn):
+                continue
+            # BEGIN IMMEDIATE mengambil write lock lebih dulu, lalu versi dicek ulang:
+            # jika proses lain sudah menerapkan langkah ini sambil kita menunggu, lewati.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if nomor <= current_version(conn):
+                    conn.rollback()
+                    continue
+                langkah(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {nomor}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            diterapkan.append(nomor)
+    finally:
+        conn.execute(f"PRAGMA foreign_keys={fk_semula}")
+    return diterapkan
@@ -1,12 +1,145 @@
 import streamlit as st
 import sqlite3
+import contextlib
+import math
+import time
 from datetime import datetime
 import pandas as pd
-from db import get_connection, init_db
+from db import get_read_connection
+import queries
+import arsip
+import cache_query
+import katalog
+import konteks_guru
+import profiler
+import writer
+
+def _tulis_nilai_baru(conn, baris_nilai):
+    perubahan_awal = conn.total_changes
+    conn.executemany(queries.INSERT_NILAI_BARU, baris_nilai)
+    return conn.total_changes - perubahan_awal
+
+def simpan_nilai_baru(baris_nilai):
+    """Menyimpan banyak nilai baru dengan satu executemany lewat antrean tulis (writer.py).
+
+    Baris yang sudah punya nilai (siswa, mapel, semester, tahap sama) dilewati oleh
+    ON CONFLICT DO NOTHING. Mengembalikan dict berisi jumlah baris disimpan, dilewati,
+    dan durasi simpan (termasuk antre) dalam milidetik.
+    """
+    mulai = time.perf_counter()
+    disimpan = writer.tulis(_tulis_nilai_baru, baris_nilai)
+    return {
+        "disimpan": disimpan,
+        "dilewati": len(baris_nilai) - disimpan,
+        "durasi_ms": (time.perf_counter() - mulai) * 1000,
+    }
+
+MODE_FORMULIR = "Formulir per Tahap"
+MODE_GRADEBOOK = "Gradebook (Semua Tahap)"
+
+def hitung_perubahan_gradebook(df_awal, df_edit, kolom_tahap):
+    """Membandingkan grid gradebook sebelum dan sesudah diedit.
+
+    `kolom_tahap` memetakan nama kolom ke tahap_id. Mengembalikan tuple
+    (perubahan, dikosongkan, tidak_valid): perubahan berisi (siswa_id, tahap_id, nilai)
+    untuk sel yang nilainya berubah, dikosongkan berisi sel yang dihapus isinya,
+    dan tidak_valid berisi sel dengan nilai di luar 0-100.
+    """
+    kolom = list(kolom_tahap)
+    awal = df_awal[kolom].apply(pd.to_numeric, errors="coerce")
+    edit = df_edit[kolom].apply(pd.to_numeric, errors="coerce")
+    sama = (awal == edit) | (awal.isna() & edit.isna())
+    berubah = (~sama).stack()
+    berubah = berubah[berubah].index  # pasangan (siswa_id, nama_kolom) yang berubah
+
+    perubahan, dikosongkan, tidak_valid = [], [], []
+    for siswa_id, nama_kolom in berubah:
+        nilai_baru = edit.at[siswa_id, nama_kolom]
+        if pd.isna(nilai_baru):
+            dikosongkan.append((siswa_id, kolom_tahap[nama_kolom]))
+        elif not 0 <= nilai_baru <= 100:
+            tidak_valid.append((siswa_id, kolom_tahap[nama_kolom], nilai_baru))
+        else:
+            perubahan.append((siswa_id, kolom_tahap[nama_kolom], float(nilai_baru)))
+    return perubahan, dikosongkan, tidak_valid
+
+def _tulis_perubahan_gradebook(conn, baris_nilai):
+    conn.executemany(queries.UPSERT_NILAI, baris_nilai)
+
+def simpan_perubahan_gradebook(baris_nilai):
+    """Menulis sel gradebook yang berubah (insert atau update) lewat antrean tulis."""
+    mulai = time.perf_counter()
+    writer.tulis(_tulis_perubahan_gradebook, baris_nilai)
+    return {"disimpan": len(baris_nilai), "durasi_ms": (time.perf_counter() - mulai) * 1000}
+
+def tampilkan_gradebook(conn, guru_id, semester_id, kelas_id, mapel_id, siswa_kelas, tahap_list):
+    profiler.fase("gradebook: nilai kelas", "db")
+    cursor = conn.cursor()
+    cursor.execute(queries.NILAI_KELAS_MAPEL, (semester_id, mapel_id, kelas_id))
+    nilai_rows = cursor.fetchall()
+
+    profiler.fase("gradebook: susun tabel", "data")
+
+    kolom_tahap = {t['nama_tahap']: t['id'] for t in tahap_list}
+    nama_tahap_by_id = {t['id']: t['nama_tahap'] for t in tahap_list}
+
+    # Baris = siswa, kolom = tahap penilaian, sel = nilai (kosong jika belum dinilai)
+    df_awal = pd.DataFrame(
+        [(s['id'], f"{s['nisn']:010d}" if s['nisn'] else "-", s['nama']) for s in siswa_kelas],
+        columns=["siswa_id", "NISN", "Nama Siswa"],
+    ).set_index("siswa_id")
+    for nama_tahap in kolom_tahap:
+        df_awal[nama_tahap] = float("nan")
+    for row in nilai_rows:
+        if row['tahap_id'] in nama_tahap_by_id and row['siswa_id'] in df_awal.index:
+            df_awal.at[row['siswa_id'], nama_tahap_by_id[row['tahap_id']]] = float(row['nilai'])
+
+    profiler.fase("gradebook: editor", "render")
+    hasil_gradebook = st.session_state.pop("hasil_simpan_gradebook", None)
+    if hasil_gradebook:
+        st.success(f"✅ {hasil_gradebook['disimpan']} sel nilai berhasil disimpan ({hasil_gradebook['durasi_ms']:.1f} ms).")
+
+    st.caption("Ubah nilai langsung di tabel. Satu kolom dapat ditempel (paste) sekaligus dari spreadsheet. "
+               "Hanya sel yang berubah yang disimpan saat menekan tombol simpan.")
+    # Editor di dalam form: mengedit sel tidak memicu rerun sampai tombol simpan ditekan
+    with st.form(f"gradebook_form_{kelas_id}_{mapel_id}_{semester_id}"):
+        df_edit = st.data_editor(
+            df_awal,
+            hide_index=True,
+            use_container_width=True,
+            num_rows="fixed",
+            disabled=["NISN", "Nama Siswa"],
+            column_config={
+                nama_tahap: st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.5, format="%.1f")
+                for nama_tahap in kolom_tahap
+            },
+            key=f"gradebook_{kelas_id}_{mapel_id}_{semester_id}",
+        )
+        submitted = st.form_submit_button("Simpan Gradebook")
+
+    if submitted:
+        perubahan, dikosongkan, tidak_valid = hitung_perubahan_gradebook(df_awal, df_edit, kolom_tahap)
+        if tidak_valid:
+            st.error(f"{len(tidak_valid)} sel berisi nilai di luar rentang 0-100. Perbaiki terlebih dahulu, tidak ada yang disimpan.")
+            return
+        if dikosongkan:
+            st.warning(f"{len(dikosongkan)} sel dikosongkan dan diabaikan. Gunakan Edit / Hapus Nilai di riwayat untuk menghapus nilai.")
+        if not perubahan:
+            st.info("Tidak ada perubahan nilai untuk disimpan.")
+            return
+        tanggal_hari_ini = datetime.now().strftime("%Y-%m-%d")
+        baris_nilai = [
+            (siswa_id, mapel_id, semester_id, tahap_id, nilai_value, tanggal_hari_ini, guru_id, None)
+            for siswa_id, tahap_id, nilai_value in perubahan
+        ]
+        try:
+            st.session_state.hasil_simpan_gradebook = simpan_perubahan_gradebook(baris_nilai)
+            st.rerun()
+        except sqlite3.Error as e:
+            st.error(f"❌ Gagal menyimpan gradebook: {str(e)}")
 
 def show_nilai():
     st.title("📝 Input dan Rekap Nilai Siswa")
-    init_db()
 
     # Cek login dan role
     if not st.session_state.get("logged_in", False) or st.session_state.get("role") != "guru":
@@ -16,13 +149,17 @@ def show_nilai():
             st.rerun()
         return
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     guru_id = st.session_state.user_id
 
+    # Semester aktif, kelas, dan mapel guru diambil dari konteks mengajar di session
+    # (satu query saat dibangun, tanpa query saat memilih kelas/mapel)
+    profiler.fase("konteks guru", "db")
+    konteks = konteks_guru.ambil_konteks(guru_id, conn)
+
     # 1. Dapatkan Semester Aktif
-    cursor.execute("SELECT id, nama_semester FROM semester WHERE aktif = 1 LIMIT 1")
-    semester_aktif = cursor.fetchone()
+    semester_aktif = konteks["semester_aktif"]
 
     if not semester_aktif:
         st.warning("Saat ini tidak ada semester yang aktif. Admin perlu mengaktifkan satu semester terlebih dahulu.")
@@ -32,22 +169,16 @@ def show_nilai():
     semester_aktif_id = semester_aktif['id']
     st.info(f"Anda sedang menginput nilai untuk Semester: **{semester_aktif['nama_semester']}**")
 
-    # 2. Ambil daftar kelas yang diajar guru ini di semester aktif
-    cursor.execute("""
-        SELECT DISTINCT k.id, k.tingkat || ' - ' || k.nama_kelas AS nama_lengkap_kelas
-        FROM guru_mapel_kelas gmk
-        JOIN kelas k ON gmk.kelas_id = k.id
-        WHERE gmk.user_id = ? AND gmk.semester_id = ?
-        ORDER BY nama_lengkap_kelas ASC
-    """, (guru_id, semester_aktif_id))
-    kelas_options_raw = cursor.fetchall()
+    # 2. Daftar kelas yang diajar guru ini di semester aktif
+    kelas_options_raw = konteks_guru.kelas_semester(konteks, semester_aktif_id)
 
     if not kelas_options_raw:
         st.error("Anda belum ditugaskan mengajar kelas apapun di semester aktif ini.")
         conn.close()
         return
     
-    kelas_options = [("", "Pilih Kelas...")] + [(k['id'], k['nama_lengkap_kelas']) for k in kelas_options_raw]
+    profiler.fase("pilihan kelas/mapel/tahap", "render")
+    kelas_options = [("", "Pilih Kelas...")] + kelas_options_raw
     selected_kelas_tuple = st.selectbox(
         "Pilih Kelas yang Diajar",
         options=kelas_options,
@@ -61,23 +192,15 @@ def show_nilai():
     kelas_id = selected_kelas_tuple[0]
     nama_kelas_terpilih = selected_kelas_tuple[1]
 
-    # 3. Ambil mata pelajaran yang diajar guru di kelas & semester aktif, dan mapel tersebut aktif
-    cursor.execute("""
-        SELECT DISTINCT mp.id, mp.nama_mapel || ' (' || mp.kode_mapel || ')' AS nama_lengkap_mapel
-        FROM guru_mapel_kelas gmk
-        JOIN mata_pelajaran mp ON gmk.mapel_id = mp.id
-        JOIN mapel_semester_config msc ON mp.id = msc.mapel_id AND msc.semester_id = gmk.semester_id
-        WHERE gmk.user_id = ? AND gmk.kelas_id = ? AND gmk.semester_id = ? AND msc.is_active = 1
-        ORDER BY nama_lengkap_mapel ASC
-    """, (guru_id, kelas_id, semester_aktif_id))
-    mapel_options_raw = cursor.fetchall()
+    # 3. Mata pelajaran yang diajar guru di kelas & semester aktif, dan mapel tersebut aktif
+    mapel_options_raw = konteks_guru.mapel_kelas(konteks, semester_aktif_id, kelas_id)
 
     if not mapel_options_raw:
         st.error(f"Tidak ada mata pelajaran aktif yang Anda ajar di kelas {nama_kelas_terpilih} untuk semester ini, atau mata pelajaran belum dikonfigurasi aktif oleh admin.")
         conn.close()
         return
 
-    mapel_options = [("", "Pilih Mata Pelajaran...")] + [(m['id'], m['nama_lengkap_mapel']) for m in mapel_options_raw]
+    mapel_options = [("", "Pilih Mata Pelajaran...")] + mapel_options_raw
     selected_mapel_tuple = st.selectbox(
         "Pilih Mata Pelajaran yang Diajar",
         options=mapel_options,
@@ -92,14 +215,28 @@ def show_nilai():
     nama_mapel_terpilih = selected_mapel_tuple[1]
 
     # 4. Ambil daftar Tahap Penilaian
-    cursor.execute("SELECT id, nama_tahap FROM tahap_penilaian ORDER BY nama_tahap ASC")
-    tahap_options_raw = cursor.fetchall()
+    tahap_options_raw = katalog.ambil("tahap")
 
     if not tahap_options_raw:
         st.error("Data Tahap Penilaian (UTS, UAS, dll.) belum ada. Admin perlu menambahkannya terlebih dahulu.")
         conn.close()
         return
 
+    # Mode input: formulir per tahap, atau gradebook (semua tahap sekaligus dalam satu tabel)
+    mode_input = st.radio("Mode Input", options=[MODE_FORMULIR, MODE_GRADEBOOK], horizontal=True, key="nilai_mode_input")
+    if mode_input == MODE_GRADEBOOK:
+        cursor.execute(queries.SISWA_KELAS, (kelas_id,))
+        siswa_kelas = cursor.fetchall()
+        if not siswa_kelas:
+            st.info(f"Tidak ada siswa terdaftar di kelas {nama_kelas_terpilih}.")
+            conn.close()
+            return
+        st.subheader(f"Gradebook: {nama_mapel_terpilih} - Kelas {nama_kelas_terpilih}")
+        tampilkan_gradebook(conn, guru_id, semester_aktif_id, kelas_id, mapel_id, siswa_kelas, tahap_options_raw)
+        tampilkan_riwayat_nilai(conn, guru_id)
+        conn.close()
+        return
+
     tahap_options = [("", "Pilih Tahap Penilaian...")] + [(t['id'], t['nama_tahap']) for t in tahap_options_raw]
     selected_tahap_tuple = st.selectbox(
         "Pilih Tahap Penilaian",
@@ -115,12 +252,8 @@ def show_nilai():
     nama_tahap_terpilih = selected_tahap_tuple[1]
     
     # 5. Ambil daftar siswa di kelas tersebut
-    cursor.execute("""
-        SELECT id, nisn, nama 
-        FROM siswa 
-        WHERE kelas_id = ?
-        ORDER BY nama ASC
-    """, (kelas_id,))
+    profiler.fase("siswa & nilai kelas", "db")
+    cursor.execute(queries.SISWA_KELAS, (kelas_id,))
     siswa_kelas = cursor.fetchall()
 
     if not siswa_kelas:
@@ -129,24 +262,30 @@ def show_nilai():
         return
 
     # 6. Form input nilai
+    # Semua nilai yang sudah ada untuk kelas ini diambil sekaligus, bukan satu query per siswa
+    cursor.execute(queries.NILAI_KELAS_TAHAP, (semester_aktif_id, mapel_id, tahap_id, kelas_id))
+    nilai_tersimpan = {row['siswa_id']: float(row['nilai']) for row in cursor.fetchall()}
+
+    # Hasil simpan terakhir ditampilkan setelah rerun (pesan st.success sebelum st.rerun() tidak sempat terlihat)
+    hasil_simpan = st.session_state.pop("hasil_simpan_nilai", None)
+    if hasil_simpan:
+        if hasil_simpan["disimpan"] > 0:
+            st.success(f"✅ {hasil_simpan['disimpan']} data nilai berhasil disimpan!")
+        if hasil_simpan["dilewati"] > 0:
+            st.warning(f"{hasil_simpan['dilewati']} nilai dilewati karena sudah ada sebelumnya.")
+        st.caption(f"Waktu simpan: {hasil_simpan['durasi_ms']:.1f} ms")
+
+    profiler.fase("form input nilai", "render")
     st.subheader(f"Input Nilai: {nama_mapel_terpilih} - Kelas {nama_kelas_terpilih} - Tahap {nama_tahap_terpilih}")
     with st.form("input_nilai_form"):
         nilai_siswa_input = {}
         st.markdown("Masukkan nilai antara 0 sampai 100.")
         for siswa in siswa_kelas:
-            # Cek apakah nilai sudah ada untuk siswa, mapel, semester, tahap ini
-            cursor.execute("""
-                SELECT nilai FROM nilai 
-                WHERE siswa_id = ? AND mapel_id = ? AND semester_id = ? AND tahap_id = ?
-            """, (siswa['id'], mapel_id, semester_aktif_id, tahap_id))
-            existing_nilai_row = cursor.fetchone()
-            
-            default_nilai = None
+            default_nilai = nilai_tersimpan.get(siswa['id'])
             input_disabled = False
             keterangan_nilai = ""
 
-            if existing_nilai_row:
-                default_nilai = float(existing_nilai_row['nilai'])
+            if default_nilai is not None:
                 input_disabled = True # Jika sudah ada, disable input baru, sarankan edit di riwayat
                 keterangan_nilai = f"(Nilai sudah ada: {default_nilai})"
             
@@ -180,101 +319,84 @@ def show_nilai():
             else:
                 try:
                     tanggal_hari_ini = datetime.now().strftime("%Y-%m-%d")
-                    berhasil_disimpan = 0
-                    gagal_karena_duplikat = 0
-
-                    for siswa_id, nilai_value in nilai_siswa_input.items():
-                        # Double check duplikasi sebelum insert (meskipun sudah ada disable di UI)
-                        cursor.execute("""
-                            SELECT 1 FROM nilai 
-                            WHERE siswa_id = ? AND mapel_id = ? AND semester_id = ? AND tahap_id = ?
-                        """, (siswa_id, mapel_id, semester_aktif_id, tahap_id))
-                        
-                        if cursor.fetchone():
-                            gagal_karena_duplikat += 1
-                            # Seharusnya tidak terjadi jika UI disable bekerja, tapi sebagai fallback
-                            st.warning(f"Nilai untuk siswa ID {siswa_id} sudah ada dan tidak akan disimpan ulang.")
-                            continue
-                            
-                        cursor.execute("""
-                            INSERT INTO nilai (siswa_id, mapel_id, semester_id, tahap_id, nilai, tanggal_input, guru_id, catatan) 
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (siswa_id, mapel_id, semester_aktif_id, tahap_id, nilai_value, tanggal_hari_ini, guru_id, catatan_umum))
-                        berhasil_disimpan +=1
-                    
-                    conn.commit()
-                    if berhasil_disimpan > 0:
-                        st.success(f"✅ {berhasil_disimpan} data nilai berhasil disimpan!")
-                    if gagal_karena_duplikat > 0 and berhasil_disimpan == 0:
-                         st.warning("Tidak ada nilai baru yang disimpan karena semua data sudah ada.")
+                    baris_nilai = [
+                        (siswa_id, mapel_id, semester_aktif_id, tahap_id, nilai_value, tanggal_hari_ini, guru_id, catatan_umum)
+                        for siswa_id, nilai_value in nilai_siswa_input.items()
+                    ]
+                    st.session_state.hasil_simpan_nilai = simpan_nilai_baru(baris_nilai)
                     st.rerun() # Refresh halaman untuk update tampilan
                     
                 except sqlite3.Error as e:
-                    conn.rollback()
                     st.error(f"❌ Gagal menyimpan nilai: {str(e)}")
 
     # 7. Tampilkan riwayat nilai (lebih komprehensif)
+    tampilkan_riwayat_nilai(conn, guru_id)
+    conn.close()
+
+def ambil_halaman_riwayat(cursor, guru_id, filter_riwayat, setelah=None, batas=queries.RIWAYAT_PER_HALAMAN, sumber="nilai"):
+    """Mengambil satu halaman riwayat nilai.
+
+    Mengembalikan (baris, kursor_berikutnya); kursor_berikutnya bernilai None
+    jika ini halaman terakhir. Diambil satu baris lebih untuk mengetahuinya.
+    """
+    sql, params = queries.riwayat_halaman(guru_id, filter_riwayat, setelah, batas + 1, sumber)
+    baris = cache_query.ambil(cursor, sql, params)
+    if len(baris) <= batas:
+        return baris, None
+    baris = baris[:batas]
+    return baris, (baris[-1]['tanggal_input'], baris[-1]['nilai_id'])
+
+def tampilkan_riwayat_nilai(conn, guru_id):
+    cursor = conn.cursor()
     st.divider()
     st.subheader("📋 Riwayat Nilai yang Pernah Diinput")
     
     try:
-        query_riwayat = """
-            SELECT 
-                n.id as nilai_id,
-                s.nisn, 
-                s.nama as nama_siswa,
-                k.tingkat || ' - ' || k.nama_kelas as nama_kelas,
-                mp.nama_mapel,
-                sem.nama_semester,
-                tp.nama_tahap,
-                n.nilai, 
-                n.tanggal_input,
-                n.catatan
-            FROM nilai n
-            JOIN siswa s ON n.siswa_id = s.id
-            JOIN kelas k ON s.kelas_id = k.id
-            JOIN mata_pelajaran mp ON n.mapel_id = mp.id
-            JOIN semester sem ON n.semester_id = sem.id
-            JOIN tahap_penilaian tp ON n.tahap_id = tp.id
-            WHERE n.guru_id = ?
-        """
-        params_riwayat = [guru_id]
-
         # Filter Riwayat
         st.write("**Filter Riwayat:**")
         col_f1, col_f2, col_f3, col_f4 = st.columns(4)
         
         # Ambil semua kelas, mapel, semester, tahap untuk filter
-        all_kelas_guru = cursor.execute("SELECT DISTINCT k.id, k.tingkat || ' - ' || k.nama_kelas as nama_lk FROM guru_mapel_kelas gmk JOIN kelas k ON gmk.kelas_id = k.id WHERE gmk.user_id = ? ORDER BY nama_lk", (guru_id,)).fetchall()
-        all_mapel_guru = cursor.execute("SELECT DISTINCT mp.id, mp.nama_mapel FROM guru_mapel_kelas gmk JOIN mata_pelajaran mp ON gmk.mapel_id = mp.id WHERE gmk.user_id = ? ORDER BY mp.nama_mapel", (guru_id,)).fetchall()
-        all_semester = cursor.execute("SELECT id, nama_semester FROM semester ORDER BY nama_semester DESC").fetchall()
-        all_tahap = cursor.execute("SELECT id, nama_tahap FROM tahap_penilaian ORDER BY nama_tahap").fetchall()
+        konteks = konteks_guru.ambil_konteks(guru_id, conn)
+        all_semester = katalog.ambil("semester")
+        all_tahap = katalog.ambil("tahap")
 
         with col_f1:
-            filter_kelas_id = st.selectbox("Filter Kelas", options=[("", "Semua Kelas")] + [(k['id'], k['nama_lk']) for k in all_kelas_guru], format_func=lambda x:x[1], key="filter_riwayat_kelas")
-            if filter_kelas_id and filter_kelas_id[0]:
-                query_riwayat += " AND s.kelas_id = ?"
-                params_riwayat.append(filter_kelas_id[0])
+            filter_kelas_id = st.selectbox("Filter Kelas", options=[("", "Semua Kelas")] + konteks_guru.semua_kelas(konteks), format_func=lambda x:x[1], key="filter_riwayat_kelas")
         with col_f2:
-            filter_mapel_id = st.selectbox("Filter Mapel", options=[("", "Semua Mapel")] + [(m['id'], m['nama_mapel']) for m in all_mapel_guru], format_func=lambda x:x[1], key="filter_riwayat_mapel")
-            if filter_mapel_id and filter_mapel_id[0]:
-                query_riwayat += " AND n.mapel_id = ?"
-                params_riwayat.append(filter_mapel_id[0])
+            filter_mapel_id = st.selectbox("Filter Mapel", options=[("", "Semua Mapel")] + konteks_guru.semua_mapel(konteks), format_func=lambda x:x[1], key="filter_riwayat_mapel")
         with col_f3:
             filter_semester_id = st.selectbox("Filter Semester", options=[("", "Semua Semester")] + [(s['id'], s['nama_semester']) for s in all_semester], format_func=lambda x:x[1], key="filter_riwayat_semester")
-            if filter_semester_id and filter_semester_id[0]:
-                query_riwayat += " AND n.semester_id = ?"
-                params_riwayat.append(filter_semester_id[0])
         with col_f4:
             filter_tahap_id = st.selectbox("Filter Tahap", options=[("", "Semua Tahap")] + [(t['id'], t['nama_tahap']) for t in all_tahap], format_func=lambda x:x[1], key="filter_riwayat_tahap")
-            if filter_tahap_id and filter_tahap_id[0]:
-                query_riwayat += " AND n.tahap_id = ?"
-                params_riwayat.append(filter_tahap_id[0])
 
-        query_riwayat += " ORDER BY n.tanggal_input DESC, s.nama ASC"
-        cursor.execute(query_riwayat, tuple(params_riwayat))
-        riwayat = cursor.fetchall()
-        
+        filter_riwayat = {
+            "kelas_id": filter_kelas_id[0] or None,
+            "mapel_id": filter_mapel_id[0] or None,
+            "semester_id": filter_semester_id[0] or None,
+            "tahap_id": filter_tahap_id[0] or None,
+        }
+        # Kembali ke halaman pertama setiap kali filter berubah
+        if st.session_state.get("riwayat_filter_aktif") != filter_riwayat:
+            st.session_state.riwayat_filter_aktif = filter_riwayat
+            st.session_state.riwayat_kursor = [None]
+        kursor_halaman = st.session_state.riwayat_kursor
+
+        profiler.fase("riwayat: query", "db")
+        # Semester yang dipilih di filter mungkin sudah diarsipkan: berkas arsipnya di-ATTACH
+        # selama query. Tanpa filter semester, riwayat hanya dari database utama.
+        if filter_riwayat["semester_id"]:
+            sumber_nilai = arsip.nilai_semua(conn, [filter_riwayat["semester_id"]])
+        else:
+            sumber_nilai = contextlib.nullcontext("nilai")
+        with sumber_nilai as sumber:
+            sql_jumlah, params_jumlah = queries.riwayat_jumlah(guru_id, filter_riwayat, sumber)
+            total_riwayat = cache_query.ambil(cursor, sql_jumlah, params_jumlah)[0][0]
+            riwayat, kursor_berikutnya = ambil_halaman_riwayat(cursor, guru_id, filter_riwayat, kursor_halaman[-1], sumber=sumber)
+        if not filter_riwayat["semester_id"] and any(s["berkas_arsip"] for s in all_semester):
+            st.caption("Nilai semester yang sudah diarsipkan tampil jika semesternya dipilih di Filter Semester.")
+
+        profiler.fase("riwayat: tabel", "render")
         if riwayat:
             df_riwayat = pd.DataFrame(riwayat, columns=[
                 "ID Nilai", "NISN", "Nama Siswa", "Kelas", 
@@ -300,7 +422,17 @@ def show_nilai():
                     "Catatan": st.column_config.TextColumn(width="large")
                 }
             )
-            st.caption(f"Menampilkan {len(df_riwayat)} data nilai.")
+            jumlah_halaman = max(1, math.ceil(total_riwayat / queries.RIWAYAT_PER_HALAMAN))
+            st.caption(f"Halaman {len(kursor_halaman)} dari {jumlah_halaman} — menampilkan {len(df_riwayat)} dari {total_riwayat} data nilai.")
+            col_sebelum, col_berikut = st.columns(2)
+            with col_sebelum:
+                if st.button("⬅️ Sebelumnya", disabled=len(kursor_halaman) == 1, key="riwayat_sebelumnya"):
+                    kursor_halaman.pop()
+                    st.rerun()
+            with col_berikut:
+                if st.button("Berikutnya ➡️", disabled=kursor_berikutnya is None, key="riwayat_berikutnya"):
+                    kursor_halaman.append(kursor_berikutnya)
+                    st.rerun()
             
             # Fitur Edit/Hapus Nilai (Contoh Sederhana)
             st.subheader("✏️ Edit / Hapus Nilai Tertentu")
@@ -320,7 +452,9 @@ def show_nilai():
                     cursor.execute("SELECT * FROM nilai WHERE id = ?", (selected_nilai_id,))
                     nilai_detail = cursor.fetchone()
 
-                    if nilai_detail:
+                    if nilai_detail is None:
+                        st.info("Nilai ini berada di semester yang sudah diarsipkan dan hanya bisa dilihat.")
+                    else:
                         with st.form(key=f"form_action_nilai_{selected_nilai_id}"):
                             st.write(f"Mengubah nilai untuk ID: {selected_nilai_id} (Siswa ID: {nilai_detail['siswa_id']}, Mapel ID: {nilai_detail['mapel_id']})")
                             new_nilai_val = st.number_input("Nilai Baru", min_value=0.0, max_value=100.0, value=float(nilai_detail['nilai']), step=1.0, format="%.1f")
@@ -334,9 +468,8 @@ def show_nilai():
 
                             if submit_edit_nilai:
                                 try:
-                                    cursor.execute("UPDATE nilai SET nilai = ?, catatan = ?, tanggal_input = ? WHERE id = ?",
-                                                   (new_nilai_val, new_catatan_val, datetime.now().strftime("%Y-%m-%d"), selected_nilai_id))
-                                    conn.commit()
+                                    writer.eksekusi("UPDATE nilai SET nilai = ?, catatan = ?, tanggal_input = ? WHERE id = ?",
+                                                    (new_nilai_val, new_catatan_val, datetime.now().strftime("%Y-%m-%d"), selected_nilai_id))
                                     st.success(f"Nilai ID {selected_nilai_id} berhasil diperbarui.")
                                     st.rerun()
                                 except Exception as e:
@@ -347,6 +480,10 @@ def show_nilai():
                                 st.session_state.confirm_delete_single_nilai_id = selected_nilai_id
                                 st.rerun()
                                 
+        elif len(kursor_halaman) > 1:
+            # Halaman ini kosong (misalnya baris terakhirnya baru dihapus), mundur satu halaman
+            kursor_halaman.pop()
+            st.rerun()
         else:
             st.info("Belum ada data nilai yang tersimpan yang cocok dengan filter Anda.")
 
@@ -358,8 +495,7 @@ def show_nilai():
             with btn_confirm_del:
                 if st.button("Ya, Hapus Nilai Ini", type="primary", key=f"confirm_del_nilai_{nilai_id_del}"):
                     try:
-                        cursor.execute("DELETE FROM nilai WHERE id = ?", (nilai_id_del,))
-                        conn.commit()
+                        writer.eksekusi("DELETE FROM nilai WHERE id = ?", (nilai_id_del,))
                         st.success(f"Nilai ID {nilai_id_del} berhasil dihapus.")
                         del st.session_state.confirm_delete_single_nilai_id
                         st.rerun()
@@ -373,8 +509,6 @@ def show_nilai():
             
     except sqlite3.Error as e:
         st.error(f"Gagal memuat riwayat nilai: {str(e)}")
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
     # Untuk pengujian lokal
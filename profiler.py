@@ -0,0 +1,207 @@
+# Profiler per rerun (opsional, hanya untuk admin).
+#
+# Router di sinfomik.py menjalankan halaman di dalam `profiler.rerun(...)`. Selama mode
+# profiling aktif, waktu dicatat per "span" bernama:
+#   - `with profiler.span("nama", jenis):` untuk blok yang bisa bersarang, dan
+#   - `profiler.fase("nama", jenis)` untuk menandai tahap berurutan di dalam fungsi halaman
+#     tanpa perlu mengubah indentasi; sebuah fase berakhir saat fase berikutnya dimulai
+#     atau saat span induknya selesai.
+# Jenis yang dipakai: "db" (query), "data" (olah data/DataFrame), "render" (widget), "lain".
+# Jumlah query dan waktu DB per span diambil dari tracer, sehingga span "render" yang
+# ternyata menjalankan query juga terlihat.
+#
+# Setelah halaman selesai, rincian ditampilkan di panel bawah halaman dan setiap span
+# ditambahkan sebagai satu baris JSON ke SINFOMIK_PROFIL_LOG (default profil.jsonl).
+# Panel yang sama juga menampilkan agregat query per halaman dari tracer.statistik()
+# (semua sesi, sejak proses berjalan).
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+import tracer
+
+PROFIL_LOG = os.getenv("SINFOMIK_PROFIL_LOG", "profil.jsonl")
+
+_lokal = threading.local()
+_lock_file = threading.Lock()
+
+
+class _Profil:
+    def __init__(self, halaman):
+        self.id = uuid.uuid4().hex[:12]
+        self.halaman = halaman
+        self.mulai = time.perf_counter()
+        self.spans = []
+        self.kedalaman = 0
+        self.fase_terbuka = {}  # kedalaman -> state fase yang belum ditutup
+        self.total_ms = 0.0
+        self.status = "ok"
+
+
+def diizinkan():
+    """Mode profiling hanya untuk admin yang menyalakannya di sidebar."""
+    return st.session_state.get("role") == "admin" and st.session_state.get("profiler_aktif", False)
+
+
+def _jumlah_query():
+    rerun_sql = tracer.rerun_aktif()
+    return len(rerun_sql.query) if rerun_sql is not None else 0
+
+
+def _buka(profil, nama, jenis):
+    entri = {
+        "span": nama,
+        "jenis": jenis,
+        "kedalaman": profil.kedalaman,
+        "mulai_ms": (time.perf_counter() - profil.mulai) * 1000,
+    }
+    profil.spans.append(entri)
+    return entri, time.perf_counter(), _jumlah_query()
+
+
+def _tutup(state):
+    entri, t0, awal_query = state
+    entri["ms"] = (time.perf_counter() - t0) * 1000
+    rerun_sql = tracer.rerun_aktif()
+    query = rerun_sql.query[awal_query:] if rerun_sql is not None else []
+    entri["query"] = len(query)
+    entri["db_ms"] = sum(rec["ms"] for rec in query)
+
+
+def _tutup_fase(profil, kedalaman):
+    state = profil.fase_terbuka.pop(kedalaman, None)
+    if state is not None:
+        _tutup(state)
+
+
+@contextmanager
+def span(nama, jenis="lain"):
+    profil = getattr(_lokal, "profil", None)
+    if profil is None:
+        yield
+        return
+    _tutup_fase(profil, profil.kedalaman)
+    state = _buka(profil, nama, jenis)
+    profil.kedalaman += 1
+    try:
+        yield
+    finally:
+        _tutup_fase(profil, profil.kedalaman)
+        profil.kedalaman -= 1
+        _tutup(state)
+
+
+def fase(nama, jenis="lain"):
+    """Tutup fase sebelumnya (pada kedalaman yang sama) lalu mulai fase baru."""
+    profil = getattr(_lokal, "profil", None)
+    if profil is None:
+        return
+    _tutup_fase(profil, profil.kedalaman)
+    profil.fase_terbuka[profil.kedalaman] = _buka(profil, nama, jenis)
+
+
+@contextmanager
+def rerun(halaman, aktif):
+    """Memprofil satu rerun halaman jika `aktif`; menghasilkan objek profil atau None."""
+    if not aktif:
+        yield None
+        return
+    profil = _Profil(halaman)
+    _lokal.profil = profil
+    try:
+        yield profil
+    except BaseException as e:
+        # st.rerun() dan st.stop() juga berupa exception; catat agar terlihat di log
+        profil.status = type(e).__name__
+        raise
+    finally:
+        for kedalaman in sorted(profil.fase_terbuka, reverse=True):
+            _tutup_fase(profil, kedalaman)
+        profil.total_ms = (time.perf_counter() - profil.mulai) * 1000
+        _lokal.profil = None
+        _tulis(profil)
+
+
+def _tulis(profil):
+    ts = time.strftime("%Y-%m-%dT%H:%M:%S")
+    baris = [
+        json.dumps({
+            "ts": ts, "rerun": profil.id, "halaman": profil.halaman, "status": profil.status,
+            "total_ms": round(profil.total_ms, 3), **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in s.items()},
+        }, ensure_ascii=False)
+        for s in profil.spans
+    ]
+    with _lock_file:
+        with open(PROFIL_LOG, "a", encoding="utf-8") as f:
+            f.write("\n".join(baris) + "\n" if baris else "")
+
+
+def tampilkan_panel(profil):
+    """Panel rincian waktu di bagian bawah halaman."""
+    if profil is None:
+        return
+    st.divider()
+    with st.expander(f"⏱️ Profil rerun '{profil.halaman}': {profil.total_ms:.1f} ms", expanded=True):
+        _tabel_span(profil)
+    _tampilkan_statistik_halaman()
+
+
+def _tabel_span(profil):
+    if not profil.spans:
+        st.caption("Tidak ada span yang tercatat.")
+        return
+    df = pd.DataFrame([
+        {
+            "Span": "· " * s["kedalaman"] + s["span"],
+            "Jenis": s["jenis"],
+            "Mulai (ms)": round(s["mulai_ms"], 1),
+            "Durasi (ms)": round(s.get("ms", 0.0), 1),
+            "Query": s.get("query", 0),
+            "DB (ms)": round(s.get("db_ms", 0.0), 1),
+        }
+        for s in profil.spans
+    ])
+    st.dataframe(df, hide_index=True, use_container_width=True)
+
+    # Ringkasan per jenis dari span terdalam saja, agar waktu tidak terhitung dua kali
+    daun = [s for i, s in enumerate(profil.spans)
+            if i + 1 >= len(profil.spans) or profil.spans[i + 1]["kedalaman"] <= s["kedalaman"]]
+    per_jenis = {}
+    for s in daun:
+        per_jenis[s["jenis"]] = per_jenis.get(s["jenis"], 0.0) + s.get("ms", 0.0)
+    per_jenis["tanpa span"] = max(0.0, profil.total_ms - sum(s.get("ms", 0.0) for s in profil.spans if s["kedalaman"] == 0))
+    st.caption(" · ".join(f"{jenis}: {ms:.1f} ms" for jenis, ms in per_jenis.items())
+               + f" — dicatat ke {PROFIL_LOG}")
+
+
+def _tampilkan_statistik_halaman():
+    """Agregat query per halaman dari tracer (semua sesi sejak proses berjalan)."""
+    with st.expander("📈 Statistik query per halaman"):
+        statistik = tracer.statistik()
+        if not statistik:
+            st.caption("Belum ada rerun yang tercatat." if tracer.AKTIF else "Tracer dimatikan (SINFOMIK_TRACE=0).")
+            return
+        df = pd.DataFrame([
+            {
+                "Halaman": halaman,
+                "Rerun": a["rerun"],
+                "Query/rerun": a["query_per_rerun"],
+                "Query/rerun maks": a["query_per_rerun_maks"],
+                "Query p50 (ms)": a["p50_ms"],
+                "Query p95 (ms)": a["p95_ms"],
+                "DB/rerun p95 (ms)": a["db_ms_per_rerun_p95"],
+            }
+            for halaman, a in sorted(statistik.items(), key=lambda x: x[1]["db_ms_per_rerun_p95"], reverse=True)
+        ])
+        st.dataframe(df, hide_index=True, use_container_width=True)
+        st.caption(f"Persentil dari {tracer.SAMPEL_PER_HALAMAN} sampel terakhir per halaman. "
+                   f"Query di atas {tracer.SLOW_QUERY_MS:g} ms dicatat ke {tracer.SLOW_QUERY_LOG}.")
+        if st.button("Reset statistik", key="profiler_reset_statistik"):
+            tracer.reset_statistik()
+            st.rerun()
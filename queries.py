@@ -0,0 +1,367 @@
+import re
+import sqlite3
+import sys
+
+# SQL untuk jalur-jalur "panas" (dijalankan di hampir setiap rerun). Disimpan di satu
+# tempat agar halaman dan pemeriksaan EXPLAIN QUERY PLAN di bawah memakai teks query
+# yang persis sama. Modul ini sengaja tidak mengimpor streamlit.
+
+# Seluruh penugasan mengajar seorang guru (semua semester) beserta status aktif mapel per
+# semester, ditambah satu baris tanpa kelas/mapel untuk semester aktif. Dipakai untuk
+# membangun konteks mengajar guru sekali saja (lihat konteks_guru.py).
+_PENUGASAN_GURU = """
+    SELECT s.id AS semester_id, s.nama_semester, s.aktif,
+           k.id AS kelas_id, k.tingkat || ' - ' || k.nama_kelas AS nama_kelas,
+           mp.id AS mapel_id, mp.nama_mapel, mp.nama_mapel || ' (' || mp.kode_mapel || ')' AS nama_lengkap_mapel,
+           COALESCE(msc.is_active, 0) AS mapel_aktif
+    FROM {penugasan} gmk
+    JOIN main.semester s ON s.id = gmk.semester_id
+    JOIN main.kelas k ON k.id = gmk.kelas_id
+    JOIN main.mata_pelajaran mp ON mp.id = gmk.mapel_id
+    LEFT JOIN main.mapel_semester_config msc ON msc.mapel_id = gmk.mapel_id AND msc.semester_id = gmk.semester_id
+    WHERE gmk.user_id = ?
+"""
+
+# Bagian yang sama untuk semester yang sudah diarsipkan: penugasannya dibaca dari berkas arsip
+# yang di-ATTACH sebagai {alias} (lihat arsip.penugasan_arsip). Hanya semester yang sudah
+# ditandai untuk berkas ini, agar salinan yang belum selesai tidak terbaca.
+KONTEKS_GURU_ARSIP = _PENUGASAN_GURU.format(penugasan="{alias}.guru_mapel_kelas") + """      AND s.berkas_arsip = ?
+"""
+
+KONTEKS_GURU = _PENUGASAN_GURU.format(penugasan="main.guru_mapel_kelas") + """    UNION ALL
+    SELECT s.id, s.nama_semester, s.aktif, NULL, NULL, NULL, NULL, NULL, 0
+    FROM semester s
+    WHERE s.aktif = 1
+"""
+
+SISWA_KELAS = """
+    SELECT id, nisn, nama
+    FROM siswa
+    WHERE kelas_id = ?
+    ORDER BY nama ASC
+"""
+
+# Nilai yang sudah ada untuk satu kelas sekaligus (menggantikan satu query per siswa)
+NILAI_KELAS_TAHAP = """
+    SELECT n.siswa_id, n.nilai
+    FROM nilai n
+    WHERE n.semester_id = ? AND n.mapel_id = ? AND n.tahap_id = ?
+      AND n.siswa_id IN (SELECT id FROM siswa WHERE kelas_id = ?)
+"""
+
+# Baris yang bentrok dengan UNIQUE(siswa_id, mapel_id, semester_id, tahap_id) dilewati,
+# sehingga tidak perlu cek duplikasi per siswa sebelum insert
+INSERT_NILAI_BARU = """
+    INSERT INTO nilai (siswa_id, mapel_id, semester_id, tahap_id, nilai, tanggal_input, guru_id, catatan)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (siswa_id, mapel_id, semester_id, tahap_id) DO NOTHING
+"""
+
+# Semua nilai satu kelas untuk satu mapel (semua tahap), untuk mode gradebook
+NILAI_KELAS_MAPEL = """
+    SELECT n.siswa_id, n.tahap_id, n.nilai
+    FROM nilai n
+    WHERE n.semester_id = ? AND n.mapel_id = ?
+      AND n.siswa_id IN (SELECT id FROM siswa WHERE kelas_id = ?)
+"""
+
+# Sel gradebook yang berubah: insert jika belum ada, update jika sudah ada. Catatan lama dipertahankan.
+UPSERT_NILAI = """
+    INSERT INTO nilai (siswa_id, mapel_id, semester_id, tahap_id, nilai, tanggal_input, guru_id, catatan)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (siswa_id, mapel_id, semester_id, tahap_id) DO UPDATE SET
+        nilai = excluded.nilai,
+        tanggal_input = excluded.tanggal_input,
+        guru_id = excluded.guru_id
+"""
+
+RIWAYAT_NILAI = """
+    SELECT
+        n.id as nilai_id,
+        s.nisn,
+        s.nama as nama_siswa,
+        k.tingkat || ' - ' || k.nama_kelas as nama_kelas,
+        mp.nama_mapel,
+        sem.nama_semester,
+        tp.nama_tahap,
+        n.nilai,
+        n.tanggal_input,
+        n.catatan
+    FROM {sumber} n
+    JOIN siswa s ON n.siswa_id = s.id
+    LEFT JOIN kelas k ON s.kelas_id = k.id
+    JOIN mata_pelajaran mp ON n.mapel_id = mp.id
+    JOIN semester sem ON n.semester_id = sem.id
+    JOIN tahap_penilaian tp ON n.tahap_id = tp.id
+"""
+
+RIWAYAT_PER_HALAMAN = 50
+
+# Ekspor lengkap nilai satu semester (lihat ekspor_nilai.py). Dibaca lewat index
+# idx_nilai_semester_mapel_tahap, jadi baris keluar urut mapel, tahap, lalu siswa.
+EKSPOR_NILAI = """
+    SELECT
+        n.id,
+        sem.nama_semester,
+        s.nisn,
+        s.nama,
+        k.tingkat || ' - ' || k.nama_kelas,
+        mp.kode_mapel,
+        mp.nama_mapel,
+        tp.nama_tahap,
+        n.nilai,
+        n.tanggal_input,
+        u.username,
+        n.catatan
+    FROM {sumber} n
+    JOIN siswa s ON n.siswa_id = s.id
+    LEFT JOIN kelas k ON s.kelas_id = k.id
+    JOIN mata_pelajaran mp ON n.mapel_id = mp.id
+    JOIN semester sem ON n.semester_id = sem.id
+    JOIN tahap_penilaian tp ON n.tahap_id = tp.id
+    LEFT JOIN user u ON n.guru_id = u.id
+    WHERE n.semester_id = ?
+"""
+
+
+def _riwayat_where(guru_id, filter_riwayat):
+    # Semua filter dikirim sebagai parameter; filter kelas memakai subquery agar
+    # query hitung tidak perlu join ke tabel siswa
+    kondisi, params = ["n.guru_id = ?"], [guru_id]
+    if filter_riwayat.get("kelas_id"):
+        kondisi.append("n.siswa_id IN (SELECT id FROM siswa WHERE kelas_id = ?)")
+        params.append(filter_riwayat["kelas_id"])
+    for kolom in ("mapel_id", "semester_id", "tahap_id"):
+        if filter_riwayat.get(kolom):
+            kondisi.append(f"n.{kolom} = ?")
+            params.append(filter_riwayat[kolom])
+    return " AND ".join(kondisi), params
+
+
+def riwayat_halaman(guru_id, filter_riwayat, setelah=None, batas=RIWAYAT_PER_HALAMAN, sumber="nilai"):
+    """SQL dan parameter untuk satu halaman riwayat nilai, terbaru lebih dulu.
+
+    Pagination memakai keyset pada (tanggal_input, id): `setelah` adalah pasangan
+    (tanggal_input, id) baris terakhir di halaman sebelumnya, atau None untuk halaman pertama.
+    `sumber` boleh diganti subquery gabungan arsip dari arsip.nilai_semua().
+    """
+    where, params = _riwayat_where(guru_id, filter_riwayat)
+    if setelah is not None:
+        where += " AND (n.tanggal_input, n.id) < (?, ?)"
+        params.extend(setelah)
+    sql = RIWAYAT_NILAI.format(sumber=sumber) + " WHERE " + where + " ORDER BY n.tanggal_input DESC, n.id DESC LIMIT ?"
+    return sql, params + [batas]
+
+
+def riwayat_jumlah(guru_id, filter_riwayat, sumber="nilai"):
+    """SQL dan parameter untuk jumlah total riwayat; hanya membaca index tabel nilai."""
+    where, params = _riwayat_where(guru_id, filter_riwayat)
+    return f"SELECT COUNT(*) FROM {sumber} n WHERE " + where, params
+
+
+# Daftar seluruh penugasan mengajar (halaman Guru & Penugasan)
+PENUGASAN_DAFTAR = """
+    SELECT gmk.id, u.username as nama_guru, mp.nama_mapel, k.tingkat || ' - ' || k.nama_kelas as nama_kelas, 
+           (SELECT ta.th_ajar || ' - ' || sp.sm_pil FROM semester s 
+            JOIN tahun_ajaran ta ON s.th_ajar_id = ta.id 
+            JOIN semester_pil sp ON s.sm_pil_id = sp.id WHERE s.id = gmk.semester_id) as nama_semester
+    FROM guru_mapel_kelas gmk
+    JOIN user u ON gmk.user_id = u.id
+    JOIN mata_pelajaran mp ON gmk.mapel_id = mp.id
+    JOIN kelas k ON gmk.kelas_id = k.id
+    ORDER BY u.username, nama_semester, mp.nama_mapel
+"""
+
+# Status aktif satu mapel di setiap semester (halaman Mata Pelajaran)
+CONFIG_MAPEL = """
+    SELECT semester_id, is_active 
+    FROM mapel_semester_config 
+    WHERE mapel_id = ?
+"""
+
+# Simpan status aktif mapel per semester (insert atau update sekaligus)
+UPSERT_CONFIG_MAPEL = """
+    INSERT INTO mapel_semester_config (mapel_id, semester_id, is_active) VALUES (?, ?, ?)
+    ON CONFLICT (mapel_id, semester_id) DO UPDATE SET is_active = excluded.is_active
+"""
+
+# Bobot tahap penilaian per mapel (rapor); mapel tanpa baris memakai bobot sama
+BOBOT_MAPEL = """
+    SELECT tahap_id, bobot
+    FROM bobot_tahap
+    WHERE mapel_id = ?
+"""
+
+BOBOT_SEMUA = """
+    SELECT mapel_id, tahap_id, bobot
+    FROM bobot_tahap
+"""
+
+
+SISWA_DAFTAR = """
+    SELECT s.id, s.nisn, s.nama, s.kelas_id, k.tingkat || ' - ' || k.nama_kelas as nama_kelas
+    FROM siswa s
+    LEFT JOIN kelas k ON s.kelas_id = k.id
+"""
+
+SISWA_PER_HALAMAN = 50
+
+
+# Pencarian nama di atas jumlah hasil ini tidak diperingkat dengan bm25: menghitung
+# peringkat untuk ribuan kecocokan (misalnya awalan 2 huruf) terlalu mahal dan
+# hasilnya hampir tidak bermakna. Hasil diurutkan menurut id saja.
+SISWA_CARI_PERINGKAT_MAKS = 5000
+
+SISWA_CARI_NAMA = """
+    SELECT s.id, s.nisn, s.nama, s.kelas_id, k.tingkat || ' - ' || k.nama_kelas as nama_kelas
+    FROM (
+        SELECT rowid AS id, rank FROM siswa_fts WHERE siswa_fts MATCH ?
+        ORDER BY {urutan} LIMIT ? OFFSET ?
+    ) f
+    JOIN siswa s ON s.id = f.id
+    LEFT JOIN kelas k ON s.kelas_id = k.id
+    ORDER BY {urutan_luar}
+"""
+
+
+def _cari_nisn(cari):
+    # NISN diketik tanpa nol di depan pun tetap cocok (kolom nisn bertipe INTEGER)
+    return cari.lstrip("0") or "0"
+
+
+def fts_match(cari):
+    """Mengubah kata kunci bebas menjadi ekspresi MATCH FTS5: setiap kata menjadi
+    pencarian awalan, dan semua kata harus cocok. Contoh: 'budi sap' -> '"budi"* "sap"*'."""
+    return " ".join(f'"{kata}"*' for kata in re.findall(r"\w+", cari))
+
+
+def siswa_halaman(cari=None, setelah=None, batas=SISWA_PER_HALAMAN, berperingkat=True):
+    """SQL dan parameter untuk satu halaman daftar siswa.
+
+    Tanpa kata kunci: urut nama dengan keyset pada (nama, id); `setelah` adalah pasangan
+    (nama, id) baris terakhir halaman sebelumnya. Dengan kata kunci: angka dicari sebagai
+    awalan NISN (NISN persis muncul paling atas), selain itu dicari di index FTS nama dan
+    diurutkan menurut relevansi; `setelah` berupa offset.
+    """
+    cari = (cari or "").strip()
+    if not cari:
+        where, params = "1 = 1", []
+        if setelah is not None:
+            where = "(s.nama, s.id) > (?, ?)"
+            params.extend(setelah)
+        sql = SISWA_DAFTAR + " WHERE " + where + " ORDER BY s.nama ASC, s.id ASC LIMIT ?"
+        return sql, params + [batas]
+    offset = setelah or 0
+    if cari.isdigit():
+        # Urutan teks menaruh NISN yang persis sama di depan semua NISN berawalan sama
+        sql = SISWA_DAFTAR + " WHERE s.nisn_teks GLOB ? ORDER BY s.nisn_teks, s.id LIMIT ? OFFSET ?"
+        return sql, [_cari_nisn(cari) + "*", batas, offset]
+    if berperingkat:
+        sql = SISWA_CARI_NAMA.format(urutan="rank", urutan_luar="f.rank")
+    else:
+        sql = SISWA_CARI_NAMA.format(urutan="rowid", urutan_luar="f.id")
+    return sql, [fts_match(cari) or '""', batas, offset]
+
+
+def siswa_jumlah(cari=None):
+    cari = (cari or "").strip()
+    if not cari:
+        return "SELECT COUNT(*) FROM siswa", []
+    if cari.isdigit():
+        return "SELECT COUNT(*) FROM siswa s WHERE s.nisn_teks GLOB ?", [_cari_nisn(cari) + "*"]
+    return "SELECT COUNT(*) FROM siswa_fts WHERE siswa_fts MATCH ?", [fts_match(cari) or '""']
+
+
+# Query produksi yang wajib dilayani index. Parameter hanya contoh nilai agar
+# EXPLAIN QUERY PLAN bisa dijalankan; isinya tidak memengaruhi rencana query.
+HOT_QUERIES = {
+    "konteks_guru": (KONTEKS_GURU, (1,)),
+    "siswa_kelas": (SISWA_KELAS, (1,)),
+    "nilai_kelas_tahap": (NILAI_KELAS_TAHAP, (1, 1, 1, 1)),
+    "nilai_kelas_mapel": (NILAI_KELAS_MAPEL, (1, 1, 1)),
+    "riwayat_nilai": riwayat_halaman(1, {}),
+    "riwayat_nilai_lanjutan": riwayat_halaman(1, {}, setelah=("2024-01-01", 1)),
+    "riwayat_nilai_terfilter": riwayat_halaman(
+        1, {"kelas_id": 1, "mapel_id": 1, "semester_id": 1, "tahap_id": 1}, setelah=("2024-01-01", 1)
+    ),
+    "riwayat_nilai_jumlah": riwayat_jumlah(1, {"kelas_id": 1, "mapel_id": 1}),
+    "siswa_halaman": siswa_halaman(),
+    "siswa_halaman_lanjutan": siswa_halaman(setelah=("Budi", 1)),
+    "siswa_cari_nisn": siswa_halaman("0012345"),
+    "siswa_cari_nama": siswa_halaman("budi sant"),
+    "siswa_cari_nama_luas": siswa_halaman("bu", berperingkat=False),
+    "siswa_cari_jumlah": siswa_jumlah("budi"),
+    "ekspor_nilai": (EKSPOR_NILAI.format(sumber="nilai"), (1,)),
+    "penugasan_daftar": (PENUGASAN_DAFTAR, ()),
+    "konteks_guru_arsip": (KONTEKS_GURU_ARSIP.format(alias="main"), (1, "nilai_2024-2025.db")),
+    "config_mapel": (CONFIG_MAPEL, (1,)),
+}
+
+# SCAN yang disengaja, bukan regresi:
+# - penugasan_daftar memang menampilkan seluruh penugasan; tabel mana yang ditelusuri penuh
+#   (gmk, atau user lewat index username untuk ORDER BY) tergantung statistik;
+# - siswa_halaman menelusuri idx_siswa_nama urut nama tetapi berhenti di LIMIT satu halaman;
+# - konteks_guru(_arsip) boleh menelusuri semester (satu baris per semester, dua per tahun);
+#   di database kecil dengan statistik, planner memilihnya sebagai tabel pertama.
+SCAN_SENGAJA = {
+    "penugasan_daftar": {"gmk", "u"},
+    "siswa_halaman": {"s"},
+    "konteks_guru": {"s"},
+    "konteks_guru_arsip": {"s"},
+}
+
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?(\w+)")
+
+
+def find_full_scans(conn, queries=None):
+    """Menjalankan EXPLAIN QUERY PLAN untuk setiap query dan mengembalikan daftar
+    (nama_query, detail_plan) untuk langkah yang membaca seluruh tabel, termasuk penelusuran
+    seluruh index ("SCAN ... USING [COVERING] INDEX")."""
+    temuan = []
+    for nama, (sql, params) in (queries or HOT_QUERIES).items():
+        # Hasil subquery/CTE yang sudah dibatasi (MATERIALIZE/CO-ROUTINE) boleh di-SCAN
+        subquery = set()
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[3]
+            if detail.startswith(("MATERIALIZE ", "CO-ROUTINE ")):
+                subquery.add(detail.split(" ", 1)[1])
+                continue
+            cocok = _FULL_SCAN.match(detail)
+            if cocok and cocok.group(2) in SCAN_SENGAJA.get(nama, ()):
+                continue
+            if cocok and cocok.group(2) not in subquery and "VIRTUAL TABLE" not in detail:
+                temuan.append((nama, detail))
+    return temuan
+
+
+if __name__ == "__main__":
+    # Pemeriksaan regresi: python queries.py [path_database]
+    # Tanpa argumen, skema dibangun dari nol di memori lewat migrasi. Database yang skemanya
+    # belum versi terbaru disalin ke memori dan dimigrasikan di salinan itu; berkas aslinya
+    # dibuka read-only dan tidak pernah diubah.
+    import os
+    import migrations
+
+    if len(sys.argv) > 1:
+        if not os.path.exists(sys.argv[1]):
+            sys.exit(f"{sys.argv[1]} tidak ditemukan.")
+        conn = sqlite3.connect(f"file:{sys.argv[1]}?mode=ro", uri=True)
+        versi = migrations.current_version(conn)
+        if versi < migrations.LATEST_VERSION:
+            print(f"Skema {sys.argv[1]} versi {versi}, terbaru {migrations.LATEST_VERSION}: "
+                  f"migrasi diterapkan pada salinan di memori.")
+            salinan = sqlite3.connect(":memory:")
+            conn.backup(salinan)
+            conn.close()
+            conn = salinan
+            migrations.migrate(conn)
+    else:
+        conn = sqlite3.connect(":memory:")
+        migrations.migrate(conn)
+
+    temuan = find_full_scans(conn)
+    for nama, detail in temuan:
+        print(f"FULL SCAN  {nama}: {detail}")
+    if temuan:
+        sys.exit(1)
+    print(f"OK: {len(HOT_QUERIES)} query memakai index.")
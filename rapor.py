@@ -0,0 +1,398 @@
+# Mesin rapor: nilai akhir setiap siswa x mapel dari nilai per tahap penilaian, predikat,
+# statistik per kelas, dan peringkat kelas.
+#
+#     python rapor.py --db sinfomik.db --semester 20
+#     python rapor.py --db sinfomik.db --tahun 2025/2026     # semua semester satu tahun ajaran
+#
+# Aturan nilai akhir:
+# - Bobot tahap diatur per mapel di halaman Mata Pelajaran (tabel bobot_tahap). Mapel tanpa
+#   bobot tersimpan memakai bobot sama untuk semua tahap; mapel yang punya bobot hanya
+#   menghitung tahap dengan bobot > 0.
+# - Nilai akhir = jumlah(bobot x nilai) / jumlah(bobot) atas tahap berbobot yang SUDAH dinilai.
+#   Tahap berbobot yang belum dinilai dihitung di kolom `tahap_kurang`, sehingga rapor yang
+#   belum lengkap terlihat dan tidak diam-diam dianggap nol.
+# - Predikat menurut BATAS_PREDIKAT (batas bawah nilai akhir).
+# - Kelas siswa adalah kelas_id saat ini; database belum menyimpan riwayat kelas per semester.
+#
+# Nilai satu semester dimuat sekaligus sebagai kolom numpy lewat covering index
+# idx_nilai_semester_mapel_tahap (semester yang diarsipkan dibaca dari berkas arsipnya, lihat
+# arsip.nilai_semua), lalu semua siswa x mapel dihitung dengan operasi array dan satu groupby,
+# tanpa loop Python per siswa.
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import arsip
+import cache_query
+import cetak_rapor
+import db
+import ekspor_nilai
+import katalog
+import leger
+import queries
+
+# (batas bawah, predikat), dari yang tertinggi
+BATAS_PREDIKAT = [(86, "A"), (71, "B"), (56, "C"), (0, "D")]
+
+_KOLOM_NILAI = ["siswa_id", "mapel_id", "tahap_id", "nilai"]
+_BARIS_PER_BLOK = 50000
+
+
+def muat_nilai(conn, semester_ids):
+    """Nilai mentah semester-semester ini sebagai DataFrame kolom semester_id, siswa_id,
+    mapel_id, tahap_id, nilai. `conn` harus koneksi dari db.get_read_connection()."""
+    semester, bagian = [], [np.empty((0, len(_KOLOM_NILAI)))]
+    with arsip.nilai_semua(conn, list(semester_ids)) as sumber:
+        for semester_id in semester_ids:
+            cur = conn.cursor()
+            # Tuple biasa (bukan sqlite3.Row) dan fetchmany per blok: kursor yang dilacak tracer
+            # mengambil satu baris per panggilan jika diiterasi langsung
+            cur.row_factory = None
+            cur.execute(f"SELECT {', '.join(_KOLOM_NILAI)} FROM {sumber} n WHERE n.semester_id = ?", (semester_id,))
+            blok = iter(lambda: cur.fetchmany(_BARIS_PER_BLOK), [])
+            datar = np.fromiter(itertools.chain.from_iterable(itertools.chain.from_iterable(blok)), dtype=np.float64)
+            bagian.append(datar.reshape(-1, len(_KOLOM_NILAI)))
+            semester.append(np.full(len(bagian[-1]), semester_id, dtype=np.int64))
+    kolom = np.concatenate(bagian)
+    return pd.DataFrame({
+        "semester_id": np.concatenate(semester) if semester else np.empty(0, dtype=np.int64),
+        "siswa_id": kolom[:, 0].astype(np.int64),
+        "mapel_id": kolom[:, 1].astype(np.int64),
+        "tahap_id": kolom[:, 2].astype(np.int64),
+        "nilai": kolom[:, 3],
+    })
+
+
+def matriks_bobot(conn):
+    """Array bobot[mapel_id, tahap_id] untuk semua mapel dan tahap yang ada."""
+    mapel_ids = [row[0] for row in conn.execute("SELECT id FROM mata_pelajaran")]
+    tahap_ids = [row[0] for row in conn.execute("SELECT id FROM tahap_penilaian")]
+    tersimpan = conn.execute(queries.BOBOT_SEMUA).fetchall()
+    bobot = np.zeros((max(mapel_ids, default=0) + 1, max(tahap_ids, default=0) + 1))
+    # Bawaan: semua tahap berbobot sama; mapel yang punya bobot tersimpan diisi ulang dari nol
+    bobot[np.ix_(mapel_ids, tahap_ids)] = 1.0
+    diatur = sorted({row["mapel_id"] for row in tersimpan if row["mapel_id"] < bobot.shape[0]})
+    bobot[diatur, :] = 0.0
+    for row in tersimpan:
+        if row["mapel_id"] < bobot.shape[0] and row["tahap_id"] < bobot.shape[1]:
+            bobot[row["mapel_id"], row["tahap_id"]] = row["bobot"]
+    return bobot
+
+
+def predikat(nilai_akhir):
+    batas = np.array([b for b, _ in BATAS_PREDIKAT[::-1]], dtype=np.float64)
+    label = np.array([p for _, p in BATAS_PREDIKAT[::-1]], dtype=object)
+    return label[np.clip(np.searchsorted(batas, nilai_akhir, side="right") - 1, 0, len(label) - 1)]
+
+
+def hitung(nilai, bobot):
+    """Nilai akhir per semester x siswa x mapel: kolom semester_id, siswa_id, mapel_id,
+    nilai_akhir, predikat, jumlah_tahap (tahap berbobot yang sudah dinilai), tahap_kurang."""
+    mapel = nilai["mapel_id"].to_numpy()
+    tahap = nilai["tahap_id"].to_numpy()
+    # Id di luar matriks (mapel/tahap yang sudah dihapus) berbobot 0
+    di_dalam = (mapel < bobot.shape[0]) & (tahap < bobot.shape[1])
+    w = np.zeros(len(nilai))
+    w[di_dalam] = bobot[mapel[di_dalam], tahap[di_dalam]]
+
+    df = pd.DataFrame({
+        "semester_id": nilai["semester_id"].to_numpy(),
+        "siswa_id": nilai["siswa_id"].to_numpy(),
+        "mapel_id": mapel,
+        "wx": w * nilai["nilai"].to_numpy(),
+        "w": w,
+        "dinilai": np.ones(len(w), dtype=np.int64),
+    })
+    df = df[df["w"] > 0]
+    hasil = df.groupby(["semester_id", "siswa_id", "mapel_id"], sort=False).sum().reset_index()
+
+    hasil["nilai_akhir"] = (hasil["wx"] / hasil["w"]).round(2)
+    hasil["predikat"] = predikat(hasil["nilai_akhir"].to_numpy())
+    tahap_berbobot = (bobot > 0).sum(axis=1)
+    hasil["jumlah_tahap"] = hasil["dinilai"]
+    hasil["tahap_kurang"] = tahap_berbobot[hasil["mapel_id"].to_numpy()] - hasil["dinilai"].to_numpy()
+    return hasil[["semester_id", "siswa_id", "mapel_id", "nilai_akhir", "predikat", "jumlah_tahap", "tahap_kurang"]]
+
+
+def muat_siswa(conn):
+    rows = conn.execute("SELECT id, nisn, nama, kelas_id FROM siswa").fetchall()
+    return pd.DataFrame([tuple(r) for r in rows], columns=["siswa_id", "nisn", "nama", "kelas_id"])
+
+
+def _dengan_kelas(rapor, siswa):
+    kelas = siswa.set_index("siswa_id")["kelas_id"]
+    df = rapor.assign(kelas_id=rapor["siswa_id"].map(kelas))
+    return df[df["kelas_id"].notna()].astype({"kelas_id": np.int64})
+
+
+def statistik_kelas(rapor, siswa):
+    """Per semester x kelas x mapel: jumlah siswa, rata-rata, median, simpangan baku, min,
+    maks, dan jumlah siswa per predikat."""
+    df = _dengan_kelas(rapor, siswa)
+    kunci = ["semester_id", "kelas_id", "mapel_id"]
+    stat = df.groupby(kunci)["nilai_akhir"].agg(
+        jumlah="count", rata="mean", median="median", simpangan="std", min="min", maks="max")
+    sebaran = df.groupby(kunci + ["predikat"]).size().unstack("predikat", fill_value=0)
+    sebaran = sebaran.reindex(columns=[p for _, p in BATAS_PREDIKAT], fill_value=0)
+    hasil = stat.join(sebaran).reset_index()
+    hasil[["rata", "median", "simpangan"]] = hasil[["rata", "median", "simpangan"]].round(2)
+    return hasil
+
+
+def peringkat(rapor, siswa):
+    """Per semester x siswa: rata-rata nilai akhir semua mapel dan peringkatnya di kelas
+    (nilai sama mendapat peringkat sama)."""
+    df = _dengan_kelas(rapor, siswa)
+    hasil = (df.groupby(["semester_id", "kelas_id", "siswa_id"])
+             .agg(rata=("nilai_akhir", "mean"), jumlah_mapel=("mapel_id", "count"))
+             .reset_index())
+    hasil["rata"] = hasil["rata"].round(2)
+    hasil["peringkat"] = (hasil.groupby(["semester_id", "kelas_id"])["rata"]
+                          .rank(method="min", ascending=False).astype(np.int64))
+    return hasil
+
+
+def hitung_rapor(semester_ids):
+    """Rapor lengkap semester-semester ini: dict DataFrame "rapor", "statistik", "peringkat",
+    "siswa", dan "waktu" (detik per tahap: muat, hitung, statistik)."""
+    waktu = {}
+    mulai = time.perf_counter()
+    conn = db.get_read_connection()
+    try:
+        nilai = muat_nilai(conn, semester_ids)
+        bobot = matriks_bobot(conn)
+        siswa = muat_siswa(conn)
+    finally:
+        conn.close()
+    waktu["muat"] = time.perf_counter() - mulai
+
+    mulai = time.perf_counter()
+    rapor = hitung(nilai, bobot)
+    waktu["hitung"] = time.perf_counter() - mulai
+
+    mulai = time.perf_counter()
+    statistik = statistik_kelas(rapor, siswa)
+    urutan = peringkat(rapor, siswa)
+    waktu["statistik"] = time.perf_counter() - mulai
+    return {"rapor": rapor, "statistik": statistik, "peringkat": urutan, "siswa": siswa,
+            "jumlah_nilai": len(nilai), "waktu": waktu}
+
+
+def show_rapor():
+    if st.session_state.get("role") != "admin":
+        st.error("Anda tidak memiliki akses ke halaman ini.")
+        return
+
+    st.title("📊 Rapor & Statistik Kelas")
+    st.caption("Bobot tahap penilaian per mata pelajaran diatur di halaman Mata Pelajaran. "
+               "Mapel yang belum diatur memakai bobot sama untuk semua tahap.")
+
+    opsi_semester = katalog.opsi("semester")
+    if not opsi_semester:
+        st.info("Belum ada data semester.")
+        return
+    aktif = next((i for i, row in enumerate(katalog.ambil("semester")) if row["aktif"]), 0)
+    pilihan = st.selectbox("Semester", options=opsi_semester, index=aktif,
+                           format_func=lambda x: x[1], key="rapor_semester")
+    semester_id = pilihan[0]
+
+    # Hasil disimpan per sesi dan dihitung ulang hanya jika ada commit sejak perhitungan
+    # terakhir (nilai, bobot, atau siswa berubah), lihat cache_query.versi_data()
+    kunci = (semester_id, cache_query.versi_data())
+    tersimpan = st.session_state.get("rapor_hasil")
+    if tersimpan is None or tersimpan[0] != kunci:
+        with st.spinner("Menghitung rapor..."):
+            tersimpan = (kunci, hitung_rapor([semester_id]))
+        st.session_state.rapor_hasil = tersimpan
+    hasil = tersimpan[1]
+    rapor = hasil["rapor"]
+
+    if rapor.empty:
+        st.info("Belum ada nilai pada semester ini.")
+        return
+    st.caption(f"{hasil['jumlah_nilai']:,} nilai dihitung dalam "
+               f"{sum(hasil['waktu'].values()):.2f} detik.".replace(",", "."))
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Siswa", f"{rapor['siswa_id'].nunique():,}".replace(",", "."))
+    col2.metric("Mata Pelajaran", rapor["mapel_id"].nunique())
+    col3.metric("Rata-rata Nilai Akhir", f"{rapor['nilai_akhir'].mean():.2f}")
+    col4.metric("Rapor Belum Lengkap", f"{int((rapor['tahap_kurang'] > 0).sum()):,}".replace(",", "."),
+                help="Siswa x mapel yang masih punya tahap berbobot tanpa nilai")
+
+    kelas_ada = set(hasil["statistik"]["kelas_id"])
+    opsi_kelas = [k for k in katalog.opsi("kelas") if k[0] in kelas_ada]
+    if not opsi_kelas:
+        st.info("Siswa yang punya nilai di semester ini belum terdaftar di kelas mana pun.")
+        return
+    kelas = st.selectbox("Kelas", options=opsi_kelas, format_func=lambda x: x[1], key="rapor_kelas")
+    kelas_id = kelas[0]
+
+    st.subheader("Statistik Kelas per Mata Pelajaran")
+    stat = hasil["statistik"]
+    stat = stat[(stat["semester_id"] == semester_id) & (stat["kelas_id"] == kelas_id)]
+    df_stat = pd.DataFrame({
+        "Mata Pelajaran": [katalog.label("mapel", m) for m in stat["mapel_id"]],
+        "Jumlah Siswa": stat["jumlah"].to_numpy(),
+        "Rata-rata": stat["rata"].to_numpy(),
+        "Median": stat["median"].to_numpy(),
+        "Simpangan Baku": stat["simpangan"].to_numpy(),
+        "Min": stat["min"].to_numpy(),
+        "Maks": stat["maks"].to_numpy(),
+        **{p: stat[p].to_numpy() for _, p in BATAS_PREDIKAT},
+    })
+    st.dataframe(df_stat, use_container_width=True, hide_index=True)
+
+    st.subheader("Nilai Akhir Siswa")
+    siswa = hasil["siswa"][hasil["siswa"]["kelas_id"] == kelas_id].set_index("siswa_id")
+    rapor_kelas = rapor[(rapor["semester_id"] == semester_id) & rapor["siswa_id"].isin(siswa.index)]
+    tabel = rapor_kelas.pivot(index="siswa_id", columns="mapel_id", values="nilai_akhir")
+    tabel.columns = [katalog.label("mapel", m) for m in tabel.columns]
+    urutan = hasil["peringkat"]
+    urutan = urutan[(urutan["semester_id"] == semester_id) & (urutan["kelas_id"] == kelas_id)].set_index("siswa_id")
+    tabel.insert(0, "Nama", siswa["nama"])
+    tabel.insert(0, "NISN", siswa["nisn"])
+    tabel["Rata-rata"] = urutan["rata"]
+    tabel["Peringkat"] = urutan["peringkat"]
+    tabel = tabel.sort_values(["Peringkat", "Nama"])
+    st.dataframe(tabel, use_container_width=True, hide_index=True)
+    belum_lengkap = int((rapor_kelas["tahap_kurang"] > 0).sum())
+    if belum_lengkap:
+        st.caption(f"{belum_lengkap} nilai akhir di kelas ini dihitung dari tahap yang belum lengkap.")
+    st.download_button("Unduh CSV", tabel.to_csv(index=False).encode("utf-8"),
+                       file_name=f"rapor_{pilihan[1]}_{kelas[1]}.csv".replace(" ", "").replace("/", "-"),
+                       mime="text/csv")
+
+    st.subheader("Cetak Rapor PDF")
+    bentuk = st.radio("Bentuk", ["Satu PDF per siswa", "Satu PDF per kelas"], horizontal=True, key="rapor_cetak_bentuk")
+    semua_kelas = st.checkbox("Semua kelas", value=False, key="rapor_cetak_semua",
+                              help=f"Jika tidak dicentang, hanya kelas {kelas[1]}")
+    if st.button("Buat ZIP Rapor", key="rapor_cetak"):
+        cetak_rapor.bersihkan()
+        lama = st.session_state.pop("rapor_zip", None)
+        if lama and os.path.exists(lama[1]):
+            os.remove(lama[1])
+        tujuan = os.path.join(cetak_rapor.folder(), f"rapor_{semester_id}_{time.strftime('%Y%m%d-%H%M%S')}.zip")
+        bar = st.progress(0.0, text="Menyiapkan data rapor...")
+        try:
+            ringkasan = cetak_rapor.cetak(
+                hasil, semester_id, tujuan, per_kelas=bentuk == "Satu PDF per kelas",
+                kelas_ids=None if semua_kelas else [kelas_id],
+                progres=lambda selesai, total: bar.progress(selesai / total, text=f"{selesai}/{total} siswa"))
+            st.session_state.rapor_zip = (semester_id, tujuan, ringkasan)
+        except Exception as e:
+            st.error(f"Gagal mencetak rapor: {e}")
+
+    dibuat = st.session_state.get("rapor_zip")
+    if dibuat and dibuat[0] == semester_id and os.path.exists(dibuat[1]):
+        ringkasan = dibuat[2]
+        st.caption(f"{ringkasan['berkas']} PDF untuk {ringkasan['siswa']} siswa di {ringkasan['kelas']} kelas, "
+                   f"{ringkasan['ukuran'] / 1024 / 1024:.1f} MB, selesai dalam {sum(ringkasan['waktu'].values()):.1f} detik "
+                   f"dengan {ringkasan['proses']} proses.")
+        st.download_button("Unduh ZIP Rapor", cetak_rapor.pembaca(dibuat[1]),
+                           file_name=f"rapor_{pilihan[1]}.zip".replace(" ", "").replace("/", "-"), mime="application/zip")
+
+    st.subheader("Leger Nilai (Excel)")
+    st.caption("Satu sheet per kelas: nilai setiap mapel per tahap, nilai akhir, rata-rata, dan peringkat.")
+    leger_semua = st.checkbox("Semua kelas", value=False, key="rapor_leger_semua",
+                              help=f"Jika tidak dicentang, hanya kelas {kelas[1]}")
+    if st.button("Buat Leger Excel", key="rapor_leger"):
+        cetak_rapor.bersihkan()
+        lama = st.session_state.pop("rapor_leger_berkas", None)
+        if lama and os.path.exists(lama[1]):
+            os.remove(lama[1])
+        tujuan = os.path.join(cetak_rapor.folder(), f"leger_{semester_id}_{time.strftime('%Y%m%d-%H%M%S')}.xlsx")
+        try:
+            with st.spinner("Menyusun leger..."):
+                ringkasan = leger.buat(semester_id, tujuan, None if leger_semua else [kelas_id])
+            st.session_state.rapor_leger_berkas = (semester_id, tujuan, ringkasan)
+        except Exception as e:
+            st.error(f"Gagal membuat leger: {e}")
+
+    dibuat = st.session_state.get("rapor_leger_berkas")
+    if dibuat and dibuat[0] == semester_id and os.path.exists(dibuat[1]):
+        ringkasan = dibuat[2]
+        st.caption(f"{ringkasan['siswa']} siswa di {ringkasan['kelas']} kelas, {ringkasan['ukuran'] / 1024 / 1024:.1f} MB, "
+                   f"selesai dalam {sum(ringkasan['waktu'].values()):.1f} detik.")
+        st.download_button("Unduh Leger", cetak_rapor.pembaca(dibuat[1]),
+                           file_name=f"leger_{pilihan[1]}.xlsx".replace(" ", "").replace("/", "-"),
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    st.subheader("Ekspor Nilai Lengkap (CSV)")
+    st.caption("Semua nilai beserta NISN, nama siswa, kelas, mapel, semester, tahap, dan guru penginput, "
+               "termasuk semester yang sudah diarsipkan.")
+    cakupan = st.radio("Cakupan", ["Semester ini", "Semua semester"], horizontal=True, key="rapor_ekspor_cakupan")
+    kompres = st.checkbox("Kompres gzip (.csv.gz)", value=True, key="rapor_ekspor_gzip")
+    if st.button("Buat Ekspor CSV", key="rapor_ekspor"):
+        cetak_rapor.bersihkan()
+        lama = st.session_state.pop("rapor_ekspor_berkas", None)
+        if lama and os.path.exists(lama[1]):
+            os.remove(lama[1])
+        nama = f"nilai_{semester_id if cakupan == 'Semester ini' else 'semua'}_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+        tujuan = os.path.join(cetak_rapor.folder(), nama + (".gz" if kompres else ""))
+        bar = st.progress(0.0, text="Menghitung jumlah nilai...")
+        try:
+            ringkasan = ekspor_nilai.tulis(
+                tujuan, [semester_id] if cakupan == "Semester ini" else None, kompres=kompres,
+                progres=lambda baris, total: bar.progress(min(baris / total, 1.0) if total else 1.0,
+                                                          text=f"{baris:,}/{total:,} nilai".replace(",", ".")))
+            st.session_state.rapor_ekspor_berkas = (semester_id, tujuan, ringkasan)
+        except Exception as e:
+            st.error(f"Gagal mengekspor nilai: {e}")
+
+    dibuat = st.session_state.get("rapor_ekspor_berkas")
+    if dibuat and dibuat[0] == semester_id and os.path.exists(dibuat[1]):
+        ringkasan = dibuat[2]
+        baris, laju = (f"{x:,.0f}".replace(",", ".") for x in (ringkasan["baris"], ringkasan["baris_per_detik"]))
+        st.caption(f"{baris} nilai, {ringkasan['ukuran'] / 1024 / 1024:.1f} MB, selesai dalam "
+                   f"{ringkasan['detik']:.1f} detik ({laju} baris/detik).")
+        st.download_button("Unduh Ekspor Nilai", cetak_rapor.pembaca(dibuat[1]), file_name=os.path.basename(dibuat[1]),
+                           mime="application/gzip" if dibuat[1].endswith(".gz") else "text/csv")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Menghitung rapor (nilai akhir, predikat, statistik kelas).")
+    parser.add_argument("--db", default=db.DB_PATH)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--semester", type=int, nargs="+", metavar="ID", help="Id semester")
+    target.add_argument("--tahun", metavar="TH_AJAR", help="Semua semester satu tahun ajaran, misal 2025/2026")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan.")
+    # Belum ada koneksi yang dibuka, jadi path database masih bisa diganti di sini
+    db.DB_PATH = args.db
+
+    semester_ids = args.semester
+    if args.tahun:
+        conn = db.get_read_connection()
+        try:
+            semester_ids = [row[0] for row in conn.execute(
+                "SELECT s.id FROM semester s JOIN tahun_ajaran ta ON ta.id = s.th_ajar_id WHERE ta.th_ajar = ? ORDER BY s.id",
+                (args.tahun,))]
+        finally:
+            conn.close()
+        if not semester_ids:
+            parser.error(f"Tahun ajaran {args.tahun} tidak ditemukan.")
+
+    hasil = hitung_rapor(semester_ids)
+    rapor, waktu = hasil["rapor"], hasil["waktu"]
+    print(f"Semester {', '.join(map(str, semester_ids))}: {hasil['jumlah_nilai']} nilai -> {len(rapor)} nilai akhir "
+          f"({rapor['siswa_id'].nunique()} siswa, {rapor['mapel_id'].nunique()} mapel)")
+    print("  " + "   ".join(f"{k} {v:.2f} s" for k, v in waktu.items()) + f"   total {sum(waktu.values()):.2f} s")
+    if len(rapor):
+        sebaran = rapor["predikat"].value_counts()
+        print(f"  rata-rata {rapor['nilai_akhir'].mean():.2f}   predikat "
+              + " ".join(f"{p}:{sebaran.get(p, 0)}" for _, p in BATAS_PREDIKAT)
+              + f"   belum lengkap {int((rapor['tahap_kurang'] > 0).sum())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,15 @@
 import streamlit as st
 import pandas as pd
-from db import get_connection, init_db
+from db import get_read_connection
+import arsip
+import katalog
 import sqlite3
+import writer
+
+def aktifkan_semester(conn, semester_id):
+    """Fungsi tulis (lihat writer.py): hanya satu semester yang aktif."""
+    conn.execute("UPDATE semester SET aktif = 0 WHERE aktif = 1")
+    conn.execute("UPDATE semester SET aktif = 1 WHERE id = ?", (semester_id,))
 
 def show_semester():
     # Pastikan user adalah admin
@@ -13,42 +21,24 @@ def show_semester():
         return
 
     st.title("📅 Manajemen Semester")
-    init_db() 
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    # Fungsi untuk memuat data
-    def load_data_tahun_ajaran():
-        cursor.execute("SELECT id, th_ajar FROM tahun_ajaran ORDER BY th_ajar DESC")
-        return cursor.fetchall()
-
-    def load_data_semester_pil():
-        cursor.execute("SELECT id, sm_pil FROM semester_pil ORDER BY id ASC") # Ganjil, Genap
-        return cursor.fetchall()
-
-    def load_data_semester_lengkap():
-        # Pastikan query ini menggunakan nama kolom yang benar dari tabel semester
-        # yaitu 'nama_semester' bukan 'nama'
-        cursor.execute("""
-            SELECT s.id, ta.th_ajar, sp.sm_pil, s.nama_semester, s.aktif
-            FROM semester s
-            JOIN tahun_ajaran ta ON s.th_ajar_id = ta.id
-            JOIN semester_pil sp ON s.sm_pil_id = sp.id
-            ORDER BY ta.th_ajar DESC, sp.id ASC
-        """)
-        return cursor.fetchall()
-
     # --- Menampilkan Daftar Semester ---
     st.subheader("Daftar Semester Tersedia")
-    data_semester_lengkap = load_data_semester_lengkap()
+    # Data semester, tahun ajaran, dan pilihan semester diambil dari katalog
+    data_semester_lengkap = katalog.ambil("semester")
 
     if data_semester_lengkap:
-        # Kolom yang diambil dari query adalah 'nama_semester'
-        df_semester = pd.DataFrame(data_semester_lengkap, columns=["ID", "Tahun Ajaran", "Semester Pilihan", "Nama Semester", "Aktif"])
+        df_semester = pd.DataFrame(
+            [(s['id'], s['th_ajar'], s['sm_pil'], s['nama_semester'], s['aktif'], s['berkas_arsip']) for s in data_semester_lengkap],
+            columns=["ID", "Tahun Ajaran", "Semester Pilihan", "Nama Semester", "Aktif", "Arsip"]
+        )
         df_semester["Aktif"] = df_semester["Aktif"].apply(lambda x: "✅ Aktif" if x else "Tidak Aktif")
+        df_semester["Arsip"] = df_semester["Arsip"].fillna("-")
         # Menampilkan kolom yang relevan, termasuk 'Nama Semester'
-        st.dataframe(df_semester[["ID", "Nama Semester", "Aktif"]], use_container_width=True, hide_index=True)
+        st.dataframe(df_semester[["ID", "Nama Semester", "Aktif", "Arsip"]], use_container_width=True, hide_index=True)
     else:
         st.info("Belum ada data semester yang ditambahkan.")
 
@@ -57,8 +47,8 @@ def show_semester():
     # --- Form Tambah Semester Baru ---
     st.subheader("➕ Tambah Semester Baru")
     
-    tahun_ajaran_list = load_data_tahun_ajaran()
-    semester_pil_list = load_data_semester_pil()
+    tahun_ajaran_list = katalog.ambil("tahun_ajaran")
+    semester_pil_list = katalog.ambil("semester_pil")
 
     if not tahun_ajaran_list:
         st.warning("Data Tahun Ajaran belum ada. Silakan tambahkan melalui menu 'Manajemen Tahun Ajaran' terlebih dahulu.")
@@ -97,11 +87,11 @@ def show_semester():
                 nama_semester_otomatis = f"{sm_pil_nama} {th_ajar_nama}"
 
                 try:
-                    cursor.execute(
+                    writer.eksekusi(
                         "INSERT INTO semester (th_ajar_id, sm_pil_id, nama_semester, aktif) VALUES (?, ?, ?, ?)",
                         (th_ajar_id, sm_pil_id, nama_semester_otomatis, 0) # Default tidak aktif
                     )
-                    conn.commit()
+                    katalog.invalidate("semester")
                     st.success(f"Semester '{nama_semester_otomatis}' berhasil ditambahkan.")
                     st.rerun()
                 except sqlite3.IntegrityError:
@@ -132,17 +122,19 @@ def show_semester():
             if selected_semester_detail:
                 # Menampilkan 'nama_semester'
                 st.write(f"Detail: **{selected_semester_detail['nama_semester']}** (Status: {'Aktif' if selected_semester_detail['aktif'] else 'Tidak Aktif'})")
+                if selected_semester_detail['berkas_arsip']:
+                    st.caption(f"Nilai dan penugasan semester ini tersimpan di berkas arsip `{selected_semester_detail['berkas_arsip']}` dan hanya bisa dilihat.")
 
-                col1_manage, col2_manage = st.columns(2)
+                col1_manage, col2_manage, col3_manage = st.columns(3)
                 with col1_manage:
-                    if not selected_semester_detail['aktif']:
+                    if selected_semester_detail['berkas_arsip']:
+                        st.info("Kembalikan dari arsip sebelum mengaktifkan semester ini.")
+                    elif not selected_semester_detail['aktif']:
                         if st.button("✅ Jadikan Aktif", key=f"aktifkan_{semester_id_to_manage}"):
                             try:
-                                # Nonaktifkan semua semester lain dulu
-                                cursor.execute("UPDATE semester SET aktif = 0 WHERE aktif = 1")
-                                # Aktifkan semester yang dipilih
-                                cursor.execute("UPDATE semester SET aktif = 1 WHERE id = ?", (semester_id_to_manage,))
-                                conn.commit()
+                                # Nonaktifkan semua semester lain lalu aktifkan yang dipilih, dalam satu transaksi
+                                writer.tulis(aktifkan_semester, semester_id_to_manage)
+                                katalog.invalidate("semester")
                                 st.success(f"Semester '{selected_semester_detail['nama_semester']}' berhasil diaktifkan.")
                                 st.rerun()
                             except Exception as e:
@@ -151,6 +143,29 @@ def show_semester():
                         st.success("Semester ini sudah aktif.")
                 
                 with col2_manage:
+                    if selected_semester_detail['berkas_arsip']:
+                        if st.button("♻️ Kembalikan dari Arsip", key=f"kembalikan_{semester_id_to_manage}"):
+                            try:
+                                with st.spinner("Mengembalikan nilai dari arsip..."):
+                                    jumlah = arsip.kembalikan(semester_id_to_manage, log=None)
+                                katalog.invalidate("semester", "penugasan")
+                                st.success(f"{jumlah} nilai semester '{selected_semester_detail['nama_semester']}' dikembalikan dari arsip.")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Gagal mengembalikan semester dari arsip: {e}")
+                    elif not selected_semester_detail['aktif']:
+                        if st.button("📦 Arsipkan Semester", key=f"arsipkan_{semester_id_to_manage}",
+                                     help="Pindahkan nilai dan penugasan semester ini ke berkas arsip tahun ajarannya."):
+                            try:
+                                with st.spinner("Memindahkan nilai ke arsip..."):
+                                    jumlah = arsip.arsipkan(semester_id_to_manage, log=None)
+                                katalog.invalidate("semester", "penugasan")
+                                st.success(f"{jumlah} nilai semester '{selected_semester_detail['nama_semester']}' dipindahkan ke arsip.")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Gagal mengarsipkan semester: {e}")
+
+                with col3_manage:
                     if st.button("🗑️ Hapus Semester Ini", key=f"hapus_{semester_id_to_manage}", type="secondary"):
                         st.session_state.confirm_delete_semester_id = semester_id_to_manage
                         st.session_state.confirm_delete_semester_nama = selected_semester_detail['nama_semester']
@@ -168,15 +183,12 @@ def show_semester():
             if st.button("Ya, Hapus Semester Beserta Semua Data Terkait", type="primary"):
                 try:
                     sem_id_to_del = st.session_state.confirm_delete_semester_id
-                    
-                    # Hapus data terkait dari tabel lain terlebih dahulu
-                    cursor.execute("DELETE FROM nilai WHERE semester_id = ?", (sem_id_to_del,))
-                    cursor.execute("DELETE FROM guru_mapel_kelas WHERE semester_id = ?", (sem_id_to_del,))
-                    cursor.execute("DELETE FROM mapel_semester_config WHERE semester_id = ?", (sem_id_to_del,))
-                    
-                    # Hapus semester itu sendiri
-                    cursor.execute("DELETE FROM semester WHERE id = ?", (sem_id_to_del,))
-                    conn.commit()
+                    berkas_arsip = cursor.execute("SELECT berkas_arsip FROM semester WHERE id = ?", (sem_id_to_del,)).fetchone()[0]
+                    # Nilai, penugasan, dan konfigurasi mapel semester ini ikut terhapus (ON DELETE CASCADE)
+                    writer.eksekusi("DELETE FROM semester WHERE id = ?", (sem_id_to_del,))
+                    if berkas_arsip:
+                        arsip.hapus_dari_arsip(berkas_arsip, sem_id_to_del)
+                    katalog.invalidate("semester", "penugasan", "mapel_semester_config")
                     st.success(f"Semester '{st.session_state.confirm_delete_semester_nama}' dan semua data terkaitnya berhasil dihapus.")
                     
                     del st.session_state.confirm_delete_semester_id
@@ -1,5 +1,17 @@
+import importlib.machinery
+
 import streamlit as st
 
+# Proses pekerja multiprocessing "spawn" (lihat cetak_rapor.py) menjalankan ulang modul
+# __main__ kecuali __spec__-nya bernama "__main__". Saat dijalankan Streamlit, skrip inilah
+# __main__-nya; tanpa baris ini setiap pekerja ikut menjalankan seluruh aplikasi.
+__spec__ = importlib.machinery.ModuleSpec("__main__", None)
+
+from db import init_db
+import tracer
+import profiler
+import backup
+
 # Impor modul-modul yang sudah ada dan yang baru
 from dashboard import show_dashboard
 from login import show_login
@@ -12,7 +24,14 @@ from matapelajaran import show_matapelajaran
 from guru import show_guru
 from siswa import show_siswa
 from nilai import show_nilai
+from rapor import show_rapor
+
 
+# Migrasi skema hanya benar-benar berjalan pada rerun pertama di proses ini;
+# rerun berikutnya langsung kembali tanpa query DDL.
+init_db()
+# Backup berkala di thread latar jika SINFOMIK_BACKUP_INTERVAL_MENIT diisi (lihat backup.py)
+backup.mulai_terjadwal()
 
 # Inisialisasi session state dasar jika belum ada
 if "page" not in st.session_state:
@@ -62,6 +81,9 @@ if st.session_state.get("logged_in", False):
         nav_button("Mata Pelajaran", "matapelajaran", icon="📖")
         nav_button("Guru & Penugasan", "guru", icon="🧑‍🏫")
         nav_button("Manajemen Siswa", "siswa", icon="👨‍🎓")
+        nav_button("Rapor & Statistik", "rapor", icon="📊")
+        # Rincian waktu per rerun di bawah halaman, lihat profiler.py
+        st.sidebar.toggle("⏱️ Mode Profiling", key="profiler_aktif")
         # Admin mungkin tidak langsung input nilai, tapi bisa melihat halaman nilai jika diperlukan
         # nav_button("Lihat Nilai (Admin View)", "nilai_admin_view", icon="📝") 
         # Untuk saat ini, halaman nilai utama difokuskan untuk guru.
@@ -85,66 +107,77 @@ st.sidebar.info("© 2024 SINFOMIK App")
 
 
 # --- Routing Halaman Utama ---
-page_to_display = st.session_state.page
-
-if page_to_display == "login":
-    show_login()
-elif page_to_display == "logout":
-    if st.session_state.logged_in: # Hanya tampilkan jika benar-benar login
-        show_logout()
-    else: # Jika mencoba akses logout tanpa login, redirect ke login
-        st.warning("Anda belum login.")
-        st.session_state.page = "login"
-        st.rerun()
-else: # Halaman yang memerlukan atau tidak memerlukan login
-    if page_to_display == "dashboard":
-        show_dashboard()
-    
-    # Halaman yang memerlukan login
-    elif not st.session_state.get("logged_in", False):
-        st.warning("Sesi Anda telah berakhir atau Anda belum login. Silakan login terlebih dahulu.")
-        # Tombol untuk kembali ke login jika sesi habis di tengah jalan
-        if st.button("Ke Halaman Login"):
+def tampilkan_halaman(page_to_display):
+    if page_to_display == "login":
+        show_login()
+    elif page_to_display == "logout":
+        if st.session_state.logged_in: # Hanya tampilkan jika benar-benar login
+            show_logout()
+        else: # Jika mencoba akses logout tanpa login, redirect ke login
+            st.warning("Anda belum login.")
             st.session_state.page = "login"
             st.rerun()
+    else: # Halaman yang memerlukan atau tidak memerlukan login
+        if page_to_display == "dashboard":
+            show_dashboard()
     
-    # Halaman setelah login
-    else:
-        current_role = st.session_state.get("role")
-        if page_to_display == "tahun_ajaran":
-            if current_role == "admin": show_tahun_ajaran()
-            else: st.error("Akses ditolak. Hanya admin.")
+        # Halaman yang memerlukan login
+        elif not st.session_state.get("logged_in", False):
+            st.warning("Sesi Anda telah berakhir atau Anda belum login. Silakan login terlebih dahulu.")
+            # Tombol untuk kembali ke login jika sesi habis di tengah jalan
+            if st.button("Ke Halaman Login"):
+                st.session_state.page = "login"
+                st.rerun()
+    
+        # Halaman setelah login
+        else:
+            current_role = st.session_state.get("role")
+            if page_to_display == "tahun_ajaran":
+                if current_role == "admin": show_tahun_ajaran()
+                else: st.error("Akses ditolak. Hanya admin.")
         
-        elif page_to_display == "semester":
-            if current_role == "admin": show_semester()
-            else: st.error("Akses ditolak. Hanya admin.")
+            elif page_to_display == "semester":
+                if current_role == "admin": show_semester()
+                else: st.error("Akses ditolak. Hanya admin.")
 
-        elif page_to_display == "kelas":
-            if current_role == "admin": show_kelas()
-            else: st.error("Akses ditolak. Hanya admin.")
+            elif page_to_display == "kelas":
+                if current_role == "admin": show_kelas()
+                else: st.error("Akses ditolak. Hanya admin.")
 
-        elif page_to_display == "matapelajaran":
-            if current_role == "admin": show_matapelajaran()
-            else: st.error("Akses ditolak. Hanya admin.")
+            elif page_to_display == "matapelajaran":
+                if current_role == "admin": show_matapelajaran()
+                else: st.error("Akses ditolak. Hanya admin.")
 
-        elif page_to_display == "guru":
-            if current_role == "admin": show_guru()
-            else: st.error("Akses ditolak. Hanya admin.")
+            elif page_to_display == "guru":
+                if current_role == "admin": show_guru()
+                else: st.error("Akses ditolak. Hanya admin.")
             
-        elif page_to_display == "siswa":
-            # Modul siswa sekarang hanya untuk admin berdasarkan perubahan terakhir kita
-            if current_role == "admin": show_siswa()
-            else: st.error("Akses ditolak. Hanya admin.")
+            elif page_to_display == "siswa":
+                # Modul siswa sekarang hanya untuk admin berdasarkan perubahan terakhir kita
+                if current_role == "admin": show_siswa()
+                else: st.error("Akses ditolak. Hanya admin.")
+
+            elif page_to_display == "rapor":
+                if current_role == "admin": show_rapor()
+                else: st.error("Akses ditolak. Hanya admin.")
         
-        elif page_to_display == "nilai":
-            if current_role == "guru": show_nilai()
-            # elif current_role == "admin": # Jika admin juga boleh lihat (tampilan read-only mungkin)
-                # show_nilai_admin_view() # Perlu fungsi terpisah
-            else: st.error("Akses ditolak. Hanya guru yang dapat mengakses input nilai.")
+            elif page_to_display == "nilai":
+                if current_role == "guru": show_nilai()
+                # elif current_role == "admin": # Jika admin juga boleh lihat (tampilan read-only mungkin)
+                    # show_nilai_admin_view() # Perlu fungsi terpisah
+                else: st.error("Akses ditolak. Hanya guru yang dapat mengakses input nilai.")
         
-        else:
-            # Jika halaman tidak dikenal setelah login, kembali ke dashboard
-            st.warning(f"Halaman '{page_to_display}' tidak ditemukan. Mengarahkan ke Beranda.")
-            st.session_state.page = "dashboard"
-            st.rerun()
+            else:
+                # Jika halaman tidak dikenal setelah login, kembali ke dashboard
+                st.warning(f"Halaman '{page_to_display}' tidak ditemukan. Mengarahkan ke Beranda.")
+                st.session_state.page = "dashboard"
+                st.rerun()
+
 
+page_to_display = st.session_state.page
+# Semua query selama halaman dirender dicatat sebagai satu rerun (lihat tracer.py),
+# dan bila admin menyalakan mode profiling, waktunya dirinci per span (lihat profiler.py)
+with tracer.rerun(page_to_display), profiler.rerun(page_to_display, profiler.diizinkan()) as profil:
+    with profiler.span(f"halaman {page_to_display}"):
+        tampilkan_halaman(page_to_display)
+profiler.tampilkan_panel(profil)
@@ -1,8 +1,14 @@
 import streamlit as st
-from db import get_connection, init_db
+from db import get_read_connection
+import queries
+import cache_query
+import katalog
+import impor_siswa
+import profiler
 import math
 import pandas as pd
 import sqlite3
+import writer
 
 def show_siswa():
     # Pastikan user adalah admin
@@ -14,18 +20,14 @@ def show_siswa():
         return
 
     st.title("👨‍🎓 Manajemen Data Siswa")
-    init_db()
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    # Fungsi untuk memuat data kelas
-    def load_kelas_options():
-        cursor.execute("SELECT id, tingkat || ' - ' || nama_kelas as nama_lengkap_kelas FROM kelas ORDER BY tingkat, nama_kelas ASC")
-        return cursor.fetchall()
-
-    kelas_options_list = load_kelas_options()
+    # Pilihan kelas dari katalog (label "10 - A")
+    kelas_options_list = katalog.opsi("kelas")
     
+    profiler.fase("form tambah siswa", "render")
     # --- Form to Add New Student ---
     st.subheader("➕ Tambah Siswa Baru")
     with st.form(key='add_siswa_form', clear_on_submit=True):
@@ -35,7 +37,7 @@ def show_siswa():
         # Pilihan Kelas untuk siswa baru
         selected_kelas_id_add = None
         if kelas_options_list:
-            kelas_choices_add = [("", "Pilih Kelas...")] + [(k['id'], k['nama_lengkap_kelas']) for k in kelas_options_list]
+            kelas_choices_add = [("", "Pilih Kelas...")] + kelas_options_list
             selected_kelas_id_add_tuple = st.selectbox("Pilih Kelas untuk Siswa Baru", 
                                                        options=kelas_choices_add, 
                                                        format_func=lambda x: x[1], 
@@ -50,9 +52,8 @@ def show_siswa():
         if submit_button:
             if nisn and nama:
                 try:
-                    cursor.execute("INSERT INTO siswa (nisn, nama, kelas_id) VALUES (?, ?, ?)", 
-                                   (nisn, nama, selected_kelas_id_add))
-                    conn.commit()
+                    writer.eksekusi("INSERT INTO siswa (nisn, nama, kelas_id) VALUES (?, ?, ?)", 
+                                    (nisn, nama, selected_kelas_id_add))
                     st.success(f"Siswa '{nama}' (NISN: {nisn}) berhasil ditambahkan.")
                     st.rerun() 
                 except sqlite3.IntegrityError as e:
@@ -65,6 +66,54 @@ def show_siswa():
             else:
                 st.warning("Mohon isi NISN dan Nama Lengkap Siswa.")
 
+    profiler.fase("impor siswa", "render")
+    # --- Impor Siswa Massal ---
+    with st.expander("📥 Impor Siswa dari CSV/XLSX"):
+        st.caption("Baris pertama berisi kepala kolom NISN, Nama, dan Kelas (opsional, misalnya \"10 - A\"). "
+                   "Baris yang bermasalah dilaporkan dan dilewati; baris lain tetap diimpor.")
+        st.download_button("Unduh contoh format (CSV)", "NISN,Nama,Kelas\n0012345678,Budi Santoso,10 - A\n",
+                           file_name="contoh_impor_siswa.csv", mime="text/csv", key="impor_siswa_contoh")
+        berkas = st.file_uploader("Berkas siswa", type=["csv", "xlsx"], key="impor_siswa_berkas")
+        col_uji, col_impor = st.columns(2)
+        with col_uji:
+            tombol_uji = st.button("Periksa Saja (uji coba)", key="impor_siswa_uji", disabled=berkas is None)
+        with col_impor:
+            tombol_impor = st.button("Impor Siswa", key="impor_siswa_simpan", type="primary", disabled=berkas is None)
+
+        if berkas is not None and (tombol_uji or tombol_impor):
+            berkas.seek(0)
+            try:
+                with st.spinner("Memeriksa berkas..." if tombol_uji else "Mengimpor siswa..."):
+                    ringkasan = impor_siswa.impor(berkas, berkas.name, uji=tombol_uji)
+                st.session_state.impor_siswa_hasil = (berkas.name, ringkasan)
+            except Exception as e:
+                st.session_state.pop("impor_siswa_hasil", None)
+                st.error(f"Gagal membaca berkas: {e}")
+
+        dibuat = st.session_state.get("impor_siswa_hasil")
+        if dibuat and berkas is not None and dibuat[0] == berkas.name:
+            ringkasan = dibuat[1]
+            status = "lolos pemeriksaan dan siap diimpor" if ringkasan["uji"] else "berhasil ditambahkan"
+            if ringkasan["gagal"] and ringkasan["uji"]:
+                st.error(f"Pemeriksaan berhenti di tengah jalan ({ringkasan['gagal']}). "
+                         f"{ringkasan['tidak_disimpan']} baris belum diperiksa terhadap database; coba periksa lagi.")
+            elif ringkasan["gagal"]:
+                st.error(f"Impor berhenti di tengah jalan ({ringkasan['gagal']}). {ringkasan['berhasil']} siswa SUDAH "
+                         f"tersimpan; {ringkasan['tidak_disimpan']} baris valid belum disimpan (\"Belum disimpan\" "
+                         "di tabel). Impor ulang berkas yang sama untuk melanjutkan; siswa yang sudah tersimpan "
+                         "akan dilaporkan sebagai NISN terdaftar.")
+            pesan = (f"{ringkasan['berhasil']} dari {ringkasan['baris']} siswa {status} "
+                     f"({ringkasan['detik']:.1f} detik).")
+            if ringkasan["galat"]:
+                st.warning(pesan + f" {len(ringkasan['galat'])} baris bermasalah:")
+                df_galat = pd.DataFrame(ringkasan["galat"], columns=["Baris", "NISN", "Masalah"])
+                df_galat["NISN"] = df_galat["NISN"].astype(str)
+                st.dataframe(df_galat, hide_index=True, use_container_width=True)
+                st.download_button("Unduh laporan galat (CSV)", df_galat.to_csv(index=False).encode("utf-8"),
+                                   file_name="galat_impor_siswa.csv", mime="text/csv", key="impor_siswa_galat")
+            else:
+                st.success(pesan)
+
     st.divider()
 
     # --- Pencarian Siswa ---
@@ -81,65 +130,89 @@ def show_siswa():
         st.session_state.edit_siswa_id = None
         st.session_state.is_editing_siswa = False
 
+    # Kembali ke halaman pertama setiap kali kata kunci pencarian berubah
+    if st.session_state.get("siswa_cari_aktif") != search_term:
+        st.session_state.siswa_cari_aktif = search_term
+        st.session_state.siswa_kursor = [None]
+    kursor_halaman = st.session_state.siswa_kursor
+
     try:
-        # Query untuk mengambil data siswa beserta nama kelasnya
-        query_siswa = """
-            SELECT s.id, s.nisn, s.nama, s.kelas_id, k.tingkat || ' - ' || k.nama_kelas as nama_kelas 
-            FROM siswa s
-            LEFT JOIN kelas k ON s.kelas_id = k.id
-        """
-        params_siswa = []
-        if search_term:
-            query_siswa += " WHERE s.nisn LIKE ? OR s.nama LIKE ?"
-            params_siswa.extend([f"%{search_term}%", f"%{search_term}%"])
-        
-        query_siswa += " ORDER BY s.nama ASC" # Atau s.id, s.nisn
-        
-        cursor.execute(query_siswa, tuple(params_siswa))
-        siswa_list = cursor.fetchall()
+        profiler.fase("daftar siswa: query", "db")
+        # Hanya satu halaman yang diambil dari database, berapa pun jumlah siswanya
+        sql_jumlah, params_jumlah = queries.siswa_jumlah(search_term)
+        total_siswa = cache_query.ambil(cursor, sql_jumlah, params_jumlah)[0][0]
+        # Pencarian nama yang sangat luas tidak diurutkan menurut relevansi (lihat queries)
+        berperingkat = total_siswa <= queries.SISWA_CARI_PERINGKAT_MAKS
+        sql_halaman, params_halaman = queries.siswa_halaman(
+            search_term, kursor_halaman[-1], queries.SISWA_PER_HALAMAN + 1, berperingkat=berperingkat
+        )
+        siswa_list = cache_query.ambil(cursor, sql_halaman, params_halaman)
+        ada_berikutnya = len(siswa_list) > queries.SISWA_PER_HALAMAN
+        siswa_list = siswa_list[:queries.SISWA_PER_HALAMAN]
 
+        profiler.fase("daftar siswa: DataFrame", "data")
         if siswa_list:
-            # Menggunakan Pandas DataFrame untuk tampilan yang lebih baik dan interaktif
             df_siswa = pd.DataFrame(siswa_list, columns=["ID", "NISN", "Nama Siswa", "Kelas ID", "Kelas"])
-            
-            # Kolom aksi (Edit dan Hapus)
-            # Kita akan membuat kolom ini secara manual di loop karena st.dataframe tidak mendukung tombol secara langsung
-            
-            st.write(f"Total siswa ditemukan: {len(df_siswa)}")
-
-            # Header tabel manual
-            cols_header = st.columns([1, 2, 3, 2, 1, 1]) # Sesuaikan rasio kolom
-            with cols_header[0]: st.markdown("**ID**")
-            with cols_header[1]: st.markdown("**NISN**")
-            with cols_header[2]: st.markdown("**Nama Siswa**")
-            with cols_header[3]: st.markdown("**Kelas**")
-            with cols_header[4]: st.markdown("**Edit**")
-            with cols_header[5]: st.markdown("**Hapus**")
-
-            for index, siswa_row in df_siswa.iterrows():
-                cols_data = st.columns([1, 2, 3, 2, 1, 1])
-                with cols_data[0]: st.write(siswa_row['ID'])
-                with cols_data[1]: st.write(f"{siswa_row['NISN']:010d}" if siswa_row['NISN'] else "-")
-                with cols_data[2]: st.write(siswa_row['Nama Siswa'])
-                with cols_data[3]: st.write(siswa_row['Kelas'] if siswa_row['Kelas'] else "Belum ada kelas")
-                
-                with cols_data[4]: # Tombol Edit
-                    if st.button("✏️", key=f"edit_siswa_{siswa_row['ID']}", help="Edit Siswa"):
-                        st.session_state.edit_siswa_id = siswa_row['ID']
-                        st.session_state.edit_nisn = siswa_row['NISN']
+            df_tampil = df_siswa[["ID", "NISN", "Nama Siswa", "Kelas"]].copy()
+            df_tampil["NISN"] = df_tampil["NISN"].map(lambda x: f"{x:010d}" if x else "-")
+            df_tampil["Kelas"] = df_tampil["Kelas"].fillna("Belum ada kelas")
+
+            st.write(f"Total siswa ditemukan: {total_siswa}")
+            if not berperingkat and search_term.strip() and not search_term.strip().isdigit():
+                st.caption("Hasil terlalu banyak untuk diurutkan menurut kecocokan. Ketik nama yang lebih lengkap untuk hasil yang lebih tepat.")
+            st.caption("Klik satu baris untuk memilih siswa yang akan diedit atau dihapus.")
+
+            profiler.fase("daftar siswa: tabel", "render")
+            # Satu tabel untuk seluruh halaman (bukan widget per baris); key ikut nomor halaman
+            # agar pilihan baris tidak terbawa ke halaman lain
+            event_tabel = st.dataframe(
+                df_tampil,
+                hide_index=True,
+                use_container_width=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key=f"tabel_siswa_{len(kursor_halaman)}",
+                column_config={"ID": st.column_config.NumberColumn(width="small")},
+            )
+
+            jumlah_halaman = max(1, math.ceil(total_siswa / queries.SISWA_PER_HALAMAN))
+            col_sebelum, col_info, col_berikut = st.columns([1, 2, 1])
+            with col_sebelum:
+                if st.button("⬅️ Sebelumnya", disabled=len(kursor_halaman) == 1, key="siswa_sebelumnya"):
+                    kursor_halaman.pop()
+                    st.rerun()
+            with col_info:
+                st.caption(f"Halaman {len(kursor_halaman)} dari {jumlah_halaman}")
+            with col_berikut:
+                if st.button("Berikutnya ➡️", disabled=not ada_berikutnya, key="siswa_berikutnya"):
+                    if search_term.strip():
+                        # Hasil pencarian berhalaman dengan offset
+                        kursor_halaman.append((kursor_halaman[-1] or 0) + queries.SISWA_PER_HALAMAN)
+                    else:
+                        terakhir = siswa_list[-1]
+                        kursor_halaman.append((terakhir['nama'], terakhir['id']))
+                    st.rerun()
+
+            baris_terpilih = event_tabel.selection.rows
+            if baris_terpilih:
+                siswa_row = df_siswa.iloc[baris_terpilih[0]]
+                st.write(f"Siswa terpilih: **{siswa_row['Nama Siswa']}** (ID: {siswa_row['ID']})")
+                col_edit, col_hapus = st.columns(2)
+                with col_edit: # Tombol Edit
+                    if st.button("✏️ Edit Siswa", key="edit_siswa_terpilih"):
+                        st.session_state.edit_siswa_id = int(siswa_row['ID'])
+                        st.session_state.edit_nisn = int(siswa_row['NISN'])
                         st.session_state.edit_nama = siswa_row['Nama Siswa']
-                        st.session_state.edit_kelas_id_current = siswa_row['Kelas ID']
+                        st.session_state.edit_kelas_id_current = None if pd.isna(siswa_row['Kelas ID']) else int(siswa_row['Kelas ID'])
                         st.session_state.is_editing_siswa = True
                         st.rerun()
-                
-                with cols_data[5]: # Tombol Hapus
+
+                with col_hapus: # Tombol Hapus
                     if st.session_state.confirm_delete_siswa_id == siswa_row['ID']:
-                        if st.button("✅ Hapus?", key=f"confirm_del_siswa_{siswa_row['ID']}", type="primary", help="Konfirmasi Hapus"):
+                        if st.button("✅ Ya, Hapus", key=f"confirm_del_siswa_{siswa_row['ID']}", type="primary", help="Konfirmasi Hapus"):
                             try:
-                                cursor.execute("DELETE FROM siswa WHERE id = ?", (siswa_row['ID'],))
-                                # Juga hapus nilai terkait siswa ini
-                                cursor.execute("DELETE FROM nilai WHERE siswa_id = ?", (siswa_row['ID'],))
-                                conn.commit()
+                                # Nilai siswa ikut terhapus lewat ON DELETE CASCADE
+                                writer.eksekusi("DELETE FROM siswa WHERE id = ?", (int(siswa_row['ID']),))
                                 st.success(f"Siswa '{siswa_row['Nama Siswa']}' dan semua nilainya berhasil dihapus.")
                                 st.session_state.confirm_delete_siswa_id = None
                                 st.rerun()
@@ -150,15 +223,20 @@ def show_siswa():
                             st.session_state.confirm_delete_siswa_id = None
                             st.rerun()
                     else:
-                        if st.button("🗑️", key=f"hapus_siswa_{siswa_row['ID']}", help="Hapus Siswa"):
+                        if st.button("🗑️ Hapus Siswa", key="hapus_siswa_terpilih"):
                             st.session_state.confirm_delete_siswa_id = siswa_row['ID']
                             st.rerun()
+        elif len(kursor_halaman) > 1:
+            # Halaman ini kosong (misalnya baris terakhirnya baru dihapus), mundur satu halaman
+            kursor_halaman.pop()
+            st.rerun()
         else:
             st.info("Belum ada data siswa yang cocok dengan pencarian atau belum ada data siswa sama sekali.")
 
     except Exception as e:
         st.error(f"Gagal melakukan fetching data siswa: {e}")
 
+    profiler.fase("form edit siswa", "render")
     # --- Form Edit Siswa (Modal-like Expander) ---
     if st.session_state.get("is_editing_siswa", False) and st.session_state.edit_siswa_id is not None:
         with st.expander("✏️ Edit Data Siswa", expanded=True):
@@ -177,7 +255,7 @@ def show_siswa():
                 # Pilihan Kelas untuk edit siswa
                 selected_kelas_id_edit = None
                 if kelas_options_list:
-                    kelas_choices_edit = [("", "Pilih Kelas...")] + [(k['id'], k['nama_lengkap_kelas']) for k in kelas_options_list]
+                    kelas_choices_edit = [("", "Pilih Kelas...")] + kelas_options_list
                     
                     # Cari index kelas saat ini untuk default selectbox
                     current_kelas_index = 0
@@ -208,11 +286,10 @@ def show_siswa():
                 if save_edit:
                     if nisn_edit and nama_edit:
                         try:
-                            cursor.execute(
+                            writer.eksekusi(
                                 "UPDATE siswa SET nisn = ?, nama = ?, kelas_id = ? WHERE id = ?",
                                 (nisn_edit, nama_edit, selected_kelas_id_edit, edit_siswa_id)
                             )
-                            conn.commit()
                             st.success(f"Data siswa '{nama_edit}' berhasil diperbarui.")
                             st.session_state.is_editing_siswa = False
                             st.session_state.edit_siswa_id = None 
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from db import get_connection, init_db
+from db import get_read_connection
+import katalog
 import sqlite3
 import time
+import writer
 
 def show_tahun_ajaran():
     # Pastikan user adalah admin
@@ -11,22 +13,16 @@ def show_tahun_ajaran():
         return
 
     st.title("📚 Manajemen Tahun Ajaran")
-    init_db() # Inisialisasi database jika belum ada
 
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
 
-    # Fungsi untuk memuat data tahun ajaran
-    def load_data_tahun_ajaran():
-        cursor.execute("SELECT id, th_ajar FROM tahun_ajaran ORDER BY th_ajar DESC")
-        return cursor.fetchall()
-
     # Menampilkan daftar tahun ajaran
     st.subheader("Daftar Tahun Ajaran")
-    data_tahun_ajaran = load_data_tahun_ajaran()
+    data_tahun_ajaran = katalog.ambil("tahun_ajaran")
 
     if data_tahun_ajaran:
-        df_tahun_ajaran = pd.DataFrame(data_tahun_ajaran, columns=["ID", "Tahun Ajaran"])
+        df_tahun_ajaran = pd.DataFrame([(th['id'], th['th_ajar']) for th in data_tahun_ajaran], columns=["ID", "Tahun Ajaran"])
         st.dataframe(df_tahun_ajaran, use_container_width=True, hide_index=True)
     else:
         st.info("Belum ada data tahun ajaran.")
@@ -85,13 +81,13 @@ def show_tahun_ajaran():
             else:
                 try:
                     if edit_id_val: # Mode Edit (menggunakan edit_id_val dari luar form)
-                        cursor.execute("UPDATE tahun_ajaran SET th_ajar = ? WHERE id = ?", (th_ajar_input, edit_id_val))
-                        conn.commit()
+                        writer.eksekusi("UPDATE tahun_ajaran SET th_ajar = ? WHERE id = ?", (th_ajar_input, edit_id_val))
+                        katalog.invalidate("tahun_ajaran")
                         st.success(f"Tahun ajaran '{th_ajar_input}' berhasil diperbarui.")
                         st.toast(f"Berhasil perbarui: {th_ajar_input} 🎉", icon="✅")
                     else: # Mode Tambah Baru
-                        cursor.execute("INSERT INTO tahun_ajaran (th_ajar) VALUES (?)", (th_ajar_input,))
-                        conn.commit()
+                        writer.eksekusi("INSERT INTO tahun_ajaran (th_ajar) VALUES (?)", (th_ajar_input,))
+                        katalog.invalidate("tahun_ajaran")
                         st.success(f"Tahun ajaran '{th_ajar_input}' berhasil ditambahkan.")
                         st.toast(f"Berhasil tambah: {th_ajar_input} ✨", icon="✅")
                     
@@ -122,8 +118,8 @@ def show_tahun_ajaran():
                     if cursor.fetchone()[0] > 0:
                         st.error(f"Tidak dapat menghapus tahun ajaran '{st.session_state.confirm_delete_th_ajar_nama}' karena masih memiliki data semester terkait. Hapus semester terlebih dahulu.")
                     else:
-                        cursor.execute("DELETE FROM tahun_ajaran WHERE id = ?", (st.session_state.confirm_delete_th_ajar_id,))
-                        conn.commit()
+                        writer.eksekusi("DELETE FROM tahun_ajaran WHERE id = ?", (st.session_state.confirm_delete_th_ajar_id,))
+                        katalog.invalidate("tahun_ajaran")
                         st.success(f"Tahun ajaran '{st.session_state.confirm_delete_th_ajar_nama}' berhasil dihapus.")
                     
                     del st.session_state.confirm_delete_th_ajar_id
@@ -0,0 +1,285 @@
+# Pelacak query SQL untuk koneksi dari db.get_connection() dan db.get_read_connection().
+#
+# Setiap cursor yang dibagikan pool dibungkus TracedCursor, yang mencatat teks SQL, bentuk
+# parameter (bukan nilainya), jumlah baris yang diambil, waktu (execute + fetch), serta
+# fungsi halaman yang memanggilnya. Catatan dikumpulkan per rerun (lihat `rerun()` yang
+# dipakai router di sinfomik.py), lalu saat rerun selesai:
+#   - query di atas SINFOMIK_SLOW_QUERY_MS ditulis ke log berotasi (satu JSON per baris),
+#   - SQL yang sama dari pemanggil yang sama >= SINFOMIK_N_PLUS_1_MIN kali dalam satu rerun
+#     dicatat sebagai dugaan pola N+1,
+#   - agregat per halaman (query per rerun, p50/p95 waktu query) diperbarui.
+# Modul ini sengaja tidak mengimpor streamlit. Matikan dengan SINFOMIK_TRACE=0.
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+AKTIF = os.getenv("SINFOMIK_TRACE", "1") != "0"
+SLOW_QUERY_MS = float(os.getenv("SINFOMIK_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.getenv("SINFOMIK_SLOW_QUERY_LOG", "slow_queries.log")
+SLOW_QUERY_LOG_BYTES = int(os.getenv("SINFOMIK_SLOW_QUERY_LOG_BYTES", str(1024 * 1024)))
+SLOW_QUERY_LOG_BACKUP = int(os.getenv("SINFOMIK_SLOW_QUERY_LOG_BACKUP", "5"))
+N_PLUS_1_MIN = int(os.getenv("SINFOMIK_N_PLUS_1_MIN", "10"))
+
+# Jumlah sampel terakhir per halaman yang dipakai menghitung p50/p95
+SAMPEL_PER_HALAMAN = 2000
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_FILE_LEWATI = {os.path.join(_BASE_DIR, "db.py"), os.path.abspath(__file__)}
+
+_lokal = threading.local()
+_lock = threading.Lock()
+_agregat = {}  # halaman -> dict berisi deque sampel
+_logger = None
+
+
+def _log():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("sinfomik.slow_query")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUP, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _tulis_log(data):
+    data = dict(data, ms=round(data["ms"], 3), ts=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    _log().info(json.dumps(data, ensure_ascii=False))
+
+
+def _pemanggil():
+    """'modul.py:fungsi:baris' dari frame pertama di luar db.py/tracer.py yang berada
+    di direktori aplikasi."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        nama_file = frame.f_code.co_filename
+        if nama_file.startswith(_BASE_DIR) and nama_file not in _FILE_LEWATI:
+            return f"{os.path.basename(nama_file)}:{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "?"
+
+
+def _bentuk_params(params):
+    if params is None:
+        return "-"
+    if isinstance(params, dict):
+        return f"dict[{len(params)}]"
+    try:
+        return f"{type(params).__name__}[{len(params)}]"
+    except TypeError:
+        return type(params).__name__
+
+
+def _catat(sql, params):
+    rec = {
+        "sql": " ".join(sql.split()),
+        "params": params,
+        "baris": 0,
+        "ms": 0.0,
+        "pemanggil": _pemanggil(),
+    }
+    rerun_ini = getattr(_lokal, "rerun", None)
+    if rerun_ini is not None:
+        rec["halaman"] = rerun_ini.halaman
+        rerun_ini.query.append(rec)
+    return rec
+
+
+def _selesai_tanpa_rerun(rec):
+    # Query di luar rerun (skrip, thread latar) hanya diperiksa terhadap ambang lambat
+    if "halaman" not in rec and rec["ms"] >= SLOW_QUERY_MS:
+        _tulis_log(dict(rec, jenis="lambat"))
+
+
+class TracedCursor:
+    """Pembungkus sqlite3.Cursor yang mencatat setiap execute dan fetch."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_rec", None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def _jalankan(self, fungsi, sql, arg, bentuk):
+        rec = _catat(sql, bentuk)
+        object.__setattr__(self, "_rec", rec)
+        mulai = time.perf_counter()
+        try:
+            fungsi(sql, arg)
+        except Exception as e:
+            rec["galat"] = type(e).__name__
+            raise
+        finally:
+            rec["ms"] += (time.perf_counter() - mulai) * 1000
+            _selesai_tanpa_rerun(rec)
+        return self
+
+    def execute(self, sql, params=()):
+        return self._jalankan(self._cursor.execute, sql, params, _bentuk_params(params))
+
+    def executemany(self, sql, seq_params):
+        if not hasattr(seq_params, "__len__"):
+            seq_params = list(seq_params)
+        return self._jalankan(self._cursor.executemany, sql, seq_params, f"executemany[{len(seq_params)}]")
+
+    def _ambil(self, fungsi, *args):
+        mulai = time.perf_counter()
+        hasil = fungsi(*args)
+        rec = self._rec
+        if rec is not None:
+            rec["ms"] += (time.perf_counter() - mulai) * 1000
+            if isinstance(hasil, list):
+                rec["baris"] += len(hasil)
+            elif hasil is not None:
+                rec["baris"] += 1
+        return hasil
+
+    def fetchone(self):
+        return self._ambil(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._ambil(self._cursor.fetchmany, size if size is not None else self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._ambil(self._cursor.fetchall)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+
+def bungkus(cursor):
+    """Dipakai db.PooledConnection: cursor dibungkus hanya jika pelacakan aktif."""
+    return TracedCursor(cursor) if AKTIF else cursor
+
+
+class _Rerun:
+    def __init__(self, halaman):
+        self.halaman = halaman
+        self.query = []
+
+
+def rerun_aktif():
+    """Catatan rerun yang sedang berjalan di thread ini (atau None)."""
+    return getattr(_lokal, "rerun", None)
+
+
+@contextmanager
+def rerun(halaman):
+    """Mengelompokkan semua query di dalam blok ini sebagai satu rerun halaman."""
+    if not AKTIF:
+        yield None
+        return
+    sebelumnya = getattr(_lokal, "rerun", None)
+    rerun_ini = _Rerun(halaman)
+    _lokal.rerun = rerun_ini
+    try:
+        yield rerun_ini
+    finally:
+        _lokal.rerun = sebelumnya
+        _selesai_rerun(rerun_ini)
+
+
+def _selesai_rerun(rerun_ini):
+    for rec in rerun_ini.query:
+        if rec["ms"] >= SLOW_QUERY_MS:
+            _tulis_log(dict(rec, jenis="lambat"))
+
+    ulang = Counter((rec["sql"], rec["pemanggil"]) for rec in rerun_ini.query)
+    for (sql, pemanggil), jumlah in ulang.items():
+        if jumlah >= N_PLUS_1_MIN:
+            total_ms = sum(r["ms"] for r in rerun_ini.query if r["sql"] == sql and r["pemanggil"] == pemanggil)
+            _tulis_log({"jenis": "n+1", "halaman": rerun_ini.halaman, "sql": sql, "pemanggil": pemanggil,
+                        "jumlah": jumlah, "ms": round(total_ms, 3)})
+
+    with _lock:
+        agregat = _agregat.setdefault(rerun_ini.halaman, {
+            "rerun": 0,
+            "query_per_rerun": deque(maxlen=SAMPEL_PER_HALAMAN),
+            "ms_query": deque(maxlen=SAMPEL_PER_HALAMAN),
+            "ms_db_per_rerun": deque(maxlen=SAMPEL_PER_HALAMAN),
+        })
+        agregat["rerun"] += 1
+        agregat["query_per_rerun"].append(len(rerun_ini.query))
+        agregat["ms_query"].extend(rec["ms"] for rec in rerun_ini.query)
+        agregat["ms_db_per_rerun"].append(sum(rec["ms"] for rec in rerun_ini.query))
+
+
+def _persentil(nilai, p):
+    if not nilai:
+        return 0.0
+    urut = sorted(nilai)
+    return urut[min(len(urut) - 1, round(p / 100 * (len(urut) - 1)))]
+
+
+def statistik():
+    """Agregat per halaman sejak proses berjalan (sampel terakhir SAMPEL_PER_HALAMAN)."""
+    with _lock:
+        salinan = {h: {k: (list(v) if isinstance(v, deque) else v) for k, v in a.items()} for h, a in _agregat.items()}
+    hasil = {}
+    for halaman, a in salinan.items():
+        qpr = a["query_per_rerun"]
+        hasil[halaman] = {
+            "rerun": a["rerun"],
+            "query_per_rerun": round(sum(qpr) / len(qpr), 1) if qpr else 0,
+            "query_per_rerun_maks": max(qpr) if qpr else 0,
+            "p50_ms": round(_persentil(a["ms_query"], 50), 3),
+            "p95_ms": round(_persentil(a["ms_query"], 95), 3),
+            "db_ms_per_rerun_p95": round(_persentil(a["ms_db_per_rerun"], 95), 3),
+        }
+    return hasil
+
+
+def reset_statistik():
+    with _lock:
+        _agregat.clear()
+
+
+def ringkas_log(path=SLOW_QUERY_LOG, teratas=10):
+    """Ringkasan log query lambat: SQL dengan total waktu terbesar dan dugaan N+1."""
+    lambat, n_plus_1 = {}, {}
+    for nama in [path] + [f"{path}.{i}" for i in range(1, SLOW_QUERY_LOG_BACKUP + 1)]:
+        if not os.path.exists(nama):
+            continue
+        with open(nama, encoding="utf-8") as f:
+            for baris in f:
+                try:
+                    data = json.loads(baris)
+                except ValueError:
+                    continue
+                tujuan = n_plus_1 if data.get("jenis") == "n+1" else lambat
+                kunci = (data["sql"], data.get("pemanggil", "?"))
+                jumlah, total = tujuan.get(kunci, (0, 0.0))
+                tujuan[kunci] = (jumlah + data.get("jumlah", 1), total + data["ms"])
+    urut = lambda d: sorted(d.items(), key=lambda x: x[1][1], reverse=True)[:teratas]
+    return urut(lambat), urut(n_plus_1)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else SLOW_QUERY_LOG
+    lambat, n_plus_1 = ringkas_log(path)
+    print(f"Query lambat teratas (>= {SLOW_QUERY_MS:g} ms) di {path}:")
+    for (sql, pemanggil), (jumlah, total) in lambat:
+        print(f"  {total:10.1f} ms  {jumlah:5d}x  {pemanggil}\n      {sql[:150]}")
+    print("Dugaan pola N+1:")
+    for (sql, pemanggil), (jumlah, total) in n_plus_1:
+        print(f"  {total:10.1f} ms  {jumlah:5d}x  {pemanggil}\n      {sql[:150]}")
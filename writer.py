@@ -0,0 +1,173 @@
+# Antrean tulis tunggal dengan group commit.
+#
+# Penulisan dari halaman (simpan nilai, edit/hapus siswa, konfigurasi mapel, ...) tidak lagi
+# membuka transaksi tulis sendiri di koneksi sesi, melainkan dikirim lewat
+# `writer.tulis(fungsi, *args)` ke SATU thread penulis yang memiliki koneksinya sendiri.
+# Thread itu menunggu permintaan pertama, lalu ikut mengambil permintaan lain yang sudah
+# antre atau datang dalam SINFOMIK_WRITER_JEDA_MS (paling banyak SINFOMIK_WRITER_BATCH),
+# dan menjalankan semuanya dalam satu transaksi BEGIN IMMEDIATE ... COMMIT. Dengan begitu
+# sesi-sesi tidak berebut lock tulis SQLite, dan biaya commit dibagi ke banyak permintaan
+# ketika banyak guru menyimpan bersamaan.
+#
+# Setiap permintaan berjalan di SAVEPOINT-nya sendiri: permintaan yang gagal (misalnya NISN
+# duplikat) hanya membatalkan perubahannya sendiri. Hasil atau exception-nya baru diserahkan
+# ke sesi pemanggil setelah COMMIT berhasil, jadi setelah `tulis()` kembali, data sudah
+# terlihat oleh koneksi lain. Batas waktu SINFOMIK_WRITER_TIMEOUT hanya berlaku selama
+# permintaan masih antre: permintaan itu dibatalkan (tidak akan pernah ditulis) dan pemanggil
+# menerima sqlite3.OperationalError. Permintaan yang sudah mulai berjalan selalu ditunggu
+# sampai hasilnya pasti, agar halaman tidak melaporkan gagal untuk data yang ternyata tersimpan.
+#
+# Fungsi tulis menerima koneksi sebagai argumen pertama dan TIDAK boleh memanggil
+# commit()/rollback() sendiri.
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import db
+
+JEDA_MS = float(os.getenv("SINFOMIK_WRITER_JEDA_MS", "2"))
+BATCH_MAKS = int(os.getenv("SINFOMIK_WRITER_BATCH", "64"))
+TIMEOUT = float(os.getenv("SINFOMIK_WRITER_TIMEOUT", "30"))  # detik paling lama sebuah permintaan antre
+
+_antrean = queue.Queue()
+_lock = threading.Lock()
+_thread = None
+_stats = {"permintaan": 0, "gagal": 0, "batch": 0, "batch_maks": 0, "tunggu_ms_maks": 0.0, "transaksi_gagal": 0}
+
+
+def _mulai():
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop, name="sinfomik-writer", daemon=True)
+            _thread.start()
+
+
+def kirim(fungsi, *args):
+    """Memasukkan `fungsi(conn, *args)` ke antrean; mengembalikan Future hasilnya."""
+    if threading.current_thread() is _thread:
+        raise RuntimeError("writer.kirim() tidak boleh dipanggil dari dalam fungsi tulis.")
+    _mulai()
+    future = Future()
+    _antrean.put((fungsi, args, future, time.perf_counter()))
+    return future
+
+
+def tulis(fungsi, *args):
+    """Menjalankan `fungsi(conn, *args)` di thread penulis dan menunggu hasilnya.
+    Exception dari fungsi (misalnya sqlite3.IntegrityError) diteruskan ke pemanggil.
+
+    Jika permintaan belum mulai dijalankan setelah TIMEOUT detik, permintaan dibatalkan dan
+    sqlite3.OperationalError dilempar; permintaan yang sudah berjalan ditunggu sampai selesai."""
+    future = kirim(fungsi, *args)
+    try:
+        return future.result(TIMEOUT)
+    except TimeoutError:
+        # cancel() hanya berhasil selama future belum ditandai running oleh _jalankan_batch
+        if future.cancel():
+            raise sqlite3.OperationalError(
+                f"Antrean penulisan sedang sibuk; permintaan dibatalkan setelah {TIMEOUT:g} detik "
+                f"tanpa ada yang disimpan. Silakan coba lagi.") from None
+        return future.result()
+
+
+def _eksekusi(conn, sql, params):
+    return conn.execute(sql, params).rowcount
+
+
+def eksekusi(sql, params=()):
+    """Satu perintah tulis lewat antrean; mengembalikan jumlah baris yang terpengaruh."""
+    return tulis(_eksekusi, sql, params)
+
+
+def _ambil_batch():
+    batch = [_antrean.get()]
+    batas = time.perf_counter() + JEDA_MS / 1000
+    while len(batch) < BATCH_MAKS:
+        sisa = batas - time.perf_counter()
+        try:
+            batch.append(_antrean.get(timeout=sisa) if sisa > 0 else _antrean.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _jalankan_batch(conn, batch):
+    hasil = []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for fungsi, args, future, _ in batch:
+            if not future.set_running_or_notify_cancel():
+                hasil.append(None)
+                continue
+            conn.execute("SAVEPOINT permintaan")
+            try:
+                hasil.append((True, fungsi(conn, *args)))
+                conn.execute("RELEASE permintaan")
+            except Exception as e:
+                conn.execute("ROLLBACK TO permintaan")
+                conn.execute("RELEASE permintaan")
+                hasil.append((False, e))
+        conn.commit()
+    except Exception as e:
+        # BEGIN/COMMIT gagal (misalnya lock dipegang proses lain melewati busy_timeout):
+        # seluruh batch batal, semua pemanggil menerima exception yang sama
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pass
+        with _lock:
+            _stats["transaksi_gagal"] += 1
+        for _, _, future, _ in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    sekarang = time.perf_counter()
+    with _lock:
+        _stats["batch"] += 1
+        _stats["batch_maks"] = max(_stats["batch_maks"], len(batch))
+        _stats["permintaan"] += len(batch)
+        _stats["tunggu_ms_maks"] = max(_stats["tunggu_ms_maks"], (sekarang - batch[0][3]) * 1000)
+    for (_, _, future, _), h in zip(batch, hasil):
+        if h is None:
+            continue
+        berhasil, nilai = h
+        if berhasil:
+            future.set_result(nilai)
+        else:
+            with _lock:
+                _stats["gagal"] += 1
+            future.set_exception(nilai)
+
+
+def _loop():
+    conn = None
+    while True:
+        batch = _ambil_batch()
+        try:
+            if conn is None:
+                conn = db.open_write_connection()
+            _jalankan_batch(conn, batch)
+        except Exception as e:
+            # Koneksi tidak bisa dibuka/rusak: gagalkan batch ini, buka ulang di batch berikutnya
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if conn is not None:
+                conn.close()
+            conn = None
+
+
+def statistik():
+    """Jumlah permintaan dan batch sejak proses berjalan, ukuran batch rata-rata/maksimum,
+    dan waktu tunggu terlama (antre sampai commit) dalam milidetik."""
+    with _lock:
+        s = dict(_stats)
+    s["tunggu_ms_maks"] = round(s["tunggu_ms_maks"], 3)
+    s["rata_per_batch"] = round(s["permintaan"] / s["batch"], 2) if s["batch"] else 0.0
+    s["antre"] = _antrean.qsize()
+    return s